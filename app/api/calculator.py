@@ -1,15 +1,61 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Union
+from typing import Literal, Optional, Union
 from app.dependencies import verify_token
+from app.utils.expressions import (
+    DIVISION_BY_ZERO,
+    NEGATIVE_SQUARE_ROOT as EXPRESSION_NEGATIVE_SQUARE_ROOT,
+    ExpressionError,
+    compile_expression,
+)
 from fastapi import Depends
+import numpy as np
 
 router = APIRouter(prefix="/calculator", tags=["calculator"])
 
+# Error messages shared by the single and batch endpoints
+DIVIDE_BY_ZERO = "Cannot divide by zero"
+NEGATIVE_SQUARE_ROOT = "Cannot calculate square root of negative number"
+INVALID_OPERATION = "Invalid operation"
+MISSING_OPERAND = "Missing second operand"
+NOT_FINITE = "Result is not a finite number"
+
+# Per-element status codes of a batch (also sent in the binary payload)
+STATUS_OK = 0
+STATUS_DETAILS = {
+    1: INVALID_OPERATION,
+    2: DIVIDE_BY_ZERO,
+    3: NEGATIVE_SQUARE_ROOT,
+    4: MISSING_OPERAND,
+    5: NOT_FINITE,
+}
+STATUS_INVALID_OPERATION, STATUS_DIVIDE_BY_ZERO, STATUS_NEGATIVE_SQUARE_ROOT, STATUS_MISSING_OPERAND, STATUS_NOT_FINITE = STATUS_DETAILS
+
+# Errors raised while evaluating an expression, mapped to batch status codes
+EXPRESSION_STATUS = {
+    DIVISION_BY_ZERO: STATUS_DIVIDE_BY_ZERO,
+    EXPRESSION_NEGATIVE_SQUARE_ROOT: STATUS_NEGATIVE_SQUARE_ROOT,
+}
+
+BINARY_CHUNK_SIZE = 64 * 1024
+
 class CalculationRequest(BaseModel):
     operation: str
     num1: float
     num2: Optional[float] = None  # Optional for operations like square root
+
+class BatchCalculationRequest(BaseModel):
+    operations: list[str]
+    num1: list[float]
+    num2: Optional[list[Optional[float]]] = None  # Omitted or null where not needed
+    format: Literal["json", "binary"] = "json"
+
+class EvaluationRequest(BaseModel):
+    expression: str
+    # Columnar bindings: variable name -> one value per evaluation
+    variables: dict[str, list[float]] = {}
+    format: Literal["json", "binary"] = "json"
     
 def perform_calculation(operation: str, num1: float, num2: Optional[float] = None) -> float:
     if operation == "add":
@@ -20,16 +66,107 @@ def perform_calculation(operation: str, num1: float, num2: Optional[float] = Non
         return num1 * num2
     elif operation == "divide":
         if num2 == 0:
-            raise HTTPException(status_code=400, detail="Cannot divide by zero")
+            raise HTTPException(status_code=400, detail=DIVIDE_BY_ZERO)
         return num1 / num2
     elif operation == "power":
         return num1 ** num2
     elif operation == "square_root":
         if num1 < 0:
-            raise HTTPException(status_code=400, detail="Cannot calculate square root of negative number")
+            raise HTTPException(status_code=400, detail=NEGATIVE_SQUARE_ROOT)
         return num1 ** 0.5
     else:
-        raise HTTPException(status_code=400, detail="Invalid operation")
+        raise HTTPException(status_code=400, detail=INVALID_OPERATION)
+
+def evaluate_batch(operations: np.ndarray, num1: np.ndarray, num2: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Evaluate a columnar batch grouped by operation, one vectorized NumPy
+    pass per operation. Returns the float64 results and a uint8 status per
+    element; failed elements hold NaN and a non-zero status instead of
+    aborting the whole batch.
+    """
+    results = np.full(len(num1), np.nan)
+    status = np.full(len(num1), STATUS_INVALID_OPERATION, dtype=np.uint8)
+    missing = np.isnan(num2)
+
+    with np.errstate(all="ignore"):
+        for operation in np.unique(operations):
+            mask = operations == operation
+            a, b = num1[mask], num2[mask]
+            op_status = np.full(len(a), STATUS_OK, dtype=np.uint8)
+            if operation == "square_root":
+                op_status[a < 0] = STATUS_NEGATIVE_SQUARE_ROOT
+                values = np.sqrt(a)
+            elif operation in ("add", "subtract", "multiply", "divide", "power"):
+                if operation == "add":
+                    values = a + b
+                elif operation == "subtract":
+                    values = a - b
+                elif operation == "multiply":
+                    values = a * b
+                elif operation == "divide":
+                    op_status[b == 0] = STATUS_DIVIDE_BY_ZERO
+                    values = a / b
+                else:
+                    values = np.power(a, b)
+                op_status[missing[mask]] = STATUS_MISSING_OPERAND
+            else:
+                continue  # Invalid operation: keeps its status
+            op_status[(op_status == STATUS_OK) & ~np.isfinite(values)] = STATUS_NOT_FINITE
+            results[mask] = np.where(op_status == STATUS_OK, values, np.nan)
+            status[mask] = op_status
+
+    return results, status
+
+def evaluate_expression(expression: str, variables: dict[str, np.ndarray], size: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Evaluate a compiled expression over `size` variable bindings at once.
+    Same per-element contract as evaluate_batch: the first error hit by an
+    element sets its status and its result becomes NaN.
+    """
+    compiled = compile_expression(expression)
+    missing = compiled.variables - variables.keys()
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing variables: {', '.join(sorted(missing))}")
+
+    status = np.zeros(size, dtype=np.uint8)
+
+    def flag(kind: str, mask: np.ndarray) -> None:
+        mask = np.broadcast_to(mask, status.shape)
+        status[mask & (status == STATUS_OK)] = EXPRESSION_STATUS[kind]
+
+    with np.errstate(all="ignore"):
+        values = np.broadcast_to(compiled.evaluate(variables, flag), status.shape).astype(np.float64)
+    status[(status == STATUS_OK) & ~np.isfinite(values)] = STATUS_NOT_FINITE
+    results = np.where(status == STATUS_OK, values, np.nan)
+    return results, status
+
+def batch_response(results: np.ndarray, status: np.ndarray, format: str):
+    """Serialize per-element results and statuses as JSON or as the binary layout."""
+    error_indexes = np.flatnonzero(status != STATUS_OK)
+
+    if format == "binary":
+        payload = memoryview(results.astype("<f8").tobytes() + status.tobytes())
+
+        def chunks():
+            for start in range(0, len(payload), BINARY_CHUNK_SIZE):
+                yield bytes(payload[start:start + BINARY_CHUNK_SIZE])
+
+        return StreamingResponse(
+            chunks(),
+            media_type="application/octet-stream",
+            headers={"X-Batch-Length": str(len(results)), "X-Error-Count": str(len(error_indexes))},
+        )
+
+    values = results.tolist()
+    for index in error_indexes.tolist():
+        values[index] = None
+    return {
+        "results": values,
+        "errors": [
+            {"index": index, "detail": STATUS_DETAILS[int(status[index])]}
+            for index in error_indexes.tolist()
+        ],
+    }
 
 @router.post("/calculate")
 async def calculate(
@@ -63,4 +200,50 @@ async def list_operations(user=Depends(verify_token)) -> dict[str, list[str]]:
             "power",
             "square_root"
         ]
-    }
\ No newline at end of file
+    }
+
+@router.post("/batch")
+async def calculate_batch(data: BatchCalculationRequest, user=Depends(verify_token)):
+    """
+    Evaluate many calculations in one request from columnar arrays
+    (operations[i], num1[i], num2[i]). Errors are reported per element.
+
+    With format="binary" the response is application/octet-stream: n
+    little-endian float64 results followed by n uint8 status codes
+    (0 = ok, see STATUS_DETAILS), with n in the X-Batch-Length header.
+    """
+    size = len(data.operations)
+    if len(data.num1) != size or (data.num2 is not None and len(data.num2) != size):
+        raise HTTPException(status_code=400, detail="operations, num1 and num2 must have the same length")
+
+    operations = np.asarray(data.operations, dtype=str)
+    num1 = np.asarray(data.num1, dtype=np.float64)
+    if data.num2 is None:
+        num2 = np.full(size, np.nan)
+    else:
+        num2 = np.asarray([np.nan if value is None else value for value in data.num2], dtype=np.float64)
+
+    results, status = evaluate_batch(operations, num1, num2)
+    return batch_response(results, status, data.format)
+
+@router.post("/evaluate")
+async def evaluate(data: EvaluationRequest, user=Depends(verify_token)):
+    """
+    Evaluate an arithmetic expression with variables, e.g. "sqrt(x**2 + y**2) / n",
+    against many bindings in one call. Variables are given as columns of equal
+    length; the expression is compiled once (and cached) and evaluated
+    vectorized over all of them. Allowed: numbers, variables, pi, e,
+    + - * / % **, sqrt() and abs(). Errors are reported per element, and
+    the response has the same shape as /batch (including format="binary").
+    """
+    lengths = {len(values) for values in data.variables.values()}
+    if len(lengths) > 1:
+        raise HTTPException(status_code=400, detail="All variables must have the same number of values")
+    size = lengths.pop() if lengths else 1
+
+    variables = {name: np.asarray(values, dtype=np.float64) for name, values in data.variables.items()}
+    try:
+        results, status = evaluate_expression(data.expression, variables, size)
+    except ExpressionError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid expression: {e}")
+    return batch_response(results, status, data.format)
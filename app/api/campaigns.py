@@ -0,0 +1,75 @@
+import asyncio
+import json
+from email.headerregistry import Address
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from app.core.jobs import job_queue
+from app.core.smtp import structured_email_smtp
+from app.utils.campaign_store import campaign_store
+from app.utils.pipelines import EMAIL_CAMPAIGN
+
+router = APIRouter()
+
+class CampaignRequest(BaseModel):
+    recipients: list[str]
+    subject: str
+    topic: str
+
+def _invalid_address(email: str) -> bool:
+    try:
+        Address(addr_spec=email)
+    except Exception:
+        return True
+    return False
+
+@router.post("/campaigns", status_code=202)
+async def create_campaign(data: CampaignRequest):
+    """
+    Crea una campaña: el contenido (estructura, HTML e imágenes) se genera una
+    sola vez y después se envía un mensaje personalizado a cada destinatario
+    desde la cola de trabajos, con un ritmo máximo de envío.
+    """
+    if not structured_email_smtp.configured:
+        raise HTTPException(500, "Credenciales de correo no configuradas.")
+    # Sin duplicados y conservando el orden
+    recipients = list(dict.fromkeys(email.strip() for email in data.recipients if email.strip()))
+    if not recipients:
+        raise HTTPException(400, "La campaña no tiene destinatarios.")
+    invalid = [email for email in recipients if _invalid_address(email)]
+    if invalid:
+        raise HTTPException(400, f"Direcciones de correo no válidas: {', '.join(invalid[:20])}")
+
+    job_id = await job_queue.submit(
+        EMAIL_CAMPAIGN,
+        {"subject": data.subject, "topic": data.topic, "total": len(recipients)},
+        blobs={"recipients": json.dumps(recipients).encode("utf-8")},
+    )
+    return {"campaign_id": job_id, "status": "queued", "total": len(recipients)}
+
+@router.get("/campaigns/{campaign_id}")
+async def get_campaign(campaign_id: str):
+    """Progreso de una campaña: estado del trabajo y envíos pendientes, realizados y fallidos."""
+    job = await job_queue.get(campaign_id)
+    if job is None or job["pipeline"] != EMAIL_CAMPAIGN:
+        raise HTTPException(status_code=404, detail="Campaña no encontrada")
+    progress, failures = await asyncio.gather(
+        asyncio.to_thread(campaign_store.progress, campaign_id),
+        asyncio.to_thread(campaign_store.failures, campaign_id),
+    )
+    total = job["payload"]["total"]
+    if not any(progress.values()):
+        # Aún no ha empezado el envío: todos los destinatarios están pendientes
+        progress["pending"] = total
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "total": total,
+        **progress,
+        "failures": failures,
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
@@ -1,20 +1,31 @@
 import os
+import html
 import openai
-import smtplib
+import aiosmtplib
 import logging
-import requests
+import asyncio
 import re
+from typing import Optional
 
 from fastapi import APIRouter, Body, HTTPException
 from email.message import EmailMessage
 
-# Importamos la función que genera la imagen en Freepik (base64)
-from app.api.freepik import generate_image_from_prompt, PromptRequest
+# Importamos la función que genera la imagen en Freepik (en binario)
+from app.api.freepik import generate_image
 # Importamos la función para subir la imagen a Imgbb y obtener URL + delete_url
-from app.api.imgbb import upload_image_to_imgbb
+from app.api.imgbb import upload_image
+from app.core.cleanup import imgbb_cleanup
+from app.core.smtp import structured_email_smtp
+from app.utils.email_template import EMAIL_HTML, EMAIL_TEXT
+from app.core.config import IMAGE_GENERATION_CONCURRENCY, EMAIL_IMAGE_EXPIRATION
 
 router = APIRouter()
 
+IMAGE_PLACEHOLDER = "xXIMAGENXx"
+# Expresión regular para localizar <h2> o <h3> con su contenido
+HEADING_PATTERN = re.compile(r"<(h[23])>(.*?)</\1>", re.DOTALL | re.IGNORECASE)
+CODE_FENCE = "```html"
+
 def remove_code_fences(text: str) -> str:
     """
     Elimina posibles bloques de código (triple backticks) de la respuesta
@@ -22,6 +33,13 @@ def remove_code_fences(text: str) -> str:
     """
     return text.replace("```html", "").replace("```", "")
 
+def _partial_fence_length(text: str) -> int:
+    """Longitud del final de 'text' que podría ser el comienzo (incompleto) de un bloque ```html."""
+    for length in range(min(len(CODE_FENCE) - 1, len(text)), 0, -1):
+        if CODE_FENCE.startswith(text[-length:]):
+            return length
+    return 0
+
 def strip_html_tags(html: str) -> str:
     """
     Elimina etiquetas HTML para quedarnos solo con el texto plano.
@@ -32,6 +50,218 @@ def strip_html_tags(html: str) -> str:
     text = re.sub(r"\s+", " ", text).strip()
     return text
 
+class ImageSectionParser:
+    """
+    Analizador incremental del HTML generado. Recibe el texto por fragmentos
+    (por ejemplo, los tokens de una respuesta en streaming) y, en cuanto un
+    placeholder xXIMAGENXx está completo, devuelve el texto plano de su
+    sección: desde el último <h2>/<h3> anterior (o desde el inicio si no hay
+    ninguno) hasta el placeholder. Los encabezados se buscan solo en el texto
+    anterior a cada placeholder, así que el resultado no depende de cómo
+    llegue troceado el texto.
+    """
+
+    def __init__(self, topic: str):
+        self.topic = topic
+        self._html = ""
+        # Posición desde la que buscar el siguiente placeholder (puede llegar partido)
+        self._search_from = 0
+        # Inicio del fragmento de HTML actual (tras el último placeholder)
+        self._segment_start = 0
+        self._segments: list[str] = []
+        self._heading_pos = 0
+        self._last_heading_start = -1
+
+    def feed(self, chunk: str) -> list[str]:
+        """Añade texto y devuelve las secciones de los placeholders que se han completado."""
+        self._html += chunk
+        sections = []
+        while True:
+            placeholder_pos = self._html.find(IMAGE_PLACEHOLDER, self._search_from)
+            if placeholder_pos == -1:
+                self._search_from = max(self._search_from, len(self._html) - len(IMAGE_PLACEHOLDER) + 1)
+                return sections
+            sections.append(self._section(placeholder_pos))
+            self._segments.append(self._html[self._segment_start:placeholder_pos])
+            self._segment_start = self._search_from = placeholder_pos + len(IMAGE_PLACEHOLDER)
+
+    def _section(self, placeholder_pos: int) -> str:
+        # Avanzamos por los encabezados que terminan antes de este placeholder. No se
+        # guarda la búsqueda entre placeholders: un <h2>/<h3> abierto puede cerrarse
+        # más adelante y cambiar cuál es el primer encabezado completo
+        while True:
+            heading = HEADING_PATTERN.search(self._html, self._heading_pos, placeholder_pos)
+            if heading is None or heading.end() >= placeholder_pos:
+                break
+            self._last_heading_start = heading.start()
+            self._heading_pos = heading.end()
+
+        if self._last_heading_start == -1:
+            section_html = self._html[:placeholder_pos].replace(IMAGE_PLACEHOLDER, "").strip() or self.topic
+        else:
+            section_html = self._html[self._last_heading_start:placeholder_pos].replace(IMAGE_PLACEHOLDER, "")
+        return strip_html_tags(section_html)
+
+    def finish(self) -> list[str]:
+        """Devuelve los fragmentos de HTML entre placeholders (siempre uno más que placeholders)."""
+        return self._segments + [self._html[self._segment_start:]]
+
+def split_image_sections(html_body: str, topic: str) -> tuple[list[str], list[str]]:
+    """
+    Analiza el HTML completo de una vez y devuelve:
+      - los fragmentos de HTML que quedan entre placeholders xXIMAGENXx
+        (siempre uno más que placeholders),
+      - el texto plano de la sección que precede a cada placeholder.
+    """
+    parser = ImageSectionParser(topic)
+    sections = parser.feed(html_body)
+    return parser.finish(), sections
+
+async def generate_section_image(
+    text_section: str, topic: str, semaphore: asyncio.Semaphore, expiration: Optional[int] = 60
+) -> tuple[str, Optional[dict]]:
+    """
+    Genera la imagen de una sección en Freepik y la sube a Imgbb.
+    Devuelve la etiqueta <img> (o cadena vacía si algo falla) y los datos de
+    la subida (delete_url y expires_at) para programar su borrado.
+    """
+    # Prompt detallado para la imagen
+    detailed_prompt = (
+        f"Genera una imagen muy descriptiva y detallada sobre el siguiente contenido: '{text_section}'. "
+        f"El tema global es '{topic}'. "
+        "Usa un estilo fotográfico con elementos relevantes que reflejen dicho contenido."
+    )
+
+    async with semaphore:
+        # Obtenemos la imagen en binario
+        try:
+            image = await generate_image(detailed_prompt)
+        except Exception as e:
+            logging.error(f"Error al generar imagen con Freepik: {str(e)}")
+            return "", None
+
+        # Subimos a Imgbb
+        try:
+            imgbb_data = await upload_image(image, expiration=expiration)
+        except Exception as e:
+            logging.error(f"Error al subir imagen a Imgbb: {str(e)}")
+            return "", None
+
+    image_url = imgbb_data["url"]
+    replacement = (
+        f'<img src="{image_url}" '
+        'alt="Imagen generada" style="max-width:100%;height:auto;" />'
+    )
+    return replacement, {"delete_url": imgbb_data["delete_url"], "expires_at": imgbb_data["expires_at"]}
+
+async def generate_email_content(topic: str, image_expiration: Optional[int] = 60) -> dict:
+    """
+    Genera una sola vez el contenido del correo: estructura y HTML con OpenAI
+    e imágenes con Freepik (subidas a Imgbb). Devuelve 'structure',
+    'html_body' y las subidas ('uploads') de las imágenes.
+    """
+    logging.info("Generando estructura del correo...")
+
+    # Configuramos la API Key de OpenAI
+    openai.api_key = os.getenv("OPENAI_API_KEY")
+    if not openai.api_key:
+        raise HTTPException(
+            status_code=500,
+            detail="No se ha configurado la clave de API de OpenAI."
+        )
+
+    # 1) Pedimos a ChatGPT la estructura en texto plano
+    structure_prompt = (
+        f"Genera una estructura muy detallada para un correo sobre '{topic}'. "
+        "Devuélvela en una lista en texto plano (ejemplo: [Sección1, Sección2, Subsección2.1, ...]). "
+        "Sin explicaciones ni markdown, ni snippets de codigo."
+    )
+    structure_response = await openai.ChatCompletion.acreate(
+        model=os.getenv("GPT_MODEL"),
+        messages=[
+            {"role": "system", "content": "Eres un asistente que crea estructuras de correo."},
+            {"role": "user", "content": structure_prompt}
+        ],
+        max_tokens=400,
+        temperature=1.0
+    )
+    structure = structure_response.choices[0].message.content.strip()
+    if not structure:
+        raise HTTPException(500, "No se generó la estructura del correo.")
+    structure = remove_code_fences(structure)
+
+    logging.info("Generando contenido en HTML con placeholders de imágenes...")
+
+    # 2) Generar contenido HTML, usando xXIMAGENXx como placeholder
+    content_prompt = (
+        f"Utiliza esta estructura para generar el contenido de un correo HTML: {structure}. "
+        f"El tema es: {topic}. Emplea encabezados (<h2>, <h3>), párrafos (<p>), listas (<ul>, <li>) "
+        "y coloca la cadena 'xXIMAGENXx' cada vez que necesites una imagen, al menos cada dos secciones. "
+        "No incluyas la etiqueta <img>. No añadas alt, style ni nada; solo xXIMAGENXx. "
+        "No uses snippets de código. No incluyas títulos como 'Sección:' o 'Conclusión:'. "
+        "Asegúrate de que el texto sea amplio y descriptivo."
+        "No quiero que en ningun momento se referencie al usuario por su nombre. Si se refiere a él, que sea de manera general o como 'estimado lector' o cosas parecidas."
+    )
+    # En streaming: cada imagen se encarga en cuanto su placeholder y el texto
+    # de su sección están completos, mientras el modelo sigue escribiendo
+    content_stream = await openai.ChatCompletion.acreate(
+        model=os.getenv("GPT_MODEL"),
+        messages=[
+            {
+                "role": "system",
+                "content": "Eres un asistente que redacta correos HTML con placeholders para imágenes."
+            },
+            {"role": "user", "content": content_prompt}
+        ],
+        max_tokens=3000,
+        temperature=0.9,
+        stream=True
+    )
+
+    logging.info("Reemplazando xXIMAGENXx por <img src='URL'> a medida que llega el contenido...")
+
+    parser = ImageSectionParser(topic)
+    # Límite de imágenes generándose a la vez
+    semaphore = asyncio.Semaphore(IMAGE_GENERATION_CONCURRENCY)
+    image_tasks: list[asyncio.Task] = []
+
+    def dispatch(text: str) -> None:
+        for text_section in parser.feed(remove_code_fences(text)):
+            image_tasks.append(asyncio.create_task(
+                generate_section_image(text_section, topic, semaphore, image_expiration)
+            ))
+
+    try:
+        pending = ""
+        async for chunk in content_stream:
+            pending += chunk["choices"][0]["delta"].get("content") or ""
+            # Se retiene un posible inicio de bloque de código (```html) partido entre tokens
+            held = _partial_fence_length(pending)
+            dispatch(pending[:len(pending) - held])
+            pending = pending[len(pending) - held:]
+        dispatch(pending)
+
+        segments = parser.finish()
+        if not "".join(segments).strip():
+            raise HTTPException(500, "No se generó el contenido en HTML.")
+        images = await asyncio.gather(*image_tasks)
+    except BaseException:
+        for task in image_tasks:
+            task.cancel()
+        raise
+
+    # Reconstruimos el HTML de una sola vez
+    uploads = []
+    parts = [segments[0]]
+    for (replacement, upload), segment in zip(images, segments[1:]):
+        if upload:
+            uploads.append(upload)
+        parts.append(replacement)
+        parts.append(segment)
+    html_body = "".join(parts).strip()
+
+    return {"structure": structure, "html_body": html_body, "uploads": uploads}
+
 @router.post("/send-structured-email")
 async def send_structured_email(
     recipients: list[str] = Body(..., example=["destino@example.com"]),
@@ -45,292 +275,62 @@ async def send_structured_email(
       2) Generar contenido HTML con placeholders xXIMAGENXx.
     Luego, cada xXIMAGENXx se sustituye por una imagen generada en Freepik
     y subida a Imgbb, para obtener la URL y NO incrustar base64 en el correo.
-    Finalmente, al terminar, se borra la imagen de Imgbb.
+    Finalmente, se programa el borrado diferido de las imágenes de Imgbb.
     
     Se ha mejorado la apariencia con un estilo más limpio, títulos más grandes,
     separaciones generosas y colores neutros.
     """
+    content, sent = None, False
     try:
-        logging.info("Generando estructura del correo...")
-
-        # Configuramos la API Key de OpenAI
-        openai.api_key = os.getenv("OPENAI_API_KEY")
-        if not openai.api_key:
-            raise HTTPException(
-                status_code=500,
-                detail="No se ha configurado la clave de API de OpenAI."
-            )
-
-        # 1) Pedimos a ChatGPT la estructura en texto plano
-        structure_prompt = (
-            f"Genera una estructura muy detallada para un correo sobre '{topic}'. "
-            "Devuélvela en una lista en texto plano (ejemplo: [Sección1, Sección2, Subsección2.1, ...]). "
-            "Sin explicaciones ni markdown, ni snippets de codigo."
-        )
-        structure_response = await openai.ChatCompletion.acreate(
-            model=os.getenv("GPT_MODEL"),
-            messages=[
-                {"role": "system", "content": "Eres un asistente que crea estructuras de correo."},
-                {"role": "user", "content": structure_prompt}
-            ],
-            max_tokens=400,
-            temperature=1.0
-        )
-        structure = structure_response.choices[0].message.content.strip()
-        if not structure:
-            raise HTTPException(500, "No se generó la estructura del correo.")
-        structure = remove_code_fences(structure)
-
-        logging.info("Generando contenido en HTML con placeholders de imágenes...")
-
-        # 2) Generar contenido HTML, usando xXIMAGENXx como placeholder
-        content_prompt = (
-            f"Utiliza esta estructura para generar el contenido de un correo HTML: {structure}. "
-            f"El tema es: {topic}. Emplea encabezados (<h2>, <h3>), párrafos (<p>), listas (<ul>, <li>) "
-            "y coloca la cadena 'xXIMAGENXx' cada vez que necesites una imagen, al menos cada dos secciones. "
-            "No incluyas la etiqueta <img>. No añadas alt, style ni nada; solo xXIMAGENXx. "
-            "No uses snippets de código. No incluyas títulos como 'Sección:' o 'Conclusión:'. "
-            "Asegúrate de que el texto sea amplio y descriptivo."
-            "No quiero que en ningun momento se referencie al usuario por su nombre. Si se refiere a él, que sea de manera general o como 'estimado lector' o cosas parecidas."
-        )
-        content_response = await openai.ChatCompletion.acreate(
-            model=os.getenv("GPT_MODEL"),
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Eres un asistente que redacta correos HTML con placeholders para imágenes."
-                },
-                {"role": "user", "content": content_prompt}
-            ],
-            max_tokens=3000,
-            temperature=0.9
-        )
-        html_body = content_response.choices[0].message.content.strip()
-        if not html_body:
-            raise HTTPException(500, "No se generó el contenido en HTML.")
-        html_body = remove_code_fences(html_body)
-
-        logging.info("Reemplazando xXIMAGENXx por <img src='URL'>...")
-
-        pattern = "xXIMAGENXx"
-        delete_urls = []
-
-        # Expresión regular para localizar <h2> o <h3> con su contenido
-        heading_pattern = re.compile(r"<(h[23])>(.*?)</\1>", re.DOTALL | re.IGNORECASE)
-
-        # Mientras haya placeholders
-        while pattern in html_body:
-            pos_placeholder = html_body.index(pattern)
-
-            # Buscamos la sección que abarca este placeholder
-            all_headings = list(heading_pattern.finditer(html_body))
-            last_heading_index = -1
-            for match in all_headings:
-                start, end = match.span()
-                if end < pos_placeholder:
-                    last_heading_index = start
-                else:
-                    break
-
-            # Hallamos el HTML de la sección
-            if last_heading_index == -1:
-                section_html = html_body[:pos_placeholder].strip() or topic
-            else:
-                current_heading_match = heading_pattern.search(html_body, last_heading_index)
-                if current_heading_match:
-                    start_heading = current_heading_match.start()
-                    # Buscamos la siguiente heading
-                    subsequent_match = heading_pattern.search(html_body, current_heading_match.end())
-                    if subsequent_match and subsequent_match.start() < pos_placeholder:
-                        section_html = html_body[start_heading:subsequent_match.start()]
-                    else:
-                        section_html = html_body[start_heading:pos_placeholder]
-                else:
-                    section_html = html_body[:pos_placeholder]
-
-            # Texto plano de la sección
-            text_section = strip_html_tags(section_html)
-
-            # Prompt detallado para la imagen
-            detailed_prompt = (
-                f"Genera una imagen muy descriptiva y detallada sobre el siguiente contenido: '{text_section}'. "
-                f"El tema global es '{topic}'. "
-                "Usa un estilo fotográfico con elementos relevantes que reflejen dicho contenido."
-            )
-
-            # Obtenemos la imagen (base64)
-            try:
-                freepik_resp = generate_image_from_prompt(PromptRequest(prompt=detailed_prompt))
-                base64_image = freepik_resp.get("image_base64", "")
-            except Exception as e:
-                logging.error(f"Error al generar imagen con Freepik: {str(e)}")
-                base64_image = ""
-
-            replacement = ""
-            if base64_image:
-                # Subimos a Imgbb
-                try:
-                    imgbb_data = upload_image_to_imgbb(base64_image, expiration=60)
-                    image_url = imgbb_data["url"]
-                    delete_url = imgbb_data["delete_url"]
-                    delete_urls.append(delete_url)
-                except Exception as e:
-                    logging.error(f"Error al subir imagen a Imgbb: {str(e)}")
-                    image_url = ""
-
-                if image_url:
-                    replacement = (
-                        f'<img src="{image_url}" '
-                        'alt="Imagen generada" style="max-width:100%;height:auto;" />'
-                    )
-
-            # Reemplazamos la primera ocurrencia del placeholder
-            html_body = (
-                html_body[:pos_placeholder]
-                + replacement
-                + html_body[pos_placeholder + len(pattern):]
-            )
+        content = await generate_email_content(topic, image_expiration=EMAIL_IMAGE_EXPIRATION)
+        structure, html_body = content["structure"], content["html_body"]
 
         logging.info("Construyendo correo final...")
 
-        # Plantilla HTML final con estilos más neutrales y separaciones
-        full_html = f"""
-        <!DOCTYPE html>
-        <html lang="es">
-        <head>
-            <meta charset="UTF-8" />
-            <style>
-                body {{
-                    margin: 0;
-                    padding: 0;
-                    font-family: 'Helvetica Neue', Arial, sans-serif;
-                    background-color: #f2f2f2;
-                }}
-                .container {{
-                    max-width: 700px;
-                    margin: 40px auto;
-                    background-color: #ffffff;
-                    border-radius: 8px;
-                    box-shadow: 0 2px 8px rgba(0,0,0,0.15);
-                    padding: 30px;
-                }}
-                .header {{
-                    background-color: #555;
-                    text-align: center;
-                    padding: 40px 20px;
-                    border-radius: 8px 8px 0 0;
-                }}
-                .header h1 {{
-                    color: #fff;
-                    margin: 0;
-                    font-size: 34px;
-                }}
-                /* Estilos para contenido interno */
-                .content h2 {{
-                    margin-top: 30px;
-                    margin-bottom: 15px;
-                    font-size: 24px;
-                    color: #333;
-                }}
-                .content h3 {{
-                    margin-top: 25px;
-                    margin-bottom: 12px;
-                    font-size: 20px;
-                    color: #444;
-                }}
-                .content p {{
-                    margin-bottom: 18px;
-                    line-height: 1.6;
-                    font-size: 15px;
-                    color: #555;
-                }}
-                .content ul {{
-                    margin-left: 20px;
-                    margin-bottom: 18px;
-                    color: #555;
-                }}
-                .content li {{
-                    margin-bottom: 8px;
-                }}
-                .footer {{
-                    text-align: center;
-                    padding: 20px;
-                    font-size: 13px;
-                    color: #666;
-                    border-top: 1px solid #ddd;
-                    margin-top: 40px;
-                }}
-                .footer a {{
-                    color: #007BFF;
-                    text-decoration: none;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>{subject}</h1>
-                </div>
-                <div class="content">
-                    {html_body}
-                </div>
-                <div class="footer">
-                    <p>¿Tienes preguntas? <a href="mailto:soporte@ejemplo.com">Contáctanos</a></p>
-                    <p>Síguenos en 
-                        <a href="https://www.twitter.com">Twitter</a> | 
-                        <a href="https://www.facebook.com">Facebook</a>
-                    </p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+        # Plantilla HTML final (compilada una sola vez al importar el módulo)
+        full_html = EMAIL_HTML.render(
+            subject=html.escape(subject),
+            content=html_body,
+        )
 
         # Construimos el mensaje de correo
         msg = EmailMessage()
-        msg["From"] = os.getenv("EMAIL_USER")
+        msg["From"] = structured_email_smtp.username
         msg["To"] = ", ".join(recipients)
         msg["Subject"] = subject
 
         # Parte de texto alternativo
-        msg.set_content(
-            "Este correo está diseñado en HTML, por favor utiliza un cliente que lo soporte.\n\n"
-            f"Estructura:\n{structure}\n\n"
-            f"Contenido (HTML):\n{html_body}\n\n"
-            "Las imágenes se han subido a Imgbb tras generarse con Freepik."
-        )
+        msg.set_content(EMAIL_TEXT.render(structure=structure, content=html_body))
 
         # Parte HTML
         msg.add_alternative(full_html, subtype="html")
 
         # Credenciales de email
-        email_user = os.getenv("EMAIL_USER")
-        email_pass = os.getenv("EMAIL_PASS")
-        if not email_user or not email_pass:
+        if not structured_email_smtp.configured:
             raise HTTPException(500, "Credenciales de correo no configuradas.")
 
-        # Enviar correo
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(email_user, email_pass)
-            server.send_message(msg)
+        # Enviar correo por una conexión autenticada del pool (sin bloquear el event loop)
+        await structured_email_smtp.send(msg)
 
+        sent = True
         logging.info("Correo enviado exitosamente.")
-
-        # Borramos las imágenes de Imgbb con las delete_urls
-        for durl in delete_urls:
-            try:
-                requests.get(durl, timeout=10)
-            except Exception as ex:
-                logging.error(f"No se pudo borrar la imagen de Imgbb: {str(ex)}")
-
         return {"detail": "Correo enviado"}
 
     except openai.error.OpenAIError as e:
         logging.error(f"Error al interactuar con OpenAI: {e}")
         raise HTTPException(500, "Error al generar contenido con OpenAI.")
-    except smtplib.SMTPException as e:
+    except aiosmtplib.SMTPException as e:
         logging.error(f"Error al enviar el correo: {e}")
         raise HTTPException(500, "Error al enviar el correo.")
     except Exception as e:
         logging.error(f"Error inesperado: {e}")
         raise HTTPException(500, "Ha ocurrido un error inesperado.")
+    finally:
+        if content is not None:
+            # El borrado de las imágenes de Imgbb se programa siempre; la respuesta no
+            # espera a que se complete. Tras un envío se respeta el periodo de gracia
+            # para que los destinatarios puedan verlas; si falla, nadie las verá
+            try:
+                await imgbb_cleanup.enqueue(content["uploads"], grace=None if sent else 0)
+            except Exception:
+                logging.exception("No se pudo programar el borrado de las imágenes de Imgbb")
@@ -1,48 +1,77 @@
+import binascii
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from app.core.config import FREEPIK_API_KEY
-import requests
+from app.core.config import FREEPIK_API_KEY, FREEPIK_CACHE_MEMORY_BYTES, FREEPIK_CACHE_DIR, FREEPIK_CACHE_TTL
+from app.core import http_client
+from app.utils.generation_cache import GenerationCache
+from app.utils.image_handle import ImageHandle
 
 router = APIRouter()
 
+# Parámetros de estilo fijos que se envían junto al prompt (forman parte de la clave de caché)
+GENERATION_OPTIONS = {
+    "styling": {
+        "style": "digital-art",
+        "color": "vibrant",
+        "lightning": "studio",
+    },
+    "image": {"size": "square_1_1"}
+}
+
+generation_cache = GenerationCache(FREEPIK_CACHE_MEMORY_BYTES, FREEPIK_CACHE_DIR, FREEPIK_CACHE_TTL)
+
 # Definir un modelo de datos para validar el prompt
 class PromptRequest(BaseModel):
     prompt: str
+    use_cache: bool = True  # False para forzar una generación nueva
 
-@router.post("/freepik/generate_image")
-def generate_image_from_prompt(data: PromptRequest):
-    prompt = data.prompt
-    print("Dentro de la función para generar la imagen")
-    print(f"Prompt: {prompt}")
-    print(f"API Key: {FREEPIK_API_KEY}")
+async def generate_image(prompt: str, use_cache: bool = True) -> ImageHandle:
+    """
+    Genera una imagen con Freepik (o la recupera de la caché) y la devuelve
+    ya decodificada en binario. Lanza HTTPException si falla.
+    """
+    cache_key = GenerationCache.make_key(prompt, GENERATION_OPTIONS)
+    if use_cache:
+        cached = await generation_cache.get(cache_key)
+        if cached is not None:
+            return ImageHandle.from_bytes(cached)
 
     url = "https://api.freepik.com/v1/ai/text-to-image"
     headers = {
         "x-freepik-api-key": FREEPIK_API_KEY,
         "Content-Type": "application/json"
     }
-    payload = {
-        "prompt": prompt,
-        "styling": {
-            "style": "digital-art",
-            "color": "vibrant",
-            "lightning": "studio",
-        },
-        "image": {"size": "square_1_1"}
-    }
+    payload = {"prompt": prompt, **GENERATION_OPTIONS}
 
     # Realizar la solicitud a la API de Freepik
-    response = requests.post(url, json=payload, headers=headers)
+    response = await http_client.post(url, json=payload, headers=headers)
 
     # Procesar la respuesta de la API
     if response.status_code == 200:
         try:
-            image_base64 = response.json()["data"][0]["base64"]
-            return {"message": "Imagen generada correctamente", "image_base64": image_base64}
-        except (KeyError, IndexError, TypeError):
+            image = ImageHandle.from_base64(response.json()["data"][0]["base64"])
+        except (KeyError, IndexError, TypeError, binascii.Error):
             raise HTTPException(
                 status_code=500, detail="Error al obtener la imagen generada en formato base64"
             )
+        await generation_cache.put(cache_key, image.data)
+        return image
     else:
         error_message = response.json().get("error", "Error desconocido al generar la imagen")
         raise HTTPException(status_code=response.status_code, detail=f"Error en Freepik API: {error_message}")
+
+@router.post("/freepik/generate_image")
+async def generate_image_from_prompt(data: PromptRequest):
+    prompt = data.prompt
+    print("Dentro de la función para generar la imagen")
+    print(f"Prompt: {prompt}")
+    print(f"API Key: {FREEPIK_API_KEY}")
+
+    image = await generate_image(prompt, use_cache=data.use_cache)
+    # La API pública sigue devolviendo base64; internamente se usa el binario
+    return {"message": "Imagen generada correctamente", "image_base64": image.to_base64()}
+
+@router.get("/freepik/cache/stats")
+def get_cache_stats():
+    """Contadores de aciertos/fallos de la caché de generaciones."""
+    return generation_cache.stats()
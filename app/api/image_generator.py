@@ -1,36 +1,182 @@
-from fastapi import APIRouter
-from app.core.config import processor, model_blip, pipe, device
-from PIL import Image
-import torch
-import os
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
 from io import BytesIO
+from typing import Optional
+
+from fastapi import APIRouter, File, HTTPException, Query, Response, UploadFile
+from PIL import Image
+
+from app.core.batching import MicroBatcher
+from app.core.config import (
+    INFERENCE_MAX_BATCH_SIZE,
+    INFERENCE_MAX_DELAY,
+    INFERENCE_MAX_PENDING,
+    INFERENCE_WARMUP_MODELS,
+    CAPTION_CACHE_SIZE,
+)
+from app.core.executors import start_inference_executor, stop_inference_executor
+from app.core.models import (
+    ModelUnavailableError,
+    get_caption_model,
+    get_device,
+    get_diffusion_pipeline,
+    model_registry,
+)
 
 router = APIRouter()
 
-@router.post("/ia/generate_image")
-def generar_imagen(prompt: str):
-    try:
-        with torch.no_grad():
-            image = pipe(prompt).images[0]
-        
+# Descripciones ya generadas, por hash del contenido de la imagen (LRU)
+_caption_cache: "OrderedDict[str, str]" = OrderedDict()
+
+def generate_batch(prompts: list[str]) -> list[bytes]:
+    """Una sola pasada de Stable Diffusion para todo el lote; devuelve JPEG por prompt."""
+    pipe = get_diffusion_pipeline()
+    import torch
+
+    with torch.no_grad():
+        images = pipe(prompts).images
+
+    results = []
+    for image in images:
         # Guardar la imagen en memoria (BytesIO)
         buffered = BytesIO()
         image.save(buffered, format="JPEG")
-        buffered.seek(0)
-        
-        # Retornar la imagen en bytes
-        return {"message": "Imagen generada correctamente", "image_bytes": buffered.getvalue()}
-    except Exception as e:
-        return {"error": str(e)}
+        results.append(buffered.getvalue())
+    return results
 
-@router.post("/ia/describe_image")
-def describir_imagen(image_path: str):
-    try:
-        image = Image.open(image_path).convert('RGB')
-        inputs = processor(image, return_tensors="pt").to(device)
+def caption_batch(images: list[bytes]) -> list:
+    """
+    Una sola llamada a generate de BLIP para todo el lote. Las imágenes que no
+    se pueden decodificar no entran en la pasada y reciben su propio error.
+    """
+    results: list = [None] * len(images)
+    valid, pil_images = [], []
+    for index, data in enumerate(images):
+        try:
+            pil_images.append(Image.open(BytesIO(data)).convert('RGB'))
+            valid.append(index)
+        except Exception as e:
+            results[index] = ValueError(f"Imagen no válida: {e}")
+
+    if pil_images:
+        processor, model_blip = get_caption_model()
+        import torch
+
+        inputs = processor(images=pil_images, return_tensors="pt").to(get_device())
         with torch.no_grad():
             out = model_blip.generate(**inputs, max_new_tokens=100)
-        caption = processor.decode(out[0], skip_special_tokens=True)
-        return {"caption": caption}
+        for index, caption in zip(valid, processor.batch_decode(out, skip_special_tokens=True)):
+            results[index] = caption
+    return results
+
+generation_batcher = MicroBatcher(
+    "stable-diffusion", generate_batch, INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_DELAY, INFERENCE_MAX_PENDING
+)
+caption_batcher = MicroBatcher(
+    "blip", caption_batch, INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_DELAY, INFERENCE_MAX_PENDING
+)
+
+_warmup_task: Optional[asyncio.Task] = None
+
+async def _warmup_on_start(names: list[str]) -> None:
+    try:
+        await model_registry.warmup(names)
+    except Exception as e:
+        logging.error(f"No se pudieron precargar los modelos {names}: {e}")
+
+async def start_inference_servers() -> None:
+    global _warmup_task
+    # Ambos modelos comparten un único hilo: una pasada de inferencia a la vez
+    executor = start_inference_executor()
+    model_registry.start(executor)
+    generation_batcher.start(executor)
+    caption_batcher.start(executor)
+    # Los modelos se cargan en su primer uso salvo los indicados para precarga
+    if INFERENCE_WARMUP_MODELS:
+        _warmup_task = asyncio.create_task(_warmup_on_start(INFERENCE_WARMUP_MODELS))
+
+async def stop_inference_servers() -> None:
+    global _warmup_task
+    if _warmup_task is not None:
+        _warmup_task.cancel()
+        _warmup_task = None
+    await generation_batcher.stop()
+    await caption_batcher.stop()
+    await model_registry.stop()
+    stop_inference_executor()
+    _caption_cache.clear()
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+async def _run(batcher: MicroBatcher, item):
+    try:
+        return await batcher.submit(item)
+    except ModelUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
-        return {"error": str(e)}
+        logging.error(f"Error de inferencia en '{batcher.name}': {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/ia/generate_image", response_class=Response)
+async def generar_imagen(prompt: str):
+    """
+    Genera una imagen con Stable Diffusion y la devuelve como image/jpeg.
+    Las peticiones concurrentes se agrupan en lotes (una pasada por lote).
+    """
+    image_bytes = await _run(generation_batcher, prompt)
+    return Response(content=image_bytes, media_type="image/jpeg")
+
+@router.post("/ia/describe_image")
+async def describir_imagen(image: Optional[UploadFile] = File(None), image_path: Optional[str] = None):
+    """
+    Describe una imagen con BLIP. La imagen se sube como fichero ('image') o,
+    como hasta ahora, se indica una ruta local del servidor ('image_path').
+    """
+    if image is not None:
+        data = await image.read()
+    elif image_path:
+        try:
+            data = await asyncio.to_thread(_read_file, image_path)
+        except OSError as e:
+            raise HTTPException(status_code=400, detail=f"No se pudo leer la imagen: {e}")
+    else:
+        raise HTTPException(status_code=400, detail="Indica una imagen ('image') o una ruta ('image_path')")
+
+    key = hashlib.sha256(data).hexdigest()
+    caption = _caption_cache.get(key)
+    if caption is not None:
+        _caption_cache.move_to_end(key)
+        return {"caption": caption, "cached": True}
+
+    caption = await _run(caption_batcher, data)
+    _caption_cache[key] = caption
+    if len(_caption_cache) > CAPTION_CACHE_SIZE:
+        _caption_cache.popitem(last=False)
+    return {"caption": caption, "cached": False}
+
+@router.post("/ia/warmup")
+async def warmup_models(models: list[str] = Query(None)):
+    """
+    Carga por adelantado los modelos indicados (por defecto, todos) para que
+    la primera petición no pague el arranque en frío.
+    """
+    names = models or list(model_registry.status())
+    try:
+        return {"models": await model_registry.warmup(names)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ModelUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@router.get("/ia/models")
+async def list_models():
+    """Estado de los modelos locales: cargados, tiempo sin uso y tiempo de carga."""
+    return {"models": model_registry.status(), "caption_cache_entries": len(_caption_cache)}
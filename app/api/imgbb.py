@@ -1,33 +1,51 @@
+import time
+from typing import Optional
 from fastapi import APIRouter, HTTPException
 from app.core.config import IMGBB_API_KEY
-import requests
-import base64
+from app.core import http_client
+from app.utils.image_handle import ImageHandle
 
 router = APIRouter()
 
-@router.post("/imgbb/upload")
-def upload_image_to_imgbb(base64_image: str, expiration: int = 60) -> dict:
+async def upload_image(image: ImageHandle, expiration: Optional[int] = 60) -> dict:
     """
-    Sube una imagen en base64 a Imgbb y devuelve tanto la URL pública como la delete_url.
-    Lanza HTTPException si falla.
+    Sube una imagen en binario a Imgbb (multipart, por bloques) y devuelve
+    la URL pública, la delete_url y 'expires_at' (instante Unix en que Imgbb
+    la eliminará, o None si no caduca). Lanza HTTPException si falla.
+    Con expiration=None la imagen no caduca.
     """
     url = "https://api.imgbb.com/1/upload"
-    payload = {
-        "key": IMGBB_API_KEY,
-        "image": base64_image,
-        "expiration": expiration
-    }
-    response = requests.post(url, data=payload)
+    payload = {"key": IMGBB_API_KEY}
+    if expiration is not None:
+        payload["expiration"] = expiration
+    files = {"image": (image.filename, image.as_file(), image.content_type)}
+    response = await http_client.post(url, data=payload, files=files)
     if response.status_code == 200:
         try:
             data = response.json()["data"]
             # data["url"] -> enlace directo
             # data["delete_url"] -> enlace para borrarla
+            # data["time"] + data["expiration"] -> momento en que Imgbb la elimina ("0" si no caduca)
+            expires_in = int(data.get("expiration") or expiration or 0)
+            expires_at = float(data.get("time") or time.time()) + expires_in if expires_in else None
             return {
                 "url": data["url"],
-                "delete_url": data["delete_url"]
+                "delete_url": data["delete_url"],
+                "expires_at": expires_at
             }
-        except (KeyError, TypeError):
+        except (KeyError, TypeError, ValueError):
             raise HTTPException(500, "Error al procesar la respuesta de Imgbb.")
     else:
         raise HTTPException(response.status_code, f"Error al subir la imagen a Imgbb: {response.text}")
+
+@router.post("/imgbb/upload")
+async def upload_image_to_imgbb(base64_image: str, expiration: int = 60) -> dict:
+    """
+    Sube una imagen en base64 a Imgbb y devuelve tanto la URL pública como la delete_url.
+    Lanza HTTPException si falla.
+    """
+    try:
+        image = ImageHandle.from_base64(base64_image)
+    except ValueError:
+        raise HTTPException(400, "La imagen no es un base64 válido.")
+    return await upload_image(image, expiration=expiration)
@@ -1,110 +1,251 @@
 # app/api/instagram.py
 
+import asyncio
+import json
+from typing import AsyncIterator
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.core.config import INSTA_USER_ID, INSTA_ACCESS_TOKEN, IMGBB_API_KEY
-import requests
+from app.core.config import (
+    INSTA_USER_ID,
+    INSTA_ACCESS_TOKEN,
+    INSTAGRAM_POLL_INITIAL_DELAY,
+    INSTAGRAM_POLL_MAX_DELAY,
+    INSTAGRAM_CONTAINER_TIMEOUT,
+    INSTAGRAM_MEDIA_TTL,
+    INSTAGRAM_MEDIA_MAX_PAGES,
+    INSTAGRAM_MEDIA_FULL_REFRESH,
+)
+from app.core import http_client
 from app.dependencies import verify_token
+from app.api.imgbb import upload_image
+from app.core.executors import run_image_task
+from app.utils.image_handle import ImageHandle, InvalidImageError
+from app.utils.media_cache import MediaCache
 
 router = APIRouter()
 
+# Límites de la Graph API para publicaciones tipo carrusel
+MIN_CAROUSEL_ITEMS = 2
+MAX_CAROUSEL_ITEMS = 10
+
+media_cache = MediaCache(INSTAGRAM_MEDIA_TTL, INSTAGRAM_MEDIA_FULL_REFRESH)
+
 # Definimos ImageUploadModel para validar los datos recibidos
 class ImageUploadModel(BaseModel):
     image_base64: str
     caption: str = ''
 
+class CarouselUploadModel(BaseModel):
+    image_urls: list[str]
+    caption: str = ''
+
 @router.get("/instagram/login")
-def instagram_login(user=Depends(verify_token)):
+async def instagram_login(user=Depends(verify_token)):
     url = f"https://graph.instagram.com/{INSTA_USER_ID}?fields=id,username&access_token={INSTA_ACCESS_TOKEN}"
-    response = requests.get(url)
+    response = await http_client.get(url)
     if response.status_code == 200:
         data = response.json()
         return {"username": data['username'], "id": data['id']}
     else:
         return {"error": response.json().get('error', {}).get('message', 'Error desconocido')}
 
+class MediaFetchError(Exception):
+    pass
+
+async def iter_media_pages() -> AsyncIterator[list[dict]]:
+    """Recorre las páginas del listado de media siguiendo los cursores paging.next."""
+    url = f"https://graph.instagram.com/{INSTA_USER_ID}/media"
+    params = {'fields': 'id,caption,media_url,media_type', 'limit': 100, 'access_token': INSTA_ACCESS_TOKEN}
+    for _ in range(INSTAGRAM_MEDIA_MAX_PAGES):
+        response = await http_client.get(url, params=params)
+        if response.status_code != 200:
+            raise MediaFetchError(response.json().get('error', {}).get('message', 'Error desconocido'))
+        body = response.json()
+        yield body.get('data', [])
+        url = body.get('paging', {}).get('next')
+        if not url:
+            return
+        # La URL de paging.next ya incluye todos los parámetros
+        params = None
+
 @router.get("/instagram/media")
-def get_user_media(user=Depends(verify_token)):
-    url = f"https://graph.instagram.com/{INSTA_USER_ID}/media?fields=id,caption,media_url,media_type&access_token={INSTA_ACCESS_TOKEN}"
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json().get('data', [])
-    else:
-        return {"error": response.json().get('error', {}).get('message', 'Error desconocido')}
+async def get_user_media(refresh: bool = False, user=Depends(verify_token)):
+    try:
+        return [item async for item in media_cache.stream(iter_media_pages, force_full=refresh)]
+    except MediaFetchError as e:
+        return {"error": str(e)}
 
-@router.post("/instagram/upload_image")
-def post_image_to_instagram(image_url: str, caption: str = '', user=Depends(verify_token)):
+@router.get("/instagram/media/stream")
+async def stream_user_media(refresh: bool = False, user=Depends(verify_token)):
+    """Devuelve el listado de media como NDJSON, un item por línea, según llega."""
+    async def ndjson():
+        try:
+            async for item in media_cache.stream(iter_media_pages, force_full=refresh):
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        except MediaFetchError as e:
+            yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+async def _create_container(payload: dict) -> str:
     upload_url = f"https://graph.instagram.com/{INSTA_USER_ID}/media"
-    payload = {
-        'image_url': image_url,
-        'caption': caption,
-        'access_token': INSTA_ACCESS_TOKEN
-    }
-    response = requests.post(upload_url, data=payload)
-    if response.status_code == 200:
-        media_id = response.json().get('id')
-        publish_url = f"https://graph.instagram.com/{INSTA_USER_ID}/media_publish"
-        publish_payload = {
-            'creation_id': media_id,
-            'access_token': INSTA_ACCESS_TOKEN
-        }
-        publish_response = requests.post(publish_url, data=publish_payload)
-        if publish_response.status_code == 200:
-            return {"message": "Imagen publicada con éxito"}
-        else:
-            return {"error": "Error al publicar la imagen"}
-    else:
-        return {"error": "Error al subir la imagen"}
+    response = await http_client.post(upload_url, data={**payload, 'access_token': INSTA_ACCESS_TOKEN})
+    if response.status_code != 200:
+        raise HTTPException(status_code=500, detail="Error al subir la imagen")
+    return response.json().get('id')
 
-@router.post("/instagram/upload_image_base64")
-def post_image_to_instagram_base64(data: ImageUploadModel, user=Depends(verify_token)):
-    image_base64 = data.image_base64
-    caption = data.caption
-    # Subir la imagen a IMGBB para obtener una URL pública
-    imgbb_url = "https://api.imgbb.com/1/upload"
-    payload = {
-        "key": IMGBB_API_KEY,
-        "image": image_base64,
-    }
+async def create_media_container(image_url: str, caption: str = '', is_carousel_item: bool = False) -> str:
+    """
+    Crea el contenedor de media en Instagram para una imagen pública y
+    devuelve su id. Lanza HTTPException si falla.
+    """
+    if is_carousel_item:
+        return await _create_container({'image_url': image_url, 'is_carousel_item': 'true'})
+    return await _create_container({'image_url': image_url, 'caption': caption})
 
-    imgbb_response = requests.post(imgbb_url, data=payload)
-
-    if imgbb_response.status_code == 200:
-        imgbb_data = imgbb_response.json().get("data", {})
-        image_url = imgbb_data.get("url")
-
-        # Publicar la imagen en Instagram
-        insta_url = f"https://graph.instagram.com/{INSTA_USER_ID}/media"
-        insta_payload = {
-            "image_url": image_url,
-            "caption": caption,
-            "access_token": INSTA_ACCESS_TOKEN,
-        }
-
-        insta_response = requests.post(insta_url, data=insta_payload)
-        if insta_response.status_code == 200:
-            media_id = insta_response.json().get("id")
-            publish_url = f"https://graph.instagram.com/{INSTA_USER_ID}/media_publish"
-            publish_payload = {
-                "creation_id": media_id,
-                "access_token": INSTA_ACCESS_TOKEN,
-            }
-
-            publish_response = requests.post(publish_url, data=publish_payload)
-            if publish_response.status_code == 200:
-                return {"message": "Imagen publicada con éxito en Instagram"}
-            else:
-                raise HTTPException(
-                    status_code=500,
-                    detail="Error al publicar la imagen en Instagram"
-                )
-        else:
+async def wait_for_container(container_id: str, timeout: float = INSTAGRAM_CONTAINER_TIMEOUT) -> None:
+    """
+    Consulta el status_code del contenedor con backoff exponencial hasta que
+    Instagram lo marca como FINISHED. Solo se sigue esperando mientras está
+    IN_PROGRESS o la Graph API responde 5xx; un 4xx (token caducado, id no
+    válido) o cualquier otro estado falla en el acto. Lanza HTTPException
+    también si se agota el tiempo.
+    """
+    status_url = f"https://graph.instagram.com/{container_id}"
+    params = {'fields': 'status_code', 'access_token': INSTA_ACCESS_TOKEN}
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = INSTAGRAM_POLL_INITIAL_DELAY
+    while True:
+        response = await http_client.get(status_url, params=params)
+        if response.status_code == 200:
+            status = response.json().get('status_code')
+            if status == 'FINISHED':
+                return
+            if status != 'IN_PROGRESS':
+                raise HTTPException(status_code=500, detail=f"El contenedor {container_id} terminó con estado {status}")
+        elif response.status_code < 500:
             raise HTTPException(
                 status_code=500,
-                detail="Error al crear media en Instagram"
+                detail=f"Error al consultar el contenedor {container_id} (HTTP {response.status_code}): {response.text}",
             )
-    else:
+        if loop.time() + delay > deadline:
+            raise HTTPException(status_code=504, detail=f"El contenedor {container_id} no terminó de procesarse a tiempo")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, INSTAGRAM_POLL_MAX_DELAY)
+
+async def publish_media_container(container_id: str) -> str:
+    """
+    Espera a que el contenedor esté procesado, lo publica y devuelve el id
+    del media publicado. Lanza HTTPException si falla.
+    """
+    await wait_for_container(container_id)
+    publish_url = f"https://graph.instagram.com/{INSTA_USER_ID}/media_publish"
+    publish_payload = {
+        'creation_id': container_id,
+        'access_token': INSTA_ACCESS_TOKEN
+    }
+    publish_response = await http_client.post(publish_url, data=publish_payload)
+    if publish_response.status_code != 200:
+        raise HTTPException(status_code=500, detail="Error al publicar la imagen")
+    # La nueva publicación debe aparecer en el próximo listado
+    media_cache.invalidate()
+    return publish_response.json().get('id')
+
+async def publish_carousel(image_urls: list[str], caption: str = '') -> str:
+    """
+    Publica un carrusel: crea en paralelo un contenedor hijo por imagen,
+    espera a que todos estén procesados y publica el contenedor CAROUSEL
+    en una sola llamada. Devuelve el id del media publicado.
+    """
+    if not MIN_CAROUSEL_ITEMS <= len(image_urls) <= MAX_CAROUSEL_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Un carrusel admite entre {MIN_CAROUSEL_ITEMS} y {MAX_CAROUSEL_ITEMS} imágenes"
+        )
+    children = await asyncio.gather(
+        *(create_media_container(url, is_carousel_item=True) for url in image_urls)
+    )
+    await asyncio.gather(*(wait_for_container(child) for child in children))
+    carousel_id = await _create_container({
+        'media_type': 'CAROUSEL',
+        'children': ','.join(children),
+        'caption': caption,
+    })
+    return await publish_media_container(carousel_id)
+
+@router.post("/instagram/upload_image")
+async def post_image_to_instagram(image_url: str, caption: str = '', user=Depends(verify_token)):
+    try:
+        media_id = await create_media_container(image_url, caption)
+        await publish_media_container(media_id)
+    except HTTPException as e:
+        return {"error": e.detail}
+    return {"message": "Imagen publicada con éxito"}
+
+@router.post("/instagram/upload_carousel")
+async def post_carousel_to_instagram(data: CarouselUploadModel, user=Depends(verify_token)):
+    media_id = await publish_carousel(data.image_urls, data.caption)
+    return {"message": "Carrusel publicado con éxito", "media_id": media_id}
+
+async def _upload_and_publish(image: ImageHandle, caption: str) -> str:
+    """Sube la imagen a IMGBB y la publica en Instagram; devuelve el id de la publicación."""
+    try:
+        imgbb_data = await upload_image(image, expiration=None)
+    except HTTPException:
         raise HTTPException(
             status_code=500,
             detail="Error al subir la imagen a IMGBB"
         )
+    image_url = imgbb_data["url"]
+
+    # Publicar la imagen en Instagram
+    try:
+        media_id = await create_media_container(image_url, caption)
+    except HTTPException:
+        raise HTTPException(
+            status_code=500,
+            detail="Error al crear media en Instagram"
+        )
+    try:
+        return await publish_media_container(media_id)
+    except HTTPException:
+        raise HTTPException(
+            status_code=500,
+            detail="Error al publicar la imagen en Instagram"
+        )
+
+@router.post("/instagram/upload_image_base64")
+async def post_image_to_instagram_base64(data: ImageUploadModel, user=Depends(verify_token)):
+    # Importación diferida: dedup carga PIL, innecesario hasta la primera imagen
+    from app.utils.dedup import dhash, dedup_index, resolve_duplicate
+
+    caption = data.caption
+    # Decodificamos el base64 una sola vez y subimos el binario a IMGBB para obtener una URL pública
+    try:
+        image = ImageHandle.from_base64(data.image_base64)
+    except ValueError:
+        # binascii.Error (relleno o caracteres incorrectos) es un ValueError: error del cliente
+        raise HTTPException(
+            status_code=400,
+            detail="La imagen en base64 no es válida"
+        )
+
+    # Los reenvíos de la misma imagen devuelven la publicación existente sin llamar a IMGBB ni a Instagram.
+    # El hash queda reservado mientras se publica para que una copia simultánea también se detecte
+    try:
+        image_hash = await run_image_task(dhash, image.data)
+    except InvalidImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    duplicate = resolve_duplicate(image_hash, {"pending": True})
+    if duplicate is not None:
+        return duplicate
+
+    try:
+        published_id = await _upload_and_publish(image, caption)
+    except BaseException:
+        dedup_index.discard(image_hash)
+        raise
+    dedup_index.add(image_hash, {"media_id": published_id})
+    return {"message": "Imagen publicada con éxito en Instagram"}
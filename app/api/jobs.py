@@ -0,0 +1,25 @@
+from fastapi import APIRouter, HTTPException
+from app.core.jobs import job_queue
+
+router = APIRouter()
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    Devuelve el estado de un trabajo en segundo plano: etapa actual,
+    intentos, checkpoints de las etapas completadas y último error.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return {
+        "id": job["id"],
+        "pipeline": job["pipeline"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "attempts": job["attempts"],
+        "checkpoints": job["checkpoints"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
@@ -1,89 +1,480 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 import scrapy
+from scrapy import signals
 from scrapy.crawler import CrawlerRunner
-from scrapy.signalmanager import dispatcher
-from twisted.internet import reactor, defer
-from twisted.internet.task import LoopingCall
-from typing import List
+from scrapy.utils.defer import deferred_from_coro
+from scrapy.exceptions import DontCloseSpider
+from twisted.internet import reactor
+from typing import AsyncIterator, List, Literal, Optional
+from urllib.parse import urlsplit
 import threading
 import asyncio
-import re
+import heapq
+import itertools
+import json
+import logging
+import sqlite3
+import uuid
+
+from app.core.config import (
+    SCRAPER_CONCURRENT_REQUESTS,
+    SCRAPER_CONCURRENT_REQUESTS_PER_DOMAIN,
+    SCRAPER_URL_TIMEOUT,
+    SCRAPER_CRAWL_MAX_DEPTH,
+    SCRAPER_CRAWL_MAX_PAGES,
+    SCRAPER_CACHE_PATH,
+    SCRAPER_CACHE_TTL,
+    SCRAPER_CACHE_MAX_AGE,
+    SCRAPER_INDEX_PATH,
+)
+from app.utils.page_cache import PageCache
+from app.utils.search_index import SearchIndex
+from app.utils.bloom import BloomFilter
+from app.utils.text_extraction import parse_document, extract_text_from_tree, extract_links
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+page_cache = PageCache(SCRAPER_CACHE_PATH, SCRAPER_CACHE_TTL, SCRAPER_CACHE_MAX_AGE)
+search_index = SearchIndex(SCRAPER_INDEX_PATH)
+
+# Opciones del modo rastreo (seguir enlaces)
+class CrawlOptions(BaseModel):
+    max_depth: int = Field(1, ge=1, le=SCRAPER_CRAWL_MAX_DEPTH)
+    max_pages: int = Field(50, ge=1, le=SCRAPER_CRAWL_MAX_PAGES)
+    scope: Literal["same_domain", "allow_list"] = "same_domain"
+    allowed_domains: List[str] = []
+
 # Modelo de entrada
 class ScraperRequest(BaseModel):
     urls: List[str]
+    crawl: Optional[CrawlOptions] = None  # Si se indica, se siguen los enlaces de las páginas
+    timeout: Optional[float] = None  # Segundos por URL; por defecto SCRAPER_URL_TIMEOUT
+    use_cache: bool = True  # False para ignorar la caché de páginas y descargar de nuevo
+
+def _host(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+def _crawl_scope(seeds: list[str], options: CrawlOptions) -> set:
+    if options.scope == "allow_list":
+        return {domain.lower() for domain in options.allowed_domains}
+    return {_host(url) for url in seeds}
 
-# Función para limpiar texto
-def clean_text(text):
-    return re.sub(r'[\\|\\n\\*\\t\\s_(\\u2014\\u00d7#%\\u2013\\u00a9\\ud83d\\udd53\\u2582\\ud83c\\udfcd\\ufe0f\\ud83d\\udd73\\u2022\\u00ae\\xb7\\u2715),;-]+', ' ', text)
+def _in_scope(url: str, allowed: set) -> bool:
+    host = _host(url)
+    return any(host == domain or host.endswith("." + domain) for domain in allowed)
 
-# Spider de Scrapy
+def _header(response, name: bytes) -> Optional[str]:
+    value = response.headers.get(name)
+    return value.decode("latin-1") if value else None
+
+# Spider de Scrapy: permanece abierto y recibe peticiones de todas las llamadas a /scrape
 class MySpider(scrapy.Spider):
     name = "fastapi_spider"
 
-    def __init__(self, urls, result_dict, *args, **kwargs):
+    def __init__(self, service, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.start_urls = urls
-        self.result_dict = result_dict
+        self.service = service
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.spider_idle, signal=signals.spider_idle)
+        return spider
+
+    def spider_idle(self, spider):
+        # Sin peticiones pendientes el spider no se cierra: espera a la siguiente llamada
+        raise DontCloseSpider
+
+    def start_requests(self):
+        return []
 
     def parse(self, response):
-        visible_content = response.css('body *:not(style):not(script)::text').getall()
-        cleaned_content = [clean_text(content.strip()) for content in visible_content if content.strip()]
-        self.result_dict[response.url] = " ".join(cleaned_content)
-
-# Inicialización del CrawlerRunner
-runner = CrawlerRunner()
-twisted_thread = None
-
-# Función para iniciar el reactor en un hilo separado
-def start_reactor():
-    global twisted_thread
-    if not twisted_thread or not twisted_thread.is_alive():
-        twisted_thread = threading.Thread(target=reactor.run, kwargs={"installSignalHandlers": False})
-        twisted_thread.daemon = True
-        twisted_thread.start()
-
-# Función para ejecutar el Spider
-def run_spider(urls):
-    result_dict = {}
-    deferred = defer.Deferred()
-
-    @defer.inlineCallbacks
-    def _crawl():
+        if response.status == 304:
+            # La página no ha cambiado: reutilizamos el texto ya extraído
+            self.service.deliver(response.meta["scrape_id"], {
+                "url": response.meta["source_url"],
+                "content": response.meta["cached_content"],
+                "cached": True,
+                "cache": {"revalidated": True},
+            })
+            return
+        root = parse_document(response.body, encoding=response.encoding)
+        item = {
+            "url": response.meta["source_url"],
+            "content": extract_text_from_tree(root) if root is not None else "",
+            "cache": {
+                "etag": _header(response, b"ETag"),
+                "last_modified": _header(response, b"Last-Modified"),
+                "body": response.body,
+            },
+        }
+        if response.meta.get("extract_links") and root is not None:
+            item["links"] = extract_links(root, response.url)
+        self.service.deliver(response.meta["scrape_id"], item)
+
+    def errback(self, failure):
+        meta = failure.request.meta
+        self.service.deliver(meta["scrape_id"], {
+            "url": meta["source_url"],
+            "error": failure.getErrorMessage(),
+        })
+
+# El reactor de Twisted no se puede reiniciar una vez detenido: se arranca una
+# sola vez por proceso en un hilo propio y lo reutilizan todos los arranques del servicio
+_reactor_thread: Optional[threading.Thread] = None
+_reactor_lock = threading.Lock()
+
+def _ensure_reactor() -> None:
+    global _reactor_thread
+    with _reactor_lock:
+        if _reactor_thread is None:
+            _reactor_thread = threading.Thread(
+                target=reactor.run, kwargs={"installSignalHandlers": False}, name="twisted-reactor", daemon=True
+            )
+            _reactor_thread.start()
+        elif not _reactor_thread.is_alive():
+            raise RuntimeError("El reactor de Twisted se ha detenido y no se puede reiniciar en este proceso")
+
+class ScraperService:
+    """
+    Servicio de scraping de larga duración: un crawler compartido por todas
+    las peticiones, con concurrencia limitada por dominio, sobre el reactor de
+    Twisted del proceso. Los resultados de cada URL se entregan al event loop
+    de asyncio en cuanto termina su 'parse'. stop() solo detiene el crawler,
+    así que el servicio se puede volver a arrancar (p. ej. en otro lifespan).
+    """
+
+    def __init__(self, settings: dict):
+        self.settings = settings
+        self._runner: Optional[CrawlerRunner] = None
+        self._crawler = None
+        # scrape_id -> (event loop, cola de resultados)
+        self._sinks: dict[str, tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = {}
+
+    async def start(self) -> None:
+        if self._crawler is not None:
+            return
+        loop = asyncio.get_running_loop()
+        opened = loop.create_future()
+
+        def _resolve(exception: Optional[BaseException] = None) -> None:
+            if opened.done():
+                return
+            if exception is None:
+                opened.set_result(None)
+            else:
+                opened.set_exception(exception)
+
+        def _start_crawl():
+            self._runner = CrawlerRunner(self.settings)
+            crawler = self._runner.create_crawler(MySpider)
+            crawler.signals.connect(
+                lambda spider: loop.call_soon_threadsafe(_resolve), signal=signals.spider_opened, weak=False
+            )
+            self._crawler = crawler
+            deferred = self._runner.crawl(crawler, service=self)
+            deferred.addErrback(lambda failure: loop.call_soon_threadsafe(_resolve, failure.value))
+
+        _ensure_reactor()
+        reactor.callFromThread(_start_crawl)
+        await asyncio.wait_for(opened, timeout=30)
+        logger.info("Servicio de scraping iniciado")
+
+    async def stop(self) -> None:
+        if self._crawler is None:
+            return
+
+        loop = asyncio.get_running_loop()
+        stopped = loop.create_future()
+
+        def _resolve() -> None:
+            if not stopped.done():
+                stopped.set_result(None)
+
+        def _stop():
+            # Se detiene el crawler directamente: CrawlerRunner.stop() itera un conjunto
+            # que se modifica durante la parada en versiones recientes de Scrapy.
+            # El reactor sigue en marcha para los siguientes arranques
+            stop_async = getattr(self._crawler, "stop_async", None)
+            deferred = deferred_from_coro(stop_async()) if stop_async else self._crawler.stop()
+            deferred.addBoth(lambda _: loop.call_soon_threadsafe(_resolve))
+
+        reactor.callFromThread(_stop)
+        try:
+            await asyncio.wait_for(stopped, timeout=10)
+        except asyncio.TimeoutError:
+            logger.warning("El crawler no se detuvo en 10 segundos")
+        self._crawler = None
+        self._runner = None
+        page_cache.close()
+        search_index.close()
+        logger.info("Servicio de scraping detenido")
+
+    def deliver(self, scrape_id: str, item: dict) -> None:
+        """Se llama desde el hilo del reactor; reenvía el resultado al event loop."""
+        sink = self._sinks.get(scrape_id)
+        if sink is None:
+            return  # El cliente ya no espera este resultado
+        loop, queue = sink
         try:
-            yield runner.crawl(MySpider, urls=urls, result_dict=result_dict)
-            deferred.callback(result_dict)
-        except Exception as e:
-            deferred.errback(e)
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            pass  # Event loop cerrado
+
+    def _build_request(
+        self, url: str, scrape_id: str, timeout: float, cached: Optional[dict] = None, extract_links: bool = False
+    ) -> scrapy.Request:
+        spider = self._crawler.spider
+        meta = {
+            "scrape_id": scrape_id,
+            "source_url": url,
+            "download_timeout": timeout,
+            # 'timeout' es el plazo de la URL: con los reintentos por defecto de
+            # RetryMiddleware una URL podría tardar hasta 3 veces más
+            "max_retry_times": 0,
+            "extract_links": extract_links,
+        }
+        headers = {}
+        if cached is not None:
+            # Petición condicional: si la página no ha cambiado el servidor responde 304
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+            if headers:
+                meta["cached_content"] = cached["content"]
+                meta["handle_httpstatus_list"] = [304]
+        return scrapy.Request(
+            url,
+            callback=spider.parse,
+            errback=spider.errback,
+            # El motor es compartido y de larga duración: el filtro de duplicados
+            # de Scrapy impediría volver a descargar una URL en otra llamada
+            dont_filter=True,
+            headers=headers,
+            meta=meta,
+        )
 
-    reactor.callFromThread(_crawl)
-    return deferred
+    def _schedule(self, requests: list) -> None:
+        for request in requests:
+            self._crawler.engine.crawl(request)
 
-# Convertir Deferred de Twisted en asyncio.Future
-def deferred_to_future(d):
-    future = asyncio.Future()
+    async def _persist(self, item: dict) -> None:
+        """Guarda un resultado descargado en la caché de páginas y en el índice de búsqueda."""
+        cache_update = item.pop("cache", None)
+        if cache_update is None:
+            return
+        try:
+            if cache_update.get("revalidated"):
+                await asyncio.to_thread(page_cache.touch, item["url"])
+            else:
+                await asyncio.to_thread(
+                    page_cache.put,
+                    item["url"],
+                    cache_update["etag"],
+                    cache_update["last_modified"],
+                    cache_update["body"],
+                    item["content"],
+                )
+                # Solo se reindexa si el hash del contenido ha cambiado
+                await asyncio.to_thread(search_index.index, item["url"], item["content"])
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo guardar el resultado de {item['url']}: {e}")
 
-    def callback(result):
-        if not future.cancelled():
-            future.set_result(result)
+    def _cached_links(self, url: str) -> list[str]:
+        body = page_cache.get_body(url)
+        root = parse_document(body) if body else None
+        return extract_links(root, url) if root is not None else []
 
-    def errback(error):
-        if not future.cancelled():
-            future.set_exception(error)
+    def _open_sink(self) -> tuple[str, asyncio.Queue]:
+        if self._crawler is None:
+            raise RuntimeError("El servicio de scraping no está iniciado")
+        scrape_id = uuid.uuid4().hex
+        queue: asyncio.Queue = asyncio.Queue()
+        self._sinks[scrape_id] = (asyncio.get_running_loop(), queue)
+        return scrape_id, queue
 
-    d.addCallbacks(callback, errback)
-    return future
+    async def _submit(
+        self, scrape_id: str, urls: list[str], timeout: float, use_cache: bool, extract_links: bool = False
+    ) -> tuple[list[dict], set]:
+        """
+        Programa en el motor las URLs que no están frescas en caché. Devuelve
+        los resultados inmediatos (caché fresca o URL inválida) y el conjunto
+        de URLs pendientes de respuesta.
+        """
+        cached_pages = await asyncio.to_thread(page_cache.get_many, urls) if use_cache else {}
+        immediate = []
+        pending = set()
+        requests = []
+        for url in urls:
+            cached = cached_pages.get(url)
+            if cached is not None and page_cache.is_fresh(cached):
+                immediate.append({"url": url, "content": cached["content"], "cached": True})
+                continue
+            try:
+                requests.append(self._build_request(url, scrape_id, timeout, cached, extract_links))
+                pending.add(url)
+            except ValueError as e:
+                immediate.append({"url": url, "error": str(e)})
+        if requests:
+            reactor.callFromThread(self._schedule, requests)
+        return immediate, pending
 
-# Endpoint para scraping
+    async def scrape(
+        self, urls: list[str], timeout: Optional[float] = None, use_cache: bool = True
+    ) -> AsyncIterator[dict]:
+        """
+        Programa las URLs en el motor compartido y emite un dict por URL
+        ({"url", "content"} o {"url", "error"}) en el orden en que terminan.
+        Las páginas frescas en caché se sirven sin red; las demás se
+        revalidan con peticiones condicionales.
+        """
+        timeout = timeout or SCRAPER_URL_TIMEOUT
+        scrape_id, queue = self._open_sink()
+        try:
+            immediate, pending = await self._submit(scrape_id, list(dict.fromkeys(urls)), timeout, use_cache)
+            for item in immediate:
+                yield item
+
+            while pending:
+                try:
+                    # Cada URL termina (respuesta o errback) en 'timeout' desde que empieza su
+                    # descarga; esto solo protege de resultados perdidos si el motor deja de avanzar
+                    item = await asyncio.wait_for(queue.get(), timeout=timeout * 2)
+                except asyncio.TimeoutError:
+                    for url in pending:
+                        yield {"url": url, "error": "Tiempo de espera agotado"}
+                    return
+                if item["url"] in pending:
+                    pending.discard(item["url"])
+                    await self._persist(item)
+                    yield item
+        finally:
+            self._sinks.pop(scrape_id, None)
+
+    async def crawl(
+        self, seeds: list[str], options: "CrawlOptions", timeout: Optional[float] = None, use_cache: bool = True
+    ) -> AsyncIterator[dict]:
+        """
+        Rastreo siguiendo enlaces desde 'seeds': frontera con prioridad por
+        profundidad (primero las páginas menos profundas), filtro de Bloom
+        para no repetir URLs, límite de profundidad, de ámbito y de páginas.
+        La frontera nunca supera las páginas que quedan por descargar.
+        Emite un dict por página, con su profundidad, en cuanto termina.
+        """
+        timeout = timeout or SCRAPER_URL_TIMEOUT
+        allowed = _crawl_scope(seeds, options)
+        # Se descubren muchos más enlaces que páginas se descargan
+        seen = BloomFilter(capacity=max(1000, options.max_pages * 50))
+        frontier: list[tuple[int, int, str]] = []
+        sequence = itertools.count()
+        for url in seeds[:options.max_pages]:
+            if seen.add(url):
+                heapq.heappush(frontier, (0, next(sequence), url))
+
+        scrape_id, queue = self._open_sink()
+        in_flight: dict[str, int] = {}  # url -> profundidad
+        budget = options.max_pages
+        try:
+            while frontier or in_flight:
+                # Rellenamos la ventana de peticiones en vuelo desde la frontera
+                batch = []
+                while frontier and budget > 0 and len(in_flight) + len(batch) < SCRAPER_CONCURRENT_REQUESTS:
+                    depth, _, url = heapq.heappop(frontier)
+                    batch.append((url, depth))
+                    budget -= 1
+                results = []
+                if batch:
+                    depths = dict(batch)
+                    immediate, pending = await self._submit(
+                        scrape_id, [url for url, _ in batch], timeout, use_cache, extract_links=True
+                    )
+                    in_flight.update((url, depths[url]) for url in pending)
+                    results = [(item, depths[item["url"]]) for item in immediate]
+                elif not in_flight:
+                    break
+
+                if not results:
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout=timeout * 2)
+                    except asyncio.TimeoutError:
+                        for url, depth in in_flight.items():
+                            yield {"url": url, "depth": depth, "error": "Tiempo de espera agotado"}
+                        in_flight.clear()
+                        continue
+                    if item["url"] not in in_flight:
+                        continue
+                    await self._persist(item)
+                    results = [(item, in_flight.pop(item["url"]))]
+
+                for item, depth in results:
+                    links = item.pop("links", None)
+                    if links is None and item.get("cached"):
+                        links = await asyncio.to_thread(self._cached_links, item["url"])
+                    if depth < options.max_depth:
+                        for link in links or []:
+                            # La frontera nunca guarda más URLs de las que quedan por descargar
+                            if len(frontier) >= budget:
+                                break
+                            if _in_scope(link, allowed) and seen.add(link):
+                                heapq.heappush(frontier, (depth + 1, next(sequence), link))
+                    item["depth"] = depth
+                    yield item
+        finally:
+            self._sinks.pop(scrape_id, None)
+
+scraper_service = ScraperService({
+    "CONCURRENT_REQUESTS": SCRAPER_CONCURRENT_REQUESTS,
+    "CONCURRENT_REQUESTS_PER_DOMAIN": SCRAPER_CONCURRENT_REQUESTS_PER_DOMAIN,
+    "DOWNLOAD_TIMEOUT": SCRAPER_URL_TIMEOUT,
+    "TELNETCONSOLE_ENABLED": False,
+    "LOG_LEVEL": "INFO",
+    # El hilo del motor instala el reactor por defecto; sin esto Scrapy exige el de asyncio
+    "TWISTED_REACTOR": None,
+})
+
+def _results(request: ScraperRequest) -> AsyncIterator[dict]:
+    if request.crawl is not None:
+        return scraper_service.crawl(request.urls, request.crawl, request.timeout, request.use_cache)
+    return scraper_service.scrape(request.urls, request.timeout, request.use_cache)
+
+# Endpoint para scraping: devuelve todos los resultados juntos
 @router.post("/scrape")
 async def scrape(request: ScraperRequest):
     try:
-        start_reactor()  # Asegurarse de que el reactor está en ejecución
-        deferred = run_spider(request.urls)
-        scraped_data = await deferred_to_future(deferred)
-        return {"data": scraped_data}
+        scraped_data = {}
+        errors = {}
+        async for item in _results(request):
+            if "error" in item:
+                errors[item["url"]] = item["error"]
+            else:
+                scraped_data[item["url"]] = item["content"]
+        response = {"data": scraped_data}
+        if errors:
+            response["errors"] = errors
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+# Endpoint para scraping en streaming: una línea NDJSON por URL en cuanto termina
+@router.post("/scrape/stream")
+async def scrape_stream(request: ScraperRequest):
+    async def ndjson():
+        async for item in _results(request):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+# Búsqueda de texto completo sobre las páginas scrapeadas
+@router.get("/scrape/search")
+async def search_scraped(q: str, limit: int = Query(10, ge=1, le=100)):
+    try:
+        results = await asyncio.to_thread(search_index.search, q, limit)
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"query": q, "results": results}
@@ -0,0 +1,113 @@
+# app/core/batching.py
+
+import asyncio
+import logging
+from concurrent.futures import Executor
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Agrupa peticiones concurrentes en lotes para ejecutar una sola pasada del
+    modelo por lote. Un lote se cierra al alcanzar max_batch_size o cuando han
+    pasado max_delay segundos desde la primera petición; se ejecuta en el
+    executor indicado y cada resultado vuelve a la petición que lo esperaba.
+    process_batch recibe la lista de entradas y devuelve una lista de
+    resultados en el mismo orden; un resultado que sea una excepción se
+    lanza solo en la petición correspondiente.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        process_batch: Callable[[list], list],
+        max_batch_size: int,
+        max_delay: float,
+        max_pending: int,
+    ):
+        self.name = name
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[Executor] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # --- Ciclo de vida ---
+
+    def start(self, executor: Executor) -> None:
+        if self._task is None:
+            self._executor = executor
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        # Las peticiones que quedaron en cola no se van a atender
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError(f"Servidor de inferencia '{self.name}' detenido"))
+        self._queue = None
+
+    # --- API pública ---
+
+    async def submit(self, item: Any) -> Any:
+        if self._queue is None:
+            raise RuntimeError(f"El servidor de inferencia '{self.name}' no está iniciado")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=503, detail="Servidor de inferencia saturado, inténtalo más tarde")
+        return await future
+
+    # --- Ejecución ---
+
+    async def _next_batch(self) -> list[tuple[Any, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        # Las peticiones canceladas (cliente desconectado) no ocupan sitio en la pasada
+        return [(item, future) for item, future in batch if not future.done()]
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._executor, self.process_batch, items)
+            except Exception as e:
+                logger.exception(f"Error en el lote de '{self.name}' ({len(items)} peticiones)")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            logger.debug(f"Lote de '{self.name}' procesado: {len(items)} peticiones")
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
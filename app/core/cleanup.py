@@ -0,0 +1,208 @@
+# app/core/cleanup.py
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from app.core import http_client
+from app.core.config import (
+    IMGBB_CLEANUP_DB_PATH,
+    IMGBB_CLEANUP_GRACE,
+    IMGBB_CLEANUP_INTERVAL,
+    IMGBB_CLEANUP_BATCH_SIZE,
+    IMGBB_CLEANUP_CONCURRENCY,
+    IMGBB_CLEANUP_MAX_ATTEMPTS,
+    IMGBB_CLEANUP_RETRY_DELAY,
+)
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS imgbb_cleanup (
+    delete_url TEXT PRIMARY KEY,
+    due_at REAL NOT NULL,
+    expires_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS imgbb_cleanup_due ON imgbb_cleanup (due_at);
+"""
+
+
+class ImgbbCleanupQueue:
+    """
+    Cola persistente (SQLite) de imágenes de Imgbb pendientes de borrar. Las
+    peticiones solo encolan la delete_url; un planificador en segundo plano
+    las borra por lotes concurrentes una vez pasado el periodo de gracia, con
+    reintentos. Las imágenes que Imgbb ya habrá eliminado por su 'expiration'
+    no se encolan, y las que caducan mientras esperan se descartan sin borrar.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        grace: float,
+        interval: float,
+        batch_size: int,
+        concurrency: int,
+        max_attempts: int,
+        retry_delay: float,
+    ):
+        self.db_path = db_path
+        self.grace = grace
+        self.interval = interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # --- Acceso a SQLite (síncrono, se ejecuta en hilos) ---
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def _insert(self, rows: list[tuple[str, float, Optional[float]]]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO imgbb_cleanup (delete_url, due_at, expires_at, created_at) VALUES (?, ?, ?, ?)",
+                [(delete_url, due_at, expires_at, now) for delete_url, due_at, expires_at in rows],
+            )
+
+    def _due(self, now: float) -> list[str]:
+        with self._lock, self._conn:
+            # Las que ya caducaron en Imgbb no se vuelven a borrar
+            expired = self._conn.execute(
+                "DELETE FROM imgbb_cleanup WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+            ).rowcount
+            rows = self._conn.execute(
+                "SELECT delete_url FROM imgbb_cleanup WHERE due_at <= ? ORDER BY due_at LIMIT ?",
+                (now, self.batch_size),
+            ).fetchall()
+        if expired:
+            logger.debug(f"Limpieza de Imgbb: {expired} imágenes ya caducadas descartadas")
+        return [row["delete_url"] for row in rows]
+
+    def _done(self, delete_urls: list[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM imgbb_cleanup WHERE delete_url = ?", [(url,) for url in delete_urls])
+
+    def _failed(self, failures: list[tuple[str, str]], now: float) -> None:
+        with self._lock, self._conn:
+            for delete_url, error in failures:
+                row = self._conn.execute(
+                    "SELECT attempts FROM imgbb_cleanup WHERE delete_url = ?", (delete_url,)
+                ).fetchone()
+                if row is None:
+                    # La entrada ya no existe (p. ej. caducó durante el intento de borrado)
+                    continue
+                attempts = row["attempts"] + 1
+                if attempts >= self.max_attempts:
+                    logger.error(f"No se pudo borrar la imagen de Imgbb tras {attempts} intentos: {error}")
+                    self._conn.execute("DELETE FROM imgbb_cleanup WHERE delete_url = ?", (delete_url,))
+                else:
+                    self._conn.execute(
+                        "UPDATE imgbb_cleanup SET attempts = ?, error = ?, due_at = ? WHERE delete_url = ?",
+                        (attempts, error, now + self.retry_delay * 2 ** (attempts - 1), delete_url),
+                    )
+
+    # --- Ciclo de vida ---
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self._open)
+        self._task = asyncio.create_task(self._scheduler())
+        logger.info("Planificador de limpieza de Imgbb iniciado")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # --- API pública ---
+
+    async def enqueue(self, uploads: list[dict], grace: Optional[float] = None) -> int:
+        """
+        Programa el borrado de las imágenes subidas ('delete_url' y 'expires_at'
+        tal como los devuelve upload_image). Devuelve cuántas se han encolado.
+        """
+        due_at = time.time() + (self.grace if grace is None else grace)
+        rows = [
+            (upload["delete_url"], due_at, upload.get("expires_at"))
+            for upload in uploads
+            # Si Imgbb la elimina antes de que venza el periodo de gracia, no hay nada que hacer
+            if upload.get("expires_at") is None or upload["expires_at"] > due_at
+        ]
+        if rows:
+            await asyncio.to_thread(self._insert, rows)
+        return len(rows)
+
+    # --- Ejecución ---
+
+    async def _delete(self, delete_url: str, semaphore: asyncio.Semaphore) -> Optional[str]:
+        async with semaphore:
+            try:
+                response = await http_client.get(delete_url, timeout=10)
+            except Exception as e:
+                return str(e) or type(e).__name__
+        # 404: la imagen ya no existe, no hay nada que reintentar
+        if response.status_code < 400 or response.status_code == 404:
+            return None
+        return f"HTTP {response.status_code}"
+
+    async def run_once(self) -> int:
+        """Procesa todos los borrados vencidos; devuelve cuántos se completaron."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        completed = 0
+        while True:
+            now = time.time()
+            batch = await asyncio.to_thread(self._due, now)
+            if not batch:
+                return completed
+            errors = await asyncio.gather(*(self._delete(url, semaphore) for url in batch))
+            done = [url for url, error in zip(batch, errors) if error is None]
+            failures = [(url, error) for url, error in zip(batch, errors) if error is not None]
+            if done:
+                await asyncio.to_thread(self._done, done)
+            if failures:
+                await asyncio.to_thread(self._failed, failures, now)
+            completed += len(done)
+
+    async def _scheduler(self) -> None:
+        while True:
+            try:
+                completed = await self.run_once()
+                if completed:
+                    logger.info(f"Limpieza de Imgbb: {completed} imágenes borradas")
+            except Exception:
+                logger.exception("Error en el planificador de limpieza de Imgbb")
+            await asyncio.sleep(self.interval)
+
+
+imgbb_cleanup = ImgbbCleanupQueue(
+    IMGBB_CLEANUP_DB_PATH,
+    IMGBB_CLEANUP_GRACE,
+    IMGBB_CLEANUP_INTERVAL,
+    IMGBB_CLEANUP_BATCH_SIZE,
+    IMGBB_CLEANUP_CONCURRENCY,
+    IMGBB_CLEANUP_MAX_ATTEMPTS,
+    IMGBB_CLEANUP_RETRY_DELAY,
+)
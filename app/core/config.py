@@ -24,6 +24,135 @@ SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
 SENDER_EMAIL = os.environ.get('SENDER_EMAIL')
 RECIPIENT_EMAIL = os.environ.get('RECIPIENT_EMAIL')
 
+# Cuenta con la que se envían los correos estructurados (/send-structured-email)
+EMAIL_USER = os.environ.get('EMAIL_USER')
+EMAIL_PASS = os.environ.get('EMAIL_PASS')
+EMAIL_SMTP_SERVER = os.environ.get('EMAIL_SMTP_SERVER', 'smtp.gmail.com')
+EMAIL_SMTP_PORT = int(os.environ.get('EMAIL_SMTP_PORT', 465))
+
+# Pool de conexiones SMTP autenticadas y reutilizadas
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', 4))
+SMTP_TIMEOUT = float(os.environ.get('SMTP_TIMEOUT', 30))
+SMTP_MAX_ATTEMPTS = int(os.environ.get('SMTP_MAX_ATTEMPTS', 3))
+SMTP_RETRY_DELAY = float(os.environ.get('SMTP_RETRY_DELAY', 2))
+SMTP_HEALTH_CHECK_INTERVAL = float(os.environ.get('SMTP_HEALTH_CHECK_INTERVAL', 30))
+
+# Imágenes de los correos estructurados en Imgbb: siguen disponibles durante
+# IMGBB_CLEANUP_GRACE tras el envío (para que los destinatarios las vean al abrir
+# el correo) y después se borran. EMAIL_IMAGE_EXPIRATION es solo el respaldo por
+# si el borrado falla: debe ser mayor que el periodo de gracia
+EMAIL_IMAGE_EXPIRATION = int(os.environ.get('EMAIL_IMAGE_EXPIRATION', 7 * 24 * 3600))
+IMGBB_CLEANUP_DB_PATH = os.environ.get('IMGBB_CLEANUP_DB_PATH', '.data/imgbb_cleanup.sqlite3')
+IMGBB_CLEANUP_GRACE = float(os.environ.get('IMGBB_CLEANUP_GRACE', 24 * 3600))
+IMGBB_CLEANUP_INTERVAL = float(os.environ.get('IMGBB_CLEANUP_INTERVAL', 30))
+IMGBB_CLEANUP_BATCH_SIZE = int(os.environ.get('IMGBB_CLEANUP_BATCH_SIZE', 20))
+IMGBB_CLEANUP_CONCURRENCY = int(os.environ.get('IMGBB_CLEANUP_CONCURRENCY', 5))
+IMGBB_CLEANUP_MAX_ATTEMPTS = int(os.environ.get('IMGBB_CLEANUP_MAX_ATTEMPTS', 5))
+IMGBB_CLEANUP_RETRY_DELAY = float(os.environ.get('IMGBB_CLEANUP_RETRY_DELAY', 60))
+
+# Campañas de correo: envío personalizado por destinatario desde la cola de trabajos
+CAMPAIGNS_DB_PATH = os.environ.get('CAMPAIGNS_DB_PATH', '.data/campaigns.sqlite3')
+# Límite de envíos por minuto (0 = sin límite)
+CAMPAIGN_RATE_PER_MINUTE = float(os.environ.get('CAMPAIGN_RATE_PER_MINUTE', 300))
+CAMPAIGN_BATCH_SIZE = int(os.environ.get('CAMPAIGN_BATCH_SIZE', 20))
+# Workers propios de las campañas: su envío dura minutos y no debe ocupar los JOBS_WORKERS
+CAMPAIGN_WORKERS = int(os.environ.get('CAMPAIGN_WORKERS', 1))
+# Las imágenes de una campaña deben seguir disponibles cuando se abren los correos
+CAMPAIGN_IMAGE_EXPIRATION = int(os.environ.get('CAMPAIGN_IMAGE_EXPIRATION', 30 * 24 * 3600))
+
+# Configuración del cliente HTTP compartido (Freepik, Imgbb, Instagram)
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', 60))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 10))
+HTTP_MAX_CONNECTIONS = int(os.environ.get('HTTP_MAX_CONNECTIONS', 100))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('HTTP_MAX_KEEPALIVE_CONNECTIONS', 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get('HTTP_KEEPALIVE_EXPIRY', 30))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.environ.get('HTTP_MAX_CONNECTIONS_PER_HOST', 10))
+HTTP2_ENABLED = os.environ.get('HTTP2_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# Número máximo de imágenes generadas/subidas en paralelo por correo
+IMAGE_GENERATION_CONCURRENCY = int(os.environ.get('IMAGE_GENERATION_CONCURRENCY', 4))
+
+# Caché de generaciones de Freepik (memoria + disco)
+FREEPIK_CACHE_MEMORY_BYTES = int(os.environ.get('FREEPIK_CACHE_MEMORY_BYTES', 64 * 1024 * 1024))
+FREEPIK_CACHE_DIR = os.environ.get('FREEPIK_CACHE_DIR', '.cache/freepik')
+FREEPIK_CACHE_TTL = int(os.environ.get('FREEPIK_CACHE_TTL', 7 * 24 * 3600))
+
+# Cola de trabajos en segundo plano (generación y publicación)
+JOBS_DB_PATH = os.environ.get('JOBS_DB_PATH', '.data/jobs.sqlite3')
+JOBS_WORKERS = int(os.environ.get('JOBS_WORKERS', 4))
+JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', 3))
+JOBS_RETRY_DELAY = float(os.environ.get('JOBS_RETRY_DELAY', 5))
+
+# Preparación de imágenes antes de subirlas (límites de Instagram y presupuesto de bytes)
+IMAGE_MAX_DIMENSION = int(os.environ.get('IMAGE_MAX_DIMENSION', 1440))
+IMAGE_MAX_BYTES = int(os.environ.get('IMAGE_MAX_BYTES', 2 * 1024 * 1024))
+JPEG_MAX_QUALITY = int(os.environ.get('JPEG_MAX_QUALITY', 92))
+JPEG_MIN_QUALITY = int(os.environ.get('JPEG_MIN_QUALITY', 60))
+
+# Pool de procesos para el trabajo de PIL (decodificar, redimensionar, codificar)
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', os.cpu_count() or 1))
+IMAGE_MAX_PENDING = int(os.environ.get('IMAGE_MAX_PENDING', 2 * IMAGE_WORKERS))
+IMAGE_QUEUE_TIMEOUT = float(os.environ.get('IMAGE_QUEUE_TIMEOUT', 10))
+IMAGE_SHM_THRESHOLD = int(os.environ.get('IMAGE_SHM_THRESHOLD', 256 * 1024))
+
+# Detección de imágenes duplicadas (hash perceptual) antes de subir/publicar
+DEDUP_WINDOW = int(os.environ.get('DEDUP_WINDOW', 7 * 24 * 3600))
+DEDUP_MAX_DISTANCE = int(os.environ.get('DEDUP_MAX_DISTANCE', 5))
+DEDUP_MAX_ENTRIES = int(os.environ.get('DEDUP_MAX_ENTRIES', 100000))
+DEDUP_MODE = os.environ.get('DEDUP_MODE', 'reference')  # 'reference' o 'reject'
+
+# Espera del procesamiento de contenedores de Instagram (backoff exponencial)
+INSTAGRAM_POLL_INITIAL_DELAY = float(os.environ.get('INSTAGRAM_POLL_INITIAL_DELAY', 1))
+INSTAGRAM_POLL_MAX_DELAY = float(os.environ.get('INSTAGRAM_POLL_MAX_DELAY', 16))
+INSTAGRAM_CONTAINER_TIMEOUT = float(os.environ.get('INSTAGRAM_CONTAINER_TIMEOUT', 120))
+
+# Caché del listado de media de Instagram
+INSTAGRAM_MEDIA_TTL = float(os.environ.get('INSTAGRAM_MEDIA_TTL', 60))
+INSTAGRAM_MEDIA_MAX_PAGES = int(os.environ.get('INSTAGRAM_MEDIA_MAX_PAGES', 50))
+# Cada cuánto se descarga el listado completo para quitar media borrados o editados
+INSTAGRAM_MEDIA_FULL_REFRESH = float(os.environ.get('INSTAGRAM_MEDIA_FULL_REFRESH', 600))
+
+# Servicio de scraping (motor de Scrapy compartido)
+SCRAPER_CONCURRENT_REQUESTS = int(os.environ.get('SCRAPER_CONCURRENT_REQUESTS', 32))
+SCRAPER_CONCURRENT_REQUESTS_PER_DOMAIN = int(os.environ.get('SCRAPER_CONCURRENT_REQUESTS_PER_DOMAIN', 4))
+SCRAPER_URL_TIMEOUT = float(os.environ.get('SCRAPER_URL_TIMEOUT', 15))
+# Límites por petición del modo rastreo (acotan la frontera y el filtro de Bloom)
+SCRAPER_CRAWL_MAX_DEPTH = int(os.environ.get('SCRAPER_CRAWL_MAX_DEPTH', 5))
+SCRAPER_CRAWL_MAX_PAGES = int(os.environ.get('SCRAPER_CRAWL_MAX_PAGES', 1000))
+
+# Caché en disco de páginas descargadas (revalidación con ETag/Last-Modified)
+SCRAPER_CACHE_PATH = os.environ.get('SCRAPER_CACHE_PATH', '.data/page_cache.sqlite3')
+SCRAPER_CACHE_TTL = float(os.environ.get('SCRAPER_CACHE_TTL', 300))
+# Las páginas no descargadas ni revalidadas en este tiempo se borran de la caché
+SCRAPER_CACHE_MAX_AGE = float(os.environ.get('SCRAPER_CACHE_MAX_AGE', 7 * 24 * 3600))
+
+# Índice de búsqueda de texto completo sobre el contenido scrapeado
+SCRAPER_INDEX_PATH = os.environ.get('SCRAPER_INDEX_PATH', '.data/search_index.sqlite3')
+
+# Calculadora: expresiones compiladas en caché (LRU por texto de la expresión)
+EXPRESSION_CACHE_SIZE = int(os.environ.get('EXPRESSION_CACHE_SIZE', 1024))
+EXPRESSION_MAX_LENGTH = int(os.environ.get('EXPRESSION_MAX_LENGTH', 1000))
+
+# Inferencia local (Stable Diffusion y BLIP) con micro-batching
+SD_MODEL_ID = os.environ.get('SD_MODEL_ID', 'runwayml/stable-diffusion-v1-5')
+BLIP_MODEL_ID = os.environ.get('BLIP_MODEL_ID', 'Salesforce/blip-image-captioning-base')
+INFERENCE_DEVICE = os.environ.get('INFERENCE_DEVICE')  # Por defecto: cuda si está disponible, si no cpu
+INFERENCE_MAX_BATCH_SIZE = int(os.environ.get('INFERENCE_MAX_BATCH_SIZE', 4))
+INFERENCE_MAX_DELAY = float(os.environ.get('INFERENCE_MAX_DELAY', 0.05))
+INFERENCE_MAX_PENDING = int(os.environ.get('INFERENCE_MAX_PENDING', 32))
+# Modelos que se precargan al arrancar (separados por comas: "stable-diffusion,blip")
+INFERENCE_WARMUP_MODELS = [name.strip() for name in os.environ.get('INFERENCE_WARMUP_MODELS', '').split(',') if name.strip()]
+# Segundos sin uso tras los que se descarga un modelo para liberar memoria (0 = nunca)
+MODEL_IDLE_TIMEOUT = float(os.environ.get('MODEL_IDLE_TIMEOUT', 900))
+MODEL_IDLE_CHECK_INTERVAL = float(os.environ.get('MODEL_IDLE_CHECK_INTERVAL', 60))
+CAPTION_CACHE_SIZE = int(os.environ.get('CAPTION_CACHE_SIZE', 1024))
+
+# Carga diferida de subsistemas pesados (scraper, correo, campañas, calculadora, IA):
+# con LAZY_ROUTERS se importan e inician al recibir la primera petición a su ruta,
+# salvo los listados en PRELOAD_SUBSYSTEMS, que se cargan al arrancar
+LAZY_ROUTERS = os.environ.get('LAZY_ROUTERS', 'false').lower() in ('1', 'true', 'yes')
+PRELOAD_SUBSYSTEMS = [name.strip() for name in os.environ.get('PRELOAD_SUBSYSTEMS', '').split(',') if name.strip()]
+
 # Variables de autenticación de Google
 GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
 if GOOGLE_CLIENT_ID is None:
@@ -33,3 +162,13 @@ if GOOGLE_CLIENT_ID is None:
 JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
 if JWT_SECRET_KEY is None:
     raise Exception("JWT_SECRET_KEY no está configurado en las variables de entorno")
+
+# Claves adicionales para rotación, seleccionadas por el 'kid' de la cabecera del token
+# Formato: "kid1:secreto1,kid2:secreto2"
+JWT_SECRET_KEYS = dict(
+    item.split(':', 1) for item in os.environ.get('JWT_SECRET_KEYS', '').split(',') if ':' in item
+)
+
+# Caché de tokens ya verificados
+JWT_CACHE_SIZE = int(os.environ.get('JWT_CACHE_SIZE', 10000))
+JWT_CACHE_MAX_TTL = float(os.environ.get('JWT_CACHE_MAX_TTL', 300))
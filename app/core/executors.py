@@ -0,0 +1,106 @@
+# app/core/executors.py
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Optional, TypeVar
+
+from fastapi import HTTPException
+
+from app.core.config import IMAGE_WORKERS, IMAGE_MAX_PENDING, IMAGE_QUEUE_TIMEOUT, IMAGE_SHM_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Pool de procesos para transformaciones de imagen; se crea en el lifespan
+_executor: Optional[ProcessPoolExecutor] = None
+# Plazas disponibles: tareas en ejecución + en cola. Al agotarse se aplica backpressure
+_slots: Optional[asyncio.Semaphore] = None
+# Hilo dedicado a la inferencia local: una sola pasada de modelo a la vez, de
+# modo que las peticiones concurrentes no compiten por los núcleos de la CPU
+_inference_executor: Optional[ThreadPoolExecutor] = None
+
+
+def start_image_executor() -> None:
+    global _executor, _slots
+    if _executor is None:
+        # 'spawn' evita heredar hilos y conexiones abiertas del proceso del servidor
+        _executor = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        _slots = asyncio.Semaphore(IMAGE_WORKERS + IMAGE_MAX_PENDING)
+        logger.info(f"Pool de procesos de imagen iniciado con {IMAGE_WORKERS} workers")
+
+
+def stop_image_executor() -> None:
+    global _executor, _slots
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+        _slots = None
+        logger.info("Pool de procesos de imagen detenido")
+
+
+def start_inference_executor() -> ThreadPoolExecutor:
+    global _inference_executor
+    if _inference_executor is None:
+        _inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+    return _inference_executor
+
+
+def stop_inference_executor() -> None:
+    global _inference_executor
+    if _inference_executor is not None:
+        _inference_executor.shutdown(wait=True, cancel_futures=True)
+        _inference_executor = None
+
+
+def _call_with_shared_memory(fn: Callable[..., T], name: str, size: int, args: tuple) -> T:
+    """
+    Se ejecuta en el proceso worker: fn recibe un memoryview sobre la memoria
+    compartida, sin copiarla. El segmento se cierra cuando fn termina.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    view = shm.buf[:size]
+    try:
+        return fn(view, *args)
+    finally:
+        view.release()
+        shm.close()
+
+
+async def run_image_task(fn: Callable[..., T], data: bytes, *args) -> T:
+    """
+    Ejecuta fn(data, *args) en el pool de procesos. Las entradas grandes se
+    pasan por memoria compartida en lugar de serializarlas por la tubería:
+    fn recibe entonces un memoryview y no debe devolver vistas sobre él.
+    Si el pool está saturado durante IMAGE_QUEUE_TIMEOUT segundos se
+    responde 503 en lugar de acumular trabajo sin límite.
+    """
+    if _executor is None:
+        raise RuntimeError("El pool de imágenes no está inicializado; debe arrancarse en el lifespan de la aplicación")
+
+    try:
+        await asyncio.wait_for(_slots.acquire(), timeout=IMAGE_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Servidor de imágenes saturado, inténtalo más tarde")
+
+    loop = asyncio.get_running_loop()
+    shm = None
+    try:
+        if len(data) >= IMAGE_SHM_THRESHOLD:
+            shm = shared_memory.SharedMemory(create=True, size=len(data))
+            shm.buf[:len(data)] = data
+            future = loop.run_in_executor(_executor, _call_with_shared_memory, fn, shm.name, len(data), args)
+        else:
+            future = loop.run_in_executor(_executor, fn, data, *args)
+        return await future
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+        _slots.release()
@@ -0,0 +1,91 @@
+# app/core/http_client.py
+
+import asyncio
+import logging
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import (
+    HTTP_TIMEOUT,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS_PER_HOST,
+    HTTP2_ENABLED,
+)
+
+logger = logging.getLogger(__name__)
+
+# Cliente único de la aplicación; se crea y se cierra en el lifespan de FastAPI
+_client: Optional[httpx.AsyncClient] = None
+# Un semáforo por host para limitar las conexiones simultáneas contra cada API
+_host_limits: dict[str, asyncio.Semaphore] = {}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """
+    Crea el cliente HTTP asíncrono compartido, con keep-alive y HTTP/2 si
+    el paquete 'h2' está instalado.
+    """
+    global _client
+    if _client is None:
+        http2 = HTTP2_ENABLED and _http2_available()
+        _client = httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+        logger.info(f"Cliente HTTP compartido creado (http2={http2})")
+    return _client
+
+
+async def close_http_client() -> None:
+    """Cierra el cliente compartido y libera las conexiones del pool."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        _host_limits.clear()
+        logger.info("Cliente HTTP compartido cerrado")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    if _client is None:
+        raise RuntimeError("El cliente HTTP no está inicializado; debe arrancarse en el lifespan de la aplicación")
+    return _client
+
+
+async def request(method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Realiza una petición con el cliente compartido respetando el límite de
+    conexiones simultáneas por host.
+    """
+    host = urlsplit(url).netloc
+    limit = _host_limits.get(host)
+    if limit is None:
+        limit = _host_limits[host] = asyncio.Semaphore(HTTP_MAX_CONNECTIONS_PER_HOST)
+    async with limit:
+        return await get_http_client().request(method, url, **kwargs)
+
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    return await request("GET", url, **kwargs)
+
+
+async def post(url: str, **kwargs) -> httpx.Response:
+    return await request("POST", url, **kwargs)
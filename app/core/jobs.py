@@ -0,0 +1,288 @@
+# app/core/jobs.py
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from app.core.config import JOBS_DB_PATH, JOBS_WORKERS, JOBS_MAX_ATTEMPTS, JOBS_RETRY_DELAY
+
+logger = logging.getLogger(__name__)
+
+# Estados posibles de un trabajo
+QUEUED = "queued"
+RUNNING = "running"
+RETRYING = "retrying"
+COMPLETED = "completed"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    pipeline TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    payload TEXT NOT NULL,
+    checkpoints TEXT NOT NULL DEFAULT '{}',
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_blobs (
+    job_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (job_id, name)
+);
+"""
+
+
+class JobContext:
+    """
+    Contexto que recibe cada etapa: datos de entrada, checkpoints de las etapas
+    ya completadas y acceso a los binarios (imágenes) asociados al trabajo.
+    """
+
+    def __init__(self, queue: "JobQueue", job_id: str, payload: dict, checkpoints: dict):
+        self._queue = queue
+        self.job_id = job_id
+        self.payload = payload
+        self.checkpoints = checkpoints
+
+    async def load_blob(self, name: str) -> bytes:
+        return await asyncio.to_thread(self._queue._load_blob, self.job_id, name)
+
+    async def save_blob(self, name: str, data: bytes) -> None:
+        await asyncio.to_thread(self._queue._save_blob, self.job_id, name, data)
+
+
+StageFn = Callable[[JobContext], Awaitable[dict]]
+
+
+@dataclass
+class Pipeline:
+    stages: list[tuple[str, StageFn]]
+    on_success: Optional[Callable[[JobContext], Awaitable[None]]] = None
+    workers: Optional[int] = None
+    on_failure: Optional[Callable[[JobContext], Awaitable[None]]] = None
+
+
+class JobQueue:
+    """
+    Cola de trabajos persistida en SQLite con un pool acotado de workers.
+    Cada etapa completada se guarda como checkpoint, de modo que un reintento
+    (o un reinicio del proceso) continúa a partir de la última etapa terminada.
+
+    Los pipelines registrados con 'workers' tienen su propia cola y sus
+    propios workers: sus trabajos largos (p. ej. una campaña con el envío
+    limitado en ritmo) no ocupan los workers compartidos.
+    """
+
+    def __init__(self, db_path: str, workers: int, max_attempts: int, retry_delay: float):
+        self.db_path = db_path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._pipelines: dict[str, Pipeline] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._queues: dict[Optional[str], asyncio.Queue] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def register_pipeline(
+        self,
+        name: str,
+        stages: list[tuple[str, StageFn]],
+        on_success: Optional[Callable[[JobContext], Awaitable[None]]] = None,
+        workers: Optional[int] = None,
+        on_failure: Optional[Callable[[JobContext], Awaitable[None]]] = None,
+    ) -> None:
+        self._pipelines[name] = Pipeline(stages, on_success, workers, on_failure)
+
+    # --- Acceso a SQLite (síncrono, se ejecuta en hilos) ---
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def _insert(self, job_id: str, pipeline: str, payload: dict, blobs: dict[str, bytes]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, pipeline, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, pipeline, QUEUED, json.dumps(payload), now, now),
+            )
+            self._conn.executemany(
+                "INSERT INTO job_blobs (job_id, name, data) VALUES (?, ?, ?)",
+                [(job_id, name, data) for name, data in blobs.items()],
+            )
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = time.time()
+        if "checkpoints" in fields:
+            fields["checkpoints"] = json.dumps(fields["checkpoints"])
+        columns = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def _fetch(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["checkpoints"] = json.loads(job["checkpoints"])
+        return job
+
+    def _pending(self) -> list[tuple[str, str]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, pipeline FROM jobs WHERE status IN (?, ?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING, RETRYING),
+            ).fetchall()
+        return [(row["id"], row["pipeline"]) for row in rows]
+
+    def _load_blob(self, job_id: str, name: str) -> bytes:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM job_blobs WHERE job_id = ? AND name = ?", (job_id, name)
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"El trabajo {job_id} no tiene el binario '{name}'")
+        return row["data"]
+
+    def _save_blob(self, job_id: str, name: str, data: bytes) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_blobs (job_id, name, data) VALUES (?, ?, ?)",
+                (job_id, name, data),
+            )
+
+    def _delete_blobs(self, job_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM job_blobs WHERE job_id = ?", (job_id,))
+
+    # --- Ciclo de vida ---
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self._open)
+        # Cola compartida (clave None) y una cola por pipeline con workers propios
+        lanes = {None: self.workers}
+        lanes.update({name: p.workers for name, p in self._pipelines.items() if p.workers})
+        self._queues = {lane: asyncio.Queue() for lane in lanes}
+        # Los trabajos que quedaron a medias en una ejecución anterior se reanudan
+        for job_id, pipeline in await asyncio.to_thread(self._pending):
+            if pipeline in self._pipelines:
+                self._enqueue(pipeline, job_id)
+        for lane, workers in lanes.items():
+            for _ in range(workers):
+                self._spawn(self._worker(self._queues[lane]))
+        dedicated = ", ".join(f"{lane}: {workers}" for lane, workers in lanes.items() if lane is not None)
+        logger.info(
+            f"Cola de trabajos iniciada con {self.workers} workers"
+            + (f" (dedicados: {dedicated})" if dedicated else "")
+        )
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _enqueue(self, pipeline: str, job_id: str) -> None:
+        queue = self._queues.get(pipeline) or self._queues[None]
+        queue.put_nowait(job_id)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # --- API pública ---
+
+    async def submit(self, pipeline: str, payload: dict, blobs: Optional[dict[str, bytes]] = None) -> str:
+        if pipeline not in self._pipelines:
+            raise ValueError(f"Pipeline desconocido: {pipeline}")
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(self._insert, job_id, pipeline, payload, blobs or {})
+        self._enqueue(pipeline, job_id)
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._fetch, job_id)
+
+    # --- Ejecución ---
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            job_id = await queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception(f"Error inesperado procesando el trabajo {job_id}")
+            finally:
+                queue.task_done()
+
+    async def _requeue_later(self, pipeline: str, job_id: str) -> None:
+        await asyncio.sleep(self.retry_delay)
+        self._enqueue(pipeline, job_id)
+
+    async def _run(self, job_id: str) -> None:
+        job = await self.get(job_id)
+        if job is None or job["status"] in (COMPLETED, FAILED):
+            return
+        pipeline = self._pipelines[job["pipeline"]]
+        checkpoints = job["checkpoints"]
+        context = JobContext(self, job_id, job["payload"], checkpoints)
+
+        for stage_name, stage in pipeline.stages:
+            if stage_name in checkpoints:
+                continue
+            await asyncio.to_thread(self._update, job_id, status=RUNNING, stage=stage_name)
+            try:
+                checkpoints[stage_name] = await stage(context) or {}
+            except Exception as e:
+                attempts = job["attempts"] + 1
+                error = getattr(e, "detail", None) or str(e)
+                if attempts < self.max_attempts:
+                    logger.warning(f"Trabajo {job_id}: fallo en '{stage_name}' (intento {attempts}): {error}")
+                    await asyncio.to_thread(self._update, job_id, status=RETRYING, attempts=attempts, error=error)
+                    self._spawn(self._requeue_later(job["pipeline"], job_id))
+                else:
+                    logger.error(f"Trabajo {job_id}: fallo definitivo en '{stage_name}': {error}")
+                    await asyncio.to_thread(self._update, job_id, status=FAILED, attempts=attempts, error=error)
+                    if pipeline.on_failure is not None:
+                        try:
+                            await pipeline.on_failure(context)
+                        except Exception:
+                            logger.exception(f"Error al gestionar el fallo del trabajo {job_id}")
+                return
+            await asyncio.to_thread(self._update, job_id, checkpoints=checkpoints)
+
+        await asyncio.to_thread(self._update, job_id, status=COMPLETED, stage=None, error=None)
+        await asyncio.to_thread(self._delete_blobs, job_id)
+        if pipeline.on_success is not None:
+            try:
+                await pipeline.on_success(context)
+            except Exception:
+                logger.exception(f"Error en la notificación del trabajo {job_id}")
+
+
+job_queue = JobQueue(JOBS_DB_PATH, JOBS_WORKERS, JOBS_MAX_ATTEMPTS, JOBS_RETRY_DELAY)
@@ -0,0 +1,198 @@
+# app/core/models.py
+
+import asyncio
+import gc
+import logging
+import threading
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from app.core.config import (
+    SD_MODEL_ID,
+    BLIP_MODEL_ID,
+    INFERENCE_DEVICE,
+    HUGGING_FACE_TOKEN,
+    MODEL_IDLE_TIMEOUT,
+    MODEL_IDLE_CHECK_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+STABLE_DIFFUSION = "stable-diffusion"
+BLIP = "blip"
+
+
+class ModelUnavailableError(RuntimeError):
+    """Las dependencias de inferencia local no están instaladas o el modelo no se pudo cargar."""
+
+
+@dataclass
+class _Entry:
+    loader: Callable[[], Any]
+    model: Any = None
+    last_used: float = 0.0
+    load_seconds: Optional[float] = None
+
+
+class ModelRegistry:
+    """
+    Registro de modelos locales. Cada modelo se carga en su primer uso (o con
+    warmup) y se descarga tras idle_timeout segundos sin usarse. Las cargas,
+    usos y descargas se hacen en el hilo de inferencia, de modo que nunca se
+    descarga un modelo en mitad de una pasada.
+    """
+
+    def __init__(self, idle_timeout: float, check_interval: float):
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self._entries: dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[Executor] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, loader: Callable[[], Any]) -> None:
+        self._entries[name] = _Entry(loader)
+
+    def _entry(self, name: str) -> _Entry:
+        try:
+            return self._entries[name]
+        except KeyError:
+            raise ValueError(f"Modelo desconocido: {name}") from None
+
+    # --- Síncrono: se ejecuta en el hilo de inferencia ---
+
+    def get(self, name: str) -> Any:
+        """Devuelve el modelo, cargándolo si no está en memoria."""
+        entry = self._entry(name)
+        with self._lock:
+            if entry.model is None:
+                started = time.perf_counter()
+                entry.model = entry.loader()
+                entry.load_seconds = time.perf_counter() - started
+                logger.info(f"Modelo '{name}' cargado en {entry.load_seconds:.1f}s")
+            entry.last_used = time.monotonic()
+            return entry.model
+
+    def unload(self, name: str) -> bool:
+        entry = self._entry(name)
+        with self._lock:
+            if entry.model is None:
+                return False
+            entry.model = None
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        logger.info(f"Modelo '{name}' descargado por inactividad")
+        return True
+
+    def unload_idle(self) -> list[str]:
+        now = time.monotonic()
+        idle = [
+            name for name, entry in self._entries.items()
+            if entry.model is not None and now - entry.last_used > self.idle_timeout
+        ]
+        return [name for name in idle if self.unload(name)]
+
+    def status(self) -> dict[str, dict]:
+        now = time.monotonic()
+        return {
+            name: {
+                "loaded": entry.model is not None,
+                "idle_seconds": round(now - entry.last_used, 1) if entry.model is not None else None,
+                "load_seconds": entry.load_seconds,
+            }
+            for name, entry in self._entries.items()
+        }
+
+    # --- Asíncrono ---
+
+    def start(self, executor: Executor) -> None:
+        self._executor = executor
+        if self.idle_timeout > 0 and self._task is None:
+            self._task = asyncio.create_task(self._reaper())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for entry in self._entries.values():
+            entry.model = None
+        self._executor = None
+
+    async def warmup(self, names: list[str]) -> dict[str, dict]:
+        """Carga los modelos indicados en el hilo de inferencia."""
+        for name in names:
+            self._entry(name)
+        loop = asyncio.get_running_loop()
+        for name in names:
+            await loop.run_in_executor(self._executor, self.get, name)
+        return self.status()
+
+    async def _reaper(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await loop.run_in_executor(self._executor, self.unload_idle)
+            except Exception:
+                logger.exception("Error al descargar modelos inactivos")
+
+
+_device: Optional[str] = None
+
+
+def get_device() -> str:
+    global _device
+    if _device is None:
+        if INFERENCE_DEVICE:
+            _device = INFERENCE_DEVICE
+        else:
+            import torch
+            _device = "cuda" if torch.cuda.is_available() else "cpu"
+    return _device
+
+
+# torch, diffusers y transformers son dependencias pesadas y opcionales: se
+# importan al cargar el primer modelo, no al importar la aplicación
+
+def _load_diffusion_pipeline():
+    try:
+        from diffusers import StableDiffusionPipeline
+    except ImportError as e:
+        raise ModelUnavailableError(f"Stable Diffusion no disponible: {e}") from e
+    logger.info(f"Cargando {SD_MODEL_ID} en {get_device()}")
+    pipe = StableDiffusionPipeline.from_pretrained(SD_MODEL_ID, token=HUGGING_FACE_TOKEN)
+    return pipe.to(get_device())
+
+
+def _load_caption_model():
+    try:
+        from transformers import BlipForConditionalGeneration, BlipProcessor
+    except ImportError as e:
+        raise ModelUnavailableError(f"BLIP no disponible: {e}") from e
+    logger.info(f"Cargando {BLIP_MODEL_ID} en {get_device()}")
+    processor = BlipProcessor.from_pretrained(BLIP_MODEL_ID, token=HUGGING_FACE_TOKEN)
+    model = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL_ID, token=HUGGING_FACE_TOKEN)
+    return processor, model.to(get_device())
+
+
+model_registry = ModelRegistry(MODEL_IDLE_TIMEOUT, MODEL_IDLE_CHECK_INTERVAL)
+model_registry.register(STABLE_DIFFUSION, _load_diffusion_pipeline)
+model_registry.register(BLIP, _load_caption_model)
+
+
+def get_diffusion_pipeline():
+    """Pipeline de Stable Diffusion (llamar desde el hilo de inferencia)."""
+    return model_registry.get(STABLE_DIFFUSION)
+
+
+def get_caption_model():
+    """(processor, modelo) de BLIP (llamar desde el hilo de inferencia)."""
+    return model_registry.get(BLIP)
@@ -0,0 +1,205 @@
+# app/core/smtp.py
+
+import asyncio
+import logging
+import time
+from email.message import Message
+from typing import Awaitable, Callable, Optional, Sequence
+
+import aiosmtplib
+
+from app.core.config import (
+    SMTP_SERVER,
+    SMTP_PORT,
+    SMTP_USERNAME,
+    SMTP_PASSWORD,
+    EMAIL_USER,
+    EMAIL_PASS,
+    EMAIL_SMTP_SERVER,
+    EMAIL_SMTP_PORT,
+    SMTP_POOL_SIZE,
+    SMTP_TIMEOUT,
+    SMTP_MAX_ATTEMPTS,
+    SMTP_RETRY_DELAY,
+    SMTP_HEALTH_CHECK_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Puerto SMTPS: TLS implícito desde el primer byte; el resto usa STARTTLS
+_IMPLICIT_TLS_PORT = 465
+
+
+class _Connection:
+    def __init__(self):
+        self.client: Optional[aiosmtplib.SMTP] = None
+        self.last_used = 0.0
+
+
+def _is_transient(error: Exception) -> bool:
+    """Los códigos 4xx indican un fallo temporal del servidor que merece reintento."""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return bool(error.recipients) and all(400 <= r.code < 500 for r in error.recipients)
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return 400 <= error.code < 500
+    # Conexión caída o cerrada por el servidor: se reconecta y se reintenta
+    return isinstance(error, (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, OSError))
+
+
+class SMTPPool:
+    """
+    Pool acotado de conexiones SMTP autenticadas que se reutilizan entre
+    mensajes. Las conexiones se abren bajo demanda, se comprueban con NOOP si
+    llevan tiempo ociosas y se descartan al fallar. Los envíos con códigos 4xx
+    se reintentan con backoff exponencial.
+
+    'tls' es "implicit" (SMTPS), "starttls" o "none" (relay local sin
+    cifrar); por defecto, implícito en el puerto 465 y STARTTLS en el resto.
+    """
+
+    def __init__(
+        self,
+        hostname: Optional[str],
+        port: int,
+        username: Optional[str],
+        password: Optional[str],
+        size: int = SMTP_POOL_SIZE,
+        timeout: float = SMTP_TIMEOUT,
+        max_attempts: int = SMTP_MAX_ATTEMPTS,
+        retry_delay: float = SMTP_RETRY_DELAY,
+        health_check_interval: float = SMTP_HEALTH_CHECK_INTERVAL,
+        tls: Optional[str] = None,
+    ):
+        if tls is None:
+            tls = "implicit" if port == _IMPLICIT_TLS_PORT else "starttls"
+        if tls not in ("implicit", "starttls", "none"):
+            raise ValueError(f"Modo TLS no válido: {tls}")
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.health_check_interval = health_check_interval
+        self.tls = tls
+        self._connections: list[_Connection] = []
+        self._idle: Optional[asyncio.LifoQueue] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.hostname and self.username and self.password)
+
+    # --- Ciclo de vida ---
+
+    async def start(self) -> None:
+        # Las conexiones se abren en el primer envío; aquí solo se preparan los huecos
+        self._connections = [_Connection() for _ in range(self.size)]
+        self._idle = asyncio.LifoQueue()
+        for connection in self._connections:
+            self._idle.put_nowait(connection)
+
+    async def stop(self) -> None:
+        await asyncio.gather(*(self._close(c, graceful=True) for c in self._connections))
+        self._connections = []
+        self._idle = None
+
+    # --- Conexiones ---
+
+    async def _connect(self, connection: _Connection) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            timeout=self.timeout,
+            use_tls=self.tls == "implicit",
+            start_tls={"implicit": None, "starttls": True, "none": False}[self.tls],
+        )
+        await client.connect()
+        await client.login(self.username, self.password)
+        connection.client = client
+        logger.debug(f"Conexión SMTP abierta con {self.hostname}:{self.port}")
+        return client
+
+    async def _close(self, connection: _Connection, graceful: bool = False) -> None:
+        client, connection.client = connection.client, None
+        if client is None:
+            return
+        try:
+            if graceful and client.is_connected:
+                await client.quit()
+            else:
+                client.close()
+        except Exception:
+            client.close()
+
+    async def _ready(self, connection: _Connection) -> aiosmtplib.SMTP:
+        """Devuelve una conexión válida, comprobándola con NOOP si llevaba tiempo ociosa."""
+        client = connection.client
+        if client is not None and client.is_connected:
+            if time.monotonic() - connection.last_used < self.health_check_interval:
+                return client
+            try:
+                await client.noop()
+                return client
+            except aiosmtplib.SMTPException:
+                logger.debug("Conexión SMTP inactiva descartada tras fallar el NOOP")
+        await self._close(connection)
+        return await self._connect(connection)
+
+    # --- Envío ---
+
+    async def _deliver(self, transaction: Callable[[aiosmtplib.SMTP], Awaitable]) -> None:
+        """Ejecuta una transacción por una de las conexiones del pool, reintentando los fallos transitorios."""
+        if not self.configured:
+            raise RuntimeError(f"SMTP no configurado para {self.hostname or 'el servidor de correo'}")
+        if self._idle is None:
+            raise RuntimeError("El pool SMTP no está iniciado; debe arrancarse en el lifespan de la aplicación")
+
+        for attempt in range(1, self.max_attempts + 1):
+            connection = await self._idle.get()
+            try:
+                client = await self._ready(connection)
+                await transaction(client)
+                connection.last_used = time.monotonic()
+                return
+            except Exception as e:
+                # Tras un fallo el estado de la sesión es incierto: la conexión se descarta
+                await self._close(connection)
+                if not _is_transient(e) or attempt == self.max_attempts:
+                    raise
+                delay = self.retry_delay * 2 ** (attempt - 1)
+                logger.warning(f"Fallo transitorio al enviar correo (intento {attempt}), reintento en {delay}s: {e}")
+            finally:
+                self._idle.put_nowait(connection)
+            await asyncio.sleep(delay)
+
+    async def send(self, message: Message) -> None:
+        """Envía un mensaje; remitente y destinatarios se toman de sus cabeceras."""
+        await self._deliver(lambda client: client.send_message(message))
+
+    async def sendmail(self, sender: str, recipients: Sequence[str], data: bytes) -> None:
+        """Envía un mensaje ya serializado (cabeceras y cuerpo MIME)."""
+        await self._deliver(lambda client: client.sendmail(sender, recipients, data))
+
+    async def send_many(
+        self, sender: str, messages: Sequence[tuple[Sequence[str], bytes]]
+    ) -> list[Optional[Exception]]:
+        """
+        Envía un lote de mensajes ya serializados, (destinatarios, datos), a
+        la vez por todas las conexiones del pool: cada conexión encadena los
+        mensajes que le tocan sin reconectar ni volver a autenticarse.
+        Devuelve, por mensaje, None si se entregó o la excepción del fallo
+        definitivo (tras los reintentos de los fallos transitorios).
+        """
+        results = await asyncio.gather(
+            *(self.sendmail(sender, recipients, data) for recipients, data in messages),
+            return_exceptions=True,
+        )
+        return [result if isinstance(result, Exception) else None for result in results]
+
+
+# Notificaciones de los pipelines (servidor SMTP_SERVER)
+notifications_smtp = SMTPPool(SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD)
+# Correos estructurados generados con OpenAI
+structured_email_smtp = SMTPPool(EMAIL_SMTP_SERVER, EMAIL_SMTP_PORT, EMAIL_USER, EMAIL_PASS)
@@ -0,0 +1,144 @@
+# app/core/subsystems.py
+
+import asyncio
+import importlib
+import logging
+import time
+from dataclasses import dataclass
+from functools import reduce
+from typing import Optional
+
+from fastapi import FastAPI
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Rutas de la documentación: necesitan todos los routers para generar el esquema
+_DOCS_PATHS = ("/openapi.json", "/docs", "/redoc")
+
+
+@dataclass(frozen=True)
+class Subsystem:
+    """
+    Router pesado que se puede importar bajo demanda. 'startup' y 'shutdown'
+    son rutas de atributos dentro del módulo (p. ej. "scraper_service.start")
+    de corrutinas que se ejecutan al cargarlo y al apagar la aplicación.
+    """
+
+    name: str
+    module: str
+    prefixes: tuple[str, ...]
+    startup: Optional[str] = None
+    shutdown: Optional[str] = None
+
+
+SUBSYSTEMS = (
+    Subsystem("scraper", "app.api.scraper", ("/scrape",), "scraper_service.start", "scraper_service.stop"),
+    Subsystem("email", "app.api.email", ("/send-structured-email",)),
+    Subsystem("campaigns", "app.api.campaigns", ("/campaigns",)),
+    Subsystem("calculator", "app.api.calculator", ("/calculator",)),
+    Subsystem(
+        "image_generator", "app.api.image_generator", ("/ia/",),
+        "start_inference_servers", "stop_inference_servers",
+    ),
+)
+
+
+class SubsystemManager:
+    """
+    Importa, registra e inicia los subsistemas. En modo diferido cada uno se
+    carga con la primera petición a uno de sus prefijos; en modo inmediato
+    los routers se registran al importar la aplicación, como el resto, y los
+    subsistemas se inician en el arranque.
+    """
+
+    def __init__(self, app: FastAPI, subsystems: tuple[Subsystem, ...]):
+        self.app = app
+        self.subsystems = {subsystem.name: subsystem for subsystem in subsystems}
+        self._modules: dict[str, object] = {}
+        self._started: list[str] = []
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def _subsystem(self, name: str) -> Subsystem:
+        try:
+            return self.subsystems[name]
+        except KeyError:
+            raise ValueError(f"Subsistema desconocido: {name}") from None
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._started
+
+    def match(self, path: str) -> Optional[Subsystem]:
+        for subsystem in self.subsystems.values():
+            if subsystem.name not in self._started and path.startswith(subsystem.prefixes):
+                return subsystem
+        return None
+
+    def register(self, name: str) -> None:
+        """Importa el módulo y registra su router (síncrono)."""
+        subsystem = self._subsystem(name)
+        if name in self._modules:
+            return
+        started = time.perf_counter()
+        module = importlib.import_module(subsystem.module)
+        self.app.include_router(module.router)
+        # El esquema OpenAPI cacheado no incluye las rutas nuevas
+        self.app.openapi_schema = None
+        self._modules[name] = module
+        logger.info(f"Subsistema '{name}' importado en {time.perf_counter() - started:.2f}s")
+
+    def register_all(self) -> None:
+        for name in self.subsystems:
+            self.register(name)
+
+    async def load(self, name: str) -> None:
+        """Importa (si hace falta) e inicia el subsistema una sola vez."""
+        subsystem = self._subsystem(name)
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            if name in self._started:
+                return
+            if name not in self._modules:
+                # La importación se hace en un hilo para no bloquear las demás peticiones
+                await asyncio.to_thread(self.register, name)
+            if subsystem.startup:
+                await reduce(getattr, subsystem.startup.split("."), self._modules[name])()
+            self._started.append(name)
+
+    async def load_many(self, names) -> None:
+        for name in list(names):
+            await self.load(name)
+
+    async def shutdown(self) -> None:
+        # En orden inverso al de arranque
+        for name in reversed(self._started):
+            subsystem = self.subsystems[name]
+            if subsystem.shutdown:
+                try:
+                    await reduce(getattr, subsystem.shutdown.split("."), self._modules[name])()
+                except Exception:
+                    logger.exception(f"Error al detener el subsistema '{name}'")
+        self._started.clear()
+
+
+class LazyRouterMiddleware:
+    """
+    Middleware ASGI que, antes de enrutar una petición, carga el subsistema
+    cuyo prefijo coincide con la ruta si aún no se ha cargado. Las rutas de
+    documentación cargan todos los subsistemas pendientes.
+    """
+
+    def __init__(self, app: ASGIApp, manager: SubsystemManager):
+        self.app = app
+        self.manager = manager
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] in ("http", "websocket"):
+            path = scope["path"]
+            if path in _DOCS_PATHS:
+                await self.manager.load_many(self.manager.subsystems)
+            else:
+                subsystem = self.manager.match(path)
+                if subsystem is not None:
+                    await self.manager.load(subsystem.name)
+        await self.app(scope, receive, send)
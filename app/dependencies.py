@@ -1,16 +1,64 @@
 # app/dependencies.py
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from collections import OrderedDict
+import hashlib
+import threading
+import time
 import jwt
-import os
+
+from app.core.config import JWT_SECRET_KEY, JWT_SECRET_KEYS, JWT_CACHE_SIZE, JWT_CACHE_MAX_TTL
 
 security = HTTPBearer()
 
+# hash del token -> (payload, instante hasta el que la verificación es válida)
+_verified_tokens: "OrderedDict[str, tuple[dict, float]]" = OrderedDict()
+# verify_token es síncrona y FastAPI la ejecuta en el threadpool: la caché se comparte entre hilos
+_cache_lock = threading.Lock()
+
+def _signing_key(token: str) -> str:
+    """Elige la clave según el 'kid' del token; sin 'kid' se usa JWT_SECRET_KEY."""
+    kid = jwt.get_unverified_header(token).get("kid")
+    if kid is None:
+        return JWT_SECRET_KEY
+    key = JWT_SECRET_KEYS.get(kid)
+    if key is None:
+        raise jwt.InvalidTokenError(f"kid desconocido: {kid}")
+    return key
+
+def _cache_get(token_hash: str, now: float):
+    with _cache_lock:
+        entry = _verified_tokens.get(token_hash)
+        if entry is None:
+            return None
+        payload, valid_until = entry
+        if now >= valid_until:
+            del _verified_tokens[token_hash]
+            return None
+        _verified_tokens.move_to_end(token_hash)
+        return payload
+
+def _cache_put(token_hash: str, payload: dict, now: float) -> None:
+    # El token deja de estar en caché al llegar su 'exp' (o tras JWT_CACHE_MAX_TTL si no tiene)
+    valid_until = now + JWT_CACHE_MAX_TTL
+    if "exp" in payload:
+        valid_until = min(valid_until, float(payload["exp"]))
+    with _cache_lock:
+        _verified_tokens[token_hash] = (payload, valid_until)
+        _verified_tokens.move_to_end(token_hash)
+        while len(_verified_tokens) > JWT_CACHE_SIZE:
+            _verified_tokens.popitem(last=False)
+
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
-    SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "your-secret-key")
+    token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    now = time.time()
+    payload = _cache_get(token_hash, now)
+    if payload is not None:
+        return payload
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        return payload  # Puedes devolver el payload o información del usuario
+        payload = jwt.decode(token, _signing_key(token), algorithms=["HS256"])
     except jwt.PyJWTError:
         raise HTTPException(status_code=403, detail="Token inválido")
+    _cache_put(token_hash, payload, now)
+    return payload  # Puedes devolver el payload o información del usuario
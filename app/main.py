@@ -1,16 +1,20 @@
 import logging
-import io
-from fastapi import FastAPI, UploadFile, File, Form, BackgroundTasks
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from PIL import Image
 
-from app.api import freepik, instagram, imgbb, auth, calculator, email
-from app.api.freepik import generate_image_from_prompt
-from app.api.imgbb import upload_image_to_imgbb
-from app.api.scraper import router as scraper_router
-from app.api.instagram import post_image_to_instagram
-from app.utils.email_utils import send_email
+from app.api import freepik, instagram, imgbb, auth, jobs
+from app.core import http_client
+from app.core.cleanup import imgbb_cleanup
+from app.core.config import LAZY_ROUTERS, PRELOAD_SUBSYSTEMS
+from app.core.executors import start_image_executor, stop_image_executor, run_image_task
+from app.core.jobs import job_queue
+from app.core.smtp import notifications_smtp, structured_email_smtp
+from app.core.subsystems import SUBSYSTEMS, LazyRouterMiddleware, SubsystemManager
+from app.utils import pipelines
+from app.utils.campaign_store import campaign_store
+from app.utils.image_handle import InvalidImageError
 
 # Configurar el logger principal
 logger = logging.getLogger("main")
@@ -21,8 +25,36 @@ formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(messag
 console_handler.setFormatter(formatter)
 logger.addHandler(console_handler)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Cliente HTTP compartido (pool de conexiones keep-alive) para todas las integraciones
+    await http_client.start_http_client()
+    # Pool de procesos para el trabajo de imagen (CPU)
+    start_image_executor()
+    # Pools de conexiones SMTP (se conectan bajo demanda en el primer envío)
+    await notifications_smtp.start()
+    await structured_email_smtp.start()
+    # Cola de trabajos persistente para los pipelines de generación y publicación
+    await job_queue.start()
+    # Borrado diferido de las imágenes temporales de Imgbb
+    await imgbb_cleanup.start()
+    # Subsistemas pesados (scraper, inferencia local...): en modo diferido solo se inician
+    # los de PRELOAD_SUBSYSTEMS; el resto, con la primera petición a su ruta
+    await subsystems.load_many(PRELOAD_SUBSYSTEMS if LAZY_ROUTERS else subsystems.subsystems)
+    try:
+        yield
+    finally:
+        await subsystems.shutdown()
+        await imgbb_cleanup.stop()
+        await job_queue.stop()
+        campaign_store.close()
+        await structured_email_smtp.stop()
+        await notifications_smtp.stop()
+        stop_image_executor()
+        await http_client.close_http_client()
+
 # Crear la aplicación FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 logger.info("Iniciando la aplicación FastAPI")
 
 # Configuración del middleware CORS
@@ -35,16 +67,22 @@ app.add_middleware(
 )
 logger.debug("Middleware CORS configurado")
 
+# Routers pesados (scraper, email, campaigns, calculator, image_generator): con LAZY_ROUTERS
+# se importan y registran con la primera petición a su ruta
+subsystems = SubsystemManager(app, SUBSYSTEMS)
+if LAZY_ROUTERS:
+    app.add_middleware(LazyRouterMiddleware, manager=subsystems)
+else:
+    subsystems.register_all()
+
 # Registrar routers
 app.include_router(instagram.router)
 app.include_router(freepik.router)
 app.include_router(imgbb.router)
 app.include_router(auth.router)
-app.include_router(calculator.router)
-app.include_router(email.router)
-app.include_router(scraper_router)
+app.include_router(jobs.router)
 
-logger.debug("Routers registrados: instagram, freepik, imgbb, auth, calculator, email")
+logger.debug("Routers registrados: instagram, freepik, imgbb, auth, jobs")
 
 # Modelo Pydantic
 class GenerateAndPostModel(BaseModel):
@@ -56,76 +94,69 @@ def root():
     logger.info("Solicitud GET a '/' recibida")
     return {"message": "Backend de AutoPoster funcionando correctamente"}
 
-@app.post("/generate_and_post")
-def generate_and_post(data: GenerateAndPostModel, background_tasks: BackgroundTasks):
+@app.post("/generate_and_post", status_code=202)
+async def generate_and_post(data: GenerateAndPostModel):
     logger.info("Solicitud POST a '/generate_and_post' recibida")
     try:
-        logger.debug(f"Generando imagen con el prompt: {data.prompt}")
-        freepik_result = generate_image_from_prompt(data.prompt)
-        if "error" in freepik_result:
-            logger.error(f"Error al generar imagen: {freepik_result['error']}")
-            return {"error": freepik_result["error"]}
-
-        image_url = freepik_result["image_url"]
-        logger.debug(f"Imagen generada: {image_url}")
-
-        logger.debug(f"Publicando imagen en Instagram con URL: {image_url} y caption: {data.caption}")
-        insta_result = post_image_to_instagram(image_url, data.caption)
-        if "error" in insta_result:
-            logger.error(f"Error al publicar en Instagram: {insta_result['error']}")
-            return {"error": insta_result["error"]}
-
-        subject = "Imagen generada y publicada en Instagram"
-        body = f"Tu imagen generada con el prompt '{data.prompt}' ha sido publicada en Instagram con éxito."
-        background_tasks.add_task(send_email, subject, body)
-
-        logger.info("Imagen generada y publicada con éxito")
-        return {"message": "Imagen generada y publicada con éxito"}
-    except Exception as e:
+        job_id = await job_queue.submit(
+            pipelines.GENERATE_AND_POST,
+            {"prompt": data.prompt, "caption": data.caption},
+        )
+        logger.info(f"Trabajo {job_id} encolado para generar y publicar la imagen")
+        return {"job_id": job_id, "status": "queued"}
+    except Exception:
         logger.exception("Error en '/generate_and_post'")
-        return {"error": "Error interno del servidor"}
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
 
-@app.post("/upload_and_post_image")
-def upload_and_post_image(
-    background_tasks: BackgroundTasks,
+@app.post("/upload_and_post_image", status_code=202)
+async def upload_and_post_image(
     image_file: UploadFile = File(...),
     caption: str = Form("")
 ):
     logger.info("Solicitud POST a '/upload_and_post_image' recibida")
+    # Importación diferida: dedup e image_prep cargan PIL, innecesario hasta la primera imagen
+    from app.utils.dedup import dedup_index, dhash, resolve_duplicate
+    from app.utils.image_prep import prepare_image
+
     try:
         logger.debug(f"Procesando archivo: {image_file.filename}")
-        image_bytes = image_file.file.read()
-
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        buffer = io.BytesIO()
-        image.save(buffer, format="JPEG")
-        buffer.seek(0)
-        image_bytes = buffer.read()
-
-        logger.debug("Subiendo imagen a IMGBB")
-        imgbb_result = upload_image_to_imgbb(image_bytes)
-        if "error" in imgbb_result:
-            logger.error(f"Error al subir imagen a IMGBB: {imgbb_result['error']}")
-            return {"error": imgbb_result["error"]}
-
-        image_url = imgbb_result["data"]["url"]
-        logger.debug(f"Imagen subida: {image_url}")
-
-        logger.debug(f"Publicando imagen en Instagram con URL: {image_url} y caption: {caption}")
-        insta_result = post_image_to_instagram(image_url, caption)
-        if "error" in insta_result:
-            logger.error(f"Error al publicar en Instagram: {insta_result['error']}")
-            return {"error": insta_result["error"]}
-
-        subject = "Imagen subida y publicada en Instagram"
-        body = "Tu imagen ha sido subida y publicada en Instagram con éxito."
-        background_tasks.add_task(send_email, subject, body)
-
-        logger.info("Imagen subida y publicada con éxito")
-        return {"message": "Imagen subida y publicada con éxito"}
-    except Exception as e:
+        image_bytes = await image_file.read()
+
+        # Si la imagen (o una casi idéntica) ya se publicó o se está publicando, no se repite
+        # el trabajo. Si no, el hash queda reservado hasta que el trabajo publique o falle
+        image_hash = await run_image_task(dhash, image_bytes)
+        reservation = {"pending": True}
+        duplicate = resolve_duplicate(image_hash, reservation)
+        if duplicate is not None:
+            logger.info("Imagen duplicada; se devuelve la publicación existente")
+            return duplicate
+
+        try:
+            # JPEG ya válido pasa tal cual; si no, se reduce y se recodifica dentro del presupuesto
+            # de bytes. El trabajo de PIL se hace en el pool de procesos para no bloquear el event loop
+            image = await run_image_task(prepare_image, image_bytes)
+            logger.debug(f"Imagen preparada: {image.width}x{image.height}, {image.size} bytes")
+
+            job_id = await job_queue.submit(
+                pipelines.UPLOAD_AND_POST,
+                {"caption": caption, "image_hash": image_hash},
+                blobs={"image": image.data},
+            )
+        except BaseException:
+            dedup_index.discard(image_hash)
+            raise
+        # Los duplicados que lleguen mientras tanto reciben el trabajo en curso
+        reservation["job_id"] = job_id
+        logger.info(f"Trabajo {job_id} encolado para subir y publicar la imagen")
+        return {"job_id": job_id, "status": "queued"}
+    except HTTPException:
+        raise
+    except InvalidImageError as e:
+        logger.info(f"Imagen rechazada en '/upload_and_post_image': {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
         logger.exception("Error en '/upload_and_post_image'")
-        return {"error": "Error interno del servidor"}
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from app.core.config import CAMPAIGNS_DB_PATH
+
+# Estados de cada destinatario de una campaña
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaign_recipients (
+    campaign_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    email TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (campaign_id, position)
+)
+"""
+
+
+class CampaignStore:
+    """
+    Estado de entrega por destinatario de las campañas de correo. Permite
+    reanudar un envío interrumpido sin repetir los ya entregados y consultar
+    el progreso. Los métodos son síncronos; desde asyncio se llaman con
+    asyncio.to_thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(_SCHEMA)
+        return self._conn
+
+    def add_recipients(self, campaign_id: str, recipients: list[str]) -> None:
+        """Registra los destinatarios una sola vez (ignora la llamada si ya existen)."""
+        now = time.time()
+        with self._lock, self._connection() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO campaign_recipients (campaign_id, position, email, status, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(campaign_id, position, email, PENDING, now) for position, email in enumerate(recipients)],
+            )
+
+    def has_recipients(self, campaign_id: str) -> bool:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT 1 FROM campaign_recipients WHERE campaign_id = ? LIMIT 1", (campaign_id,)
+            ).fetchone()
+        return row is not None
+
+    def pending(self, campaign_id: str, limit: int) -> list[tuple[int, str]]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT position, email FROM campaign_recipients WHERE campaign_id = ? AND status = ?"
+                " ORDER BY position LIMIT ?",
+                (campaign_id, PENDING, limit),
+            ).fetchall()
+        return [(row["position"], row["email"]) for row in rows]
+
+    def mark(self, campaign_id: str, results: list[tuple[int, Optional[str]]]) -> None:
+        """Marca cada posición como enviada (error None) o fallida con su error."""
+        now = time.time()
+        with self._lock, self._connection() as conn:
+            conn.executemany(
+                "UPDATE campaign_recipients SET status = ?, error = ?, updated_at = ?"
+                " WHERE campaign_id = ? AND position = ?",
+                [
+                    (SENT if error is None else FAILED, error, now, campaign_id, position)
+                    for position, error in results
+                ],
+            )
+
+    def progress(self, campaign_id: str) -> dict:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT status, COUNT(*) AS total FROM campaign_recipients WHERE campaign_id = ? GROUP BY status",
+                (campaign_id,),
+            ).fetchall()
+        counts = {PENDING: 0, SENT: 0, FAILED: 0}
+        counts.update({row["status"]: row["total"] for row in rows})
+        return counts
+
+    def failures(self, campaign_id: str, limit: int = 100) -> list[dict]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT email, error FROM campaign_recipients WHERE campaign_id = ? AND status = ?"
+                " ORDER BY position LIMIT ?",
+                (campaign_id, FAILED, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+campaign_store = CampaignStore(CAMPAIGNS_DB_PATH)
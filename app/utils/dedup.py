@@ -0,0 +1,156 @@
+import bisect
+import time
+from array import array
+from typing import Optional
+
+import numpy as np
+from fastapi import HTTPException
+from PIL import Image
+
+from app.core.config import DEDUP_WINDOW, DEDUP_MAX_DISTANCE, DEDUP_MAX_ENTRIES, DEDUP_MODE
+from app.utils.image_handle import InvalidImageError, open_buffer
+
+HASH_SIZE = 8  # 8x8 bits -> hash de 64 bits
+
+
+def dhash(data: bytes) -> int:
+    """
+    Hash perceptual por diferencias (dHash): compara cada píxel con su vecino
+    derecho en una miniatura en escala de grises de 9x8. Imágenes casi
+    idénticas (recompresiones, redimensiones) producen hashes muy cercanos.
+    """
+    try:
+        with open_buffer(data) as fp:
+            image = Image.open(fp)
+            # En JPEG se decodifica directamente a escala reducida y en grises
+            image.draft("L", (HASH_SIZE * 4, HASH_SIZE * 4))
+            pixels = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS).tobytes()
+    except (OSError, Image.DecompressionBombError) as e:
+        # UnidentifiedImageError y las imágenes truncadas son OSError
+        raise InvalidImageError(f"Imagen no válida: {e}") from e
+
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+class DedupIndex:
+    """
+    Índice de hashes recientes guardados en arrays compactos (64 bits por hash
+    y 8 bytes por marca de tiempo), con búsqueda por distancia de Hamming
+    dentro de una ventana de tiempo.
+
+    Una petición reserva el hash (reserve) antes de empezar a publicar, así
+    una copia que llega mientras tanto ya se detecta como duplicada; al
+    publicar se confirma la referencia (add) y si falla se libera (discard).
+    """
+
+    def __init__(self, window: int, max_distance: int, max_entries: int):
+        self.window = window
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self._hashes = array("Q")
+        self._timestamps = array("d")
+        self._refs: list[dict] = []
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def _drop_oldest(self, count: int) -> None:
+        del self._hashes[:count]
+        del self._timestamps[:count]
+        del self._refs[:count]
+
+    def _prune(self, now: float) -> None:
+        # Las entradas se añaden en orden temporal: las caducadas están al principio
+        expired = bisect.bisect_left(self._timestamps, now - self.window)
+        if expired:
+            self._drop_oldest(expired)
+
+    def _nearest(self, value: int) -> Optional[dict]:
+        if not self._hashes:
+            return None
+        # XOR y conteo de bits sobre todo el array a la vez, sin copiarlo
+        hashes = np.frombuffer(self._hashes, dtype=np.uint64)
+        distances = _popcount(hashes ^ np.uint64(value))
+        del hashes
+        best = int(distances.argmin())
+        return self._refs[best] if distances[best] <= self.max_distance else None
+
+    def _position(self, value: int) -> Optional[int]:
+        # Entrada más reciente con exactamente ese hash (la reserva, si existe)
+        matches = np.flatnonzero(np.frombuffer(self._hashes, dtype=np.uint64) == np.uint64(value))
+        return int(matches[-1]) if len(matches) else None
+
+    def _append(self, value: int, ref: dict, now: float) -> None:
+        if len(self._hashes) >= self.max_entries:
+            self._drop_oldest(len(self._hashes) - self.max_entries + 1)
+        self._hashes.append(value)
+        self._timestamps.append(now)
+        self._refs.append(ref)
+
+    def find(self, value: int) -> Optional[dict]:
+        """Devuelve la referencia del hash más cercano dentro de max_distance."""
+        self._prune(time.time())
+        return self._nearest(value)
+
+    def reserve(self, value: int, ref: dict) -> Optional[dict]:
+        """
+        Devuelve la referencia existente si el hash es un duplicado; si no, lo
+        registra con 'ref' y devuelve None. No hay await entre la búsqueda y el
+        registro, de modo que dos peticiones concurrentes no pueden pasar ambas.
+        """
+        now = time.time()
+        self._prune(now)
+        existing = self._nearest(value)
+        if existing is None:
+            self._append(value, ref, now)
+        return existing
+
+    def add(self, value: int, ref: dict) -> None:
+        """Registra la publicación; si el hash estaba reservado, sustituye la referencia de la reserva."""
+        now = time.time()
+        self._prune(now)
+        index = self._position(value)
+        if index is not None:
+            self._refs[index] = ref
+        else:
+            self._append(value, ref, now)
+
+    def discard(self, value: int) -> None:
+        """Libera la reserva de un hash cuya publicación ha fallado."""
+        index = self._position(value)
+        if index is not None:
+            del self._hashes[index]
+            del self._timestamps[index]
+            del self._refs[index]
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    # NumPy < 2.0: se cuentan los bits de los 8 bytes de cada hash
+    return np.unpackbits(values.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+
+
+dedup_index = DedupIndex(DEDUP_WINDOW, DEDUP_MAX_DISTANCE, DEDUP_MAX_ENTRIES)
+
+
+def resolve_duplicate(value: int, reservation: dict) -> Optional[dict]:
+    """
+    Si la imagen ya se publicó (o se está publicando) dentro de la ventana,
+    devuelve la respuesta con la referencia existente (el media_id de
+    Instagram, o el job_id mientras está en curso; modo 'reference') o lanza
+    un 409 (modo 'reject').
+    Si no es un duplicado, reserva el hash con 'reservation' y devuelve None;
+    quien llama debe confirmar la publicación (add) o liberarla (discard).
+    """
+    ref = dedup_index.reserve(value, reservation)
+    if ref is None:
+        return None
+    if DEDUP_MODE == "reject":
+        raise HTTPException(status_code=409, detail={"message": "La imagen ya se publicó anteriormente", **ref})
+    return {"message": "La imagen ya se publicó anteriormente", "duplicate": True, **ref}
@@ -0,0 +1,210 @@
+import html
+import re
+import secrets
+from dataclasses import dataclass
+from email.charset import Charset, QP
+from email.header import Header
+from email.headerregistry import Address
+from email.utils import formatdate, make_msgid
+
+# Campos de plantilla: {{nombre}}
+_FIELD_PATTERN = re.compile(r"\{\{(\w+)\}\}")
+
+# Cuerpos en quoted-printable UTF-8: el resultado es ASCII y se puede trocear
+_UTF8_QP = Charset("utf-8")
+_UTF8_QP.body_encoding = QP
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """
+    Plantilla troceada una sola vez en literales y campos. Renderizar es
+    solo unir cadenas, sin volver a analizar el texto.
+    """
+
+    literals: tuple[str, ...]
+    fields: tuple[str, ...]
+
+    def render(self, **values: str) -> str:
+        parts = [self.literals[0]]
+        for field, literal in zip(self.fields, self.literals[1:]):
+            parts.append(values[field])
+            parts.append(literal)
+        return "".join(parts)
+
+    def partial(self, **values: str) -> "CompiledTemplate":
+        """Fija algunos campos y devuelve una plantilla con los restantes."""
+        literals, fields = [self.literals[0]], []
+        for field, literal in zip(self.fields, self.literals[1:]):
+            if field in values:
+                literals[-1] += values[field] + literal
+            else:
+                fields.append(field)
+                literals.append(literal)
+        return CompiledTemplate(tuple(literals), tuple(fields))
+
+
+def compile_template(text: str) -> CompiledTemplate:
+    pieces = _FIELD_PATTERN.split(text)
+    return CompiledTemplate(tuple(pieces[0::2]), tuple(pieces[1::2]))
+
+
+class PersonalizedMessageFactory:
+    """
+    Genera mensajes MIME (multipart/alternative, texto + HTML) por destinatario
+    a partir de plantillas en las que solo queda por rellenar 'recipient'.
+    Los literales se codifican en quoted-printable una sola vez; por cada
+    destinatario solo se codifican las cabeceras y el propio destinatario.
+    """
+
+    def __init__(self, sender: str, subject: str, text: CompiledTemplate, html_body: CompiledTemplate):
+        self.sender = sender
+        self._domain = sender.rpartition("@")[2] or None
+        self._boundary = f"==============={secrets.token_hex(12)}=="
+        self._head = (
+            f"From: {sender}\n"
+            f"Subject: {Header(subject, 'utf-8').encode()}\n"
+            "MIME-Version: 1.0\n"
+            f'Content-Type: multipart/alternative; boundary="{self._boundary}"\n'
+            "\n"
+        )
+        self._parts = [
+            ("plain", text, False, [_UTF8_QP.body_encode(literal) for literal in text.literals]),
+            ("html", html_body, True, [_UTF8_QP.body_encode(literal) for literal in html_body.literals]),
+        ]
+
+    def build(self, recipient: str) -> bytes:
+        # Address valida la dirección (y rechaza saltos de línea en la cabecera)
+        address = Address(addr_spec=recipient)
+        chunks = [
+            f"To: {address}\n",
+            f"Date: {formatdate(localtime=True)}\n",
+            f"Message-ID: {make_msgid(domain=self._domain)}\n",
+            self._head,
+        ]
+        for subtype, template, escape, encoded_literals in self._parts:
+            value = _UTF8_QP.body_encode(html.escape(recipient) if escape else recipient)
+            chunks.append(
+                f"--{self._boundary}\n"
+                f'Content-Type: text/{subtype}; charset="utf-8"\n'
+                "Content-Transfer-Encoding: quoted-printable\n"
+                "\n"
+            )
+            # Los fragmentos codificados por separado se pueden concatenar: el
+            # resultado decodifica al texto completo (alguna línea puede superar
+            # los 76 caracteres recomendados, muy por debajo del límite SMTP)
+            chunks.append(encoded_literals[0])
+            for literal in encoded_literals[1:]:
+                chunks.append(value)
+                chunks.append(literal)
+            chunks.append("\n")
+        chunks.append(f"--{self._boundary}--\n")
+        return "".join(chunks).encode("ascii")
+
+
+# Plantilla del correo estructurado; {{footer}} solo se rellena en las campañas
+_EMAIL_HTML_SOURCE = """<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8" />
+    <style>
+        body {
+            margin: 0;
+            padding: 0;
+            font-family: 'Helvetica Neue', Arial, sans-serif;
+            background-color: #f2f2f2;
+        }
+        .container {
+            max-width: 700px;
+            margin: 40px auto;
+            background-color: #ffffff;
+            border-radius: 8px;
+            box-shadow: 0 2px 8px rgba(0,0,0,0.15);
+            padding: 30px;
+        }
+        .header {
+            background-color: #555;
+            text-align: center;
+            padding: 40px 20px;
+            border-radius: 8px 8px 0 0;
+        }
+        .header h1 {
+            color: #fff;
+            margin: 0;
+            font-size: 34px;
+        }
+        /* Estilos para contenido interno */
+        .content h2 {
+            margin-top: 30px;
+            margin-bottom: 15px;
+            font-size: 24px;
+            color: #333;
+        }
+        .content h3 {
+            margin-top: 25px;
+            margin-bottom: 12px;
+            font-size: 20px;
+            color: #444;
+        }
+        .content p {
+            margin-bottom: 18px;
+            line-height: 1.6;
+            font-size: 15px;
+            color: #555;
+        }
+        .content ul {
+            margin-left: 20px;
+            margin-bottom: 18px;
+            color: #555;
+        }
+        .content li {
+            margin-bottom: 8px;
+        }
+        .footer {
+            text-align: center;
+            padding: 20px;
+            font-size: 13px;
+            color: #666;
+            border-top: 1px solid #ddd;
+            margin-top: 40px;
+        }
+        .footer a {
+            color: #007BFF;
+            text-decoration: none;
+        }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>{{subject}}</h1>
+        </div>
+        <div class="content">
+            {{content}}
+        </div>
+        <div class="footer">
+            {{footer}}<p>¿Tienes preguntas? <a href="mailto:soporte@ejemplo.com">Contáctanos</a></p>
+            <p>Síguenos en 
+                <a href="https://www.twitter.com">Twitter</a> | 
+                <a href="https://www.facebook.com">Facebook</a>
+            </p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+# Compiladas una sola vez al importar el módulo. El correo estructurado va a
+# todos los destinatarios a la vez; en las campañas cada mensaje indica a quién
+# se ha enviado
+EMAIL_HTML = compile_template(_EMAIL_HTML_SOURCE.replace("{{footer}}", ""))
+CAMPAIGN_EMAIL_HTML = compile_template(
+    _EMAIL_HTML_SOURCE.replace("{{footer}}", "<p>Este correo se ha enviado a {{recipient}}</p>\n            ")
+)
+
+EMAIL_TEXT = compile_template(
+    "Este correo está diseñado en HTML, por favor utiliza un cliente que lo soporte.\n\n"
+    "Estructura:\n{{structure}}\n\n"
+    "Contenido (HTML):\n{{content}}\n\n"
+    "Las imágenes se han subido a Imgbb tras generarse con Freepik."
+)
@@ -1,18 +1,17 @@
-import smtplib
+import logging
 from email.mime.text import MIMEText
-from app.core.config import SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SENDER_EMAIL, RECIPIENT_EMAIL
+from app.core.config import SENDER_EMAIL, RECIPIENT_EMAIL
+from app.core.smtp import notifications_smtp
 
-def send_email(subject: str, body: str):
+async def send_email(subject: str, body: str):
     msg = MIMEText(body)
     msg['Subject'] = subject
     msg['From'] = SENDER_EMAIL
     msg['To'] = RECIPIENT_EMAIL
 
     try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.sendmail(SENDER_EMAIL, RECIPIENT_EMAIL, msg.as_string())
-        print(f"Correo enviado a {RECIPIENT_EMAIL}")
+        # Conexión autenticada reutilizada del pool, sin bloquear el event loop
+        await notifications_smtp.send(msg)
+        logging.info(f"Correo enviado a {RECIPIENT_EMAIL}")
     except Exception as e:
-        print(f"Error al enviar el correo: {e}")
\ No newline at end of file
+        logging.error(f"Error al enviar el correo: {e}")
@@ -0,0 +1,151 @@
+import ast
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable
+
+import numpy as np
+
+from app.core.config import EXPRESSION_CACHE_SIZE, EXPRESSION_MAX_LENGTH
+
+# Tipos de error por elemento que puede notificar una expresión
+DIVISION_BY_ZERO = "division_by_zero"
+NEGATIVE_SQUARE_ROOT = "negative_square_root"
+
+# Límite de nodos del árbol para acotar el coste de compilar y evaluar
+_MAX_NODES = 500
+
+_CONSTANTS = {"pi": math.pi, "e": math.e}
+
+# Evaluación vectorizada: cada nodo recibe el entorno (variable -> array) y una
+# función 'flag(kind, mask)' con la que marca los elementos que fallan
+Env = dict[str, np.ndarray]
+Flag = Callable[[str, np.ndarray], None]
+Evaluator = Callable[[Env, Flag], np.ndarray]
+
+
+class ExpressionError(ValueError):
+    """Expresión con sintaxis inválida o con construcciones no permitidas."""
+
+
+@dataclass(frozen=True)
+class CompiledExpression:
+    text: str
+    variables: frozenset[str]
+    evaluate: Evaluator
+
+
+def _divide(left: Evaluator, right: Evaluator) -> Evaluator:
+    def evaluate(env: Env, flag: Flag) -> np.ndarray:
+        a, b = left(env, flag), right(env, flag)
+        flag(DIVISION_BY_ZERO, b == 0)
+        return np.divide(a, b)
+    return evaluate
+
+
+def _modulo(left: Evaluator, right: Evaluator) -> Evaluator:
+    def evaluate(env: Env, flag: Flag) -> np.ndarray:
+        a, b = left(env, flag), right(env, flag)
+        flag(DIVISION_BY_ZERO, b == 0)
+        return np.mod(a, b)
+    return evaluate
+
+
+def _sqrt(argument: Evaluator) -> Evaluator:
+    def evaluate(env: Env, flag: Flag) -> np.ndarray:
+        value = argument(env, flag)
+        flag(NEGATIVE_SQUARE_ROOT, value < 0)
+        return np.sqrt(value)
+    return evaluate
+
+
+def _binary(function: Callable[[np.ndarray, np.ndarray], np.ndarray]):
+    def build(left: Evaluator, right: Evaluator) -> Evaluator:
+        return lambda env, flag: function(left(env, flag), right(env, flag))
+    return build
+
+
+def _unary(function: Callable[[np.ndarray], np.ndarray]):
+    def build(argument: Evaluator) -> Evaluator:
+        return lambda env, flag: function(argument(env, flag))
+    return build
+
+
+_BINARY_OPERATORS = {
+    ast.Add: _binary(np.add),
+    ast.Sub: _binary(np.subtract),
+    ast.Mult: _binary(np.multiply),
+    ast.Div: _divide,
+    ast.Mod: _modulo,
+    ast.Pow: _binary(np.power),
+}
+
+_UNARY_OPERATORS = {
+    ast.USub: _unary(np.negative),
+    ast.UAdd: _unary(np.positive),
+}
+
+# Funciones permitidas en las expresiones (todas de un argumento)
+_FUNCTIONS = {
+    "sqrt": _sqrt,
+    "abs": _unary(np.abs),
+}
+
+
+def _constant(value: float) -> Evaluator:
+    try:
+        array = np.float64(value)
+    except OverflowError:
+        # Literales enteros que no caben en un float64
+        raise ExpressionError("Numeric literal too large") from None
+    return lambda env, flag: array
+
+
+def _variable(name: str) -> Evaluator:
+    return lambda env, flag: env[name]
+
+
+def _build(node: ast.AST, variables: set[str]) -> Evaluator:
+    if isinstance(node, ast.Expression):
+        return _build(node.body, variables)
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ExpressionError(f"Unsupported constant: {node.value!r}")
+        return _constant(node.value)
+    if isinstance(node, ast.Name):
+        if node.id in _CONSTANTS:
+            return _constant(_CONSTANTS[node.id])
+        variables.add(node.id)
+        return _variable(node.id)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        return _BINARY_OPERATORS[type(node.op)](_build(node.left, variables), _build(node.right, variables))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_build(node.operand, variables))
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS:
+            raise ExpressionError("Only these functions are allowed: " + ", ".join(sorted(_FUNCTIONS)))
+        if len(node.args) != 1 or node.keywords:
+            raise ExpressionError(f"{node.func.id}() takes exactly one argument")
+        return _FUNCTIONS[node.func.id](_build(node.args[0], variables))
+    raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_expression(text: str) -> CompiledExpression:
+    """
+    Analiza una expresión aritmética y la compila a una función vectorizada
+    sobre arrays de NumPy. Solo se admiten números, variables, las constantes
+    pi/e, los operadores + - * / % ** y las funciones de _FUNCTIONS; nunca se
+    ejecuta código Python arbitrario.
+    """
+    if len(text) > EXPRESSION_MAX_LENGTH:
+        raise ExpressionError(f"Expression longer than {EXPRESSION_MAX_LENGTH} characters")
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid syntax: {e.msg}") from None
+    if sum(1 for _ in ast.walk(tree)) > _MAX_NODES:
+        raise ExpressionError("Expression too complex")
+    variables: set[str] = set()
+    evaluator = _build(tree, variables)
+    return CompiledExpression(text, frozenset(variables), evaluator)
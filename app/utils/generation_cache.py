@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántas escrituras se barre el directorio en busca de entradas caducadas
+_PURGE_EVERY = 100
+
+
+class GenerationCache:
+    """
+    Caché de dos niveles para resultados de generación de imágenes:
+      1) LRU en memoria limitada por bytes.
+      2) Almacén en disco con caducidad (TTL) basada en la fecha de escritura.
+    Las claves son un hash del prompt normalizado y de los parámetros de estilo.
+    """
+
+    def __init__(self, max_memory_bytes: int, cache_dir: str, ttl: int):
+        self.max_memory_bytes = max_memory_bytes
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(prompt: str, params: dict) -> str:
+        normalized = " ".join(prompt.split()).lower()
+        raw = json.dumps({"prompt": normalized, "params": params}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.bin")
+
+    # --- Nivel 1: memoria ---
+
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory.move_to_end(key)
+        return value
+
+    def _memory_put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = value
+        self._memory_bytes += len(value)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    # --- Nivel 2: disco ---
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _disk_put(self, key: str, value: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+
+    def purge_expired(self) -> int:
+        """Elimina del disco las entradas que han superado el TTL."""
+        removed = 0
+        now = time.time()
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if now - os.path.getmtime(path) > self.ttl:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    continue
+        return removed
+
+    # --- API pública ---
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = self._memory_get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+        value = await asyncio.to_thread(self._disk_get, key)
+        if value is not None:
+            self.disk_hits += 1
+            self._memory_put(key, value)
+            return value
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, value: bytes) -> None:
+        self._memory_put(key, value)
+        try:
+            await asyncio.to_thread(self._disk_put, key, value)
+        except OSError as e:
+            logger.warning(f"No se pudo escribir la entrada {key} en la caché de disco: {e}")
+        self._writes += 1
+        if self._writes % _PURGE_EVERY == 0:
+            removed = await asyncio.to_thread(self.purge_expired)
+            if removed:
+                logger.debug(f"Caché de generación: {removed} entradas caducadas eliminadas")
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "max_memory_bytes": self.max_memory_bytes,
+        }
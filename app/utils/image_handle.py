@@ -0,0 +1,118 @@
+import base64
+import io
+from dataclasses import dataclass
+from typing import Optional, Union
+
+# Firmas (magic bytes) de los formatos que devuelven o aceptan las integraciones
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", "png"),
+    (b"GIF8", "image/gif", "gif"),
+    (b"RIFF", "image/webp", "webp"),
+)
+
+
+class InvalidImageError(ValueError):
+    """Los datos recibidos no se pueden decodificar como imagen."""
+
+
+def sniff_content_type(data: Union[bytes, memoryview]) -> tuple[str, str]:
+    """Devuelve (content_type, extensión) a partir de la cabecera de la imagen."""
+    header = bytes(data[:8])
+    for signature, content_type, extension in _SIGNATURES:
+        if header.startswith(signature):
+            return content_type, extension
+    return "application/octet-stream", "bin"
+
+
+class _MemoryReader(io.RawIOBase):
+    """Fichero de solo lectura sobre un memoryview: lee por bloques sin copiar el buffer entero."""
+
+    def __init__(self, view: memoryview):
+        self._view = view.cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        chunk = self._view[self._pos:self._pos + len(buffer)]
+        size = len(chunk)
+        buffer[:size] = chunk
+        self._pos += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self) -> None:
+        # Sin referencias al buffer, quien lo creó puede liberarlo (p. ej. memoria compartida)
+        self._view.release()
+        super().close()
+
+
+def open_buffer(data: Union[bytes, memoryview]) -> io.RawIOBase:
+    """
+    Objeto tipo fichero para leer la imagen con PIL. Con 'bytes' el BytesIO
+    comparte el buffer; un memoryview (memoria compartida) se lee en su sitio.
+    """
+    if isinstance(data, memoryview):
+        return _MemoryReader(data)
+    return io.BytesIO(data)
+
+
+@dataclass(frozen=True)
+class ImageHandle:
+    """
+    Imagen en binario que circula entre Freepik, Imgbb e Instagram sin
+    conversiones intermedias. 'data' puede ser bytes o un memoryview sobre
+    un buffer existente (por ejemplo, el de un BytesIO), evitando copias.
+    """
+
+    data: Union[bytes, memoryview]
+    content_type: str
+    filename: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+    @classmethod
+    def from_bytes(
+        cls,
+        data: Union[bytes, memoryview],
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+    ) -> "ImageHandle":
+        content_type, extension = sniff_content_type(data)
+        return cls(data, content_type, f"image.{extension}", width, height)
+
+    @classmethod
+    def from_base64(cls, value: str) -> "ImageHandle":
+        # Único punto en el que se decodifica el base64
+        return cls.from_bytes(base64.b64decode(value))
+
+    def __reduce__(self):
+        # Un memoryview no se puede serializar; al cruzar procesos se envía como bytes
+        return (type(self), (bytes(self.data), self.content_type, self.filename, self.width, self.height))
+
+    @property
+    def size(self) -> int:
+        return self.data.nbytes if isinstance(self.data, memoryview) else len(self.data)
+
+    def to_base64(self) -> str:
+        """Solo para respuestas de la API que siguen exponiendo base64."""
+        return base64.b64encode(self.data).decode("ascii")
+
+    def as_file(self) -> io.BytesIO:
+        """
+        Objeto tipo fichero para subir la imagen en multipart por bloques.
+        Con 'bytes' el BytesIO comparte el buffer y no realiza copia.
+        """
+        return io.BytesIO(self.data)
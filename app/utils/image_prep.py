@@ -0,0 +1,92 @@
+import io
+import logging
+from typing import Union
+
+from PIL import Image
+
+from app.core.config import IMAGE_MAX_DIMENSION, IMAGE_MAX_BYTES, JPEG_MAX_QUALITY, JPEG_MIN_QUALITY
+from app.utils.image_handle import ImageHandle, InvalidImageError, open_buffer
+
+logger = logging.getLogger(__name__)
+
+
+def is_compliant_jpeg(image: Image.Image, size: int, max_dimension: int, max_bytes: int) -> bool:
+    """
+    Indica si la imagen ya es un JPEG baseline RGB dentro de los límites,
+    en cuyo caso se puede enviar tal cual. Solo consulta la cabecera.
+    """
+    return (
+        image.format == "JPEG"
+        and image.mode == "RGB"
+        and not image.info.get("progressive")
+        and not image.info.get("progression")
+        and max(image.size) <= max_dimension
+        and size <= max_bytes
+    )
+
+
+def encode_within_budget(image: Image.Image, max_bytes: int) -> memoryview:
+    """
+    Codifica en JPEG buscando (búsqueda binaria) la mayor calidad cuyo
+    resultado cabe en 'max_bytes'. Si ni la calidad mínima cabe, se
+    devuelve la codificación con la calidad mínima.
+    """
+    def encode(quality: int) -> io.BytesIO:
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+        return buffer
+
+    best = encode(JPEG_MAX_QUALITY)
+    if best.tell() <= max_bytes:
+        return best.getbuffer()
+
+    low, high = JPEG_MIN_QUALITY, JPEG_MAX_QUALITY - 1
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        candidate = encode(quality)
+        if candidate.tell() <= max_bytes:
+            best = candidate
+            low = quality + 1
+        else:
+            high = quality - 1
+
+    if best is None:
+        logger.warning(f"La imagen no cabe en {max_bytes} bytes ni con calidad {JPEG_MIN_QUALITY}")
+        best = encode(JPEG_MIN_QUALITY)
+    return best.getbuffer()
+
+
+def prepare_image(
+    data: Union[bytes, memoryview],
+    max_dimension: int = IMAGE_MAX_DIMENSION,
+    max_bytes: int = IMAGE_MAX_BYTES,
+) -> ImageHandle:
+    """
+    Deja la imagen lista para Imgbb/Instagram:
+      1) Los JPEG que ya cumplen los límites pasan sin decodificarse.
+      2) Los JPEG grandes se decodifican en modo draft, directamente a una
+         escala reducida (1/2, 1/4 o 1/8), y se ajustan a 'max_dimension'.
+      3) Se busca la calidad JPEG que cumple el presupuesto de bytes.
+    Lanza InvalidImageError si los datos no se pueden decodificar.
+    """
+    try:
+        # Se cierra el lector al acabar para liberar la vista sobre la memoria compartida
+        with open_buffer(data) as fp:
+            # Image.open solo lee la cabecera; la decodificación es perezosa
+            image = Image.open(fp)
+            if is_compliant_jpeg(image, len(data), max_dimension, max_bytes):
+                # Una vista de la memoria compartida no sobrevive al worker: se devuelve una copia
+                data = bytes(data) if isinstance(data, memoryview) else data
+                return ImageHandle(data, "image/jpeg", "image.jpg", image.width, image.height)
+
+            if image.format == "JPEG":
+                image.draft("RGB", (max_dimension, max_dimension))
+            image = image.convert("RGB")
+    except (OSError, Image.DecompressionBombError) as e:
+        raise InvalidImageError(f"Imagen no válida: {e}") from e
+    if max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    encoded = encode_within_budget(image, max_bytes)
+    return ImageHandle(encoded, "image/jpeg", "image.jpg", image.width, image.height)
@@ -0,0 +1,86 @@
+# app/utils/importtime_report.py
+"""
+Informe del tiempo de importación de la aplicación a partir de
+`python -X importtime`. Uso:
+
+    python -m app.utils.importtime_report [--module app.main] [--top 20] [--max-ms 800]
+
+Con --max-ms el proceso termina con código 1 si el tiempo total supera el
+presupuesto, de modo que se puede vigilar en CI.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+
+# import time: self [us] | cumulative | imported package
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+@dataclass
+class ImportEntry:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> list[ImportEntry]:
+    entries = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            # El nivel de anidamiento se indica con dos espacios por nivel
+            entries.append(ImportEntry(name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+
+def measure(module: str) -> list[ImportEntry]:
+    """Importa el módulo en un intérprete nuevo y devuelve las entradas de -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONWARNINGS": "ignore"},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {module}:\n{result.stderr}")
+    return parse_importtime(result.stderr)
+
+
+def total_ms(entries: list[ImportEntry]) -> float:
+    # Las entradas de nivel superior suman todo lo importado
+    return sum(entry.cumulative_us for entry in entries if entry.depth == 0) / 1000
+
+
+def format_report(entries: list[ImportEntry], top: int) -> str:
+    lines = [f"Tiempo total de importación: {total_ms(entries):.1f} ms", ""]
+    lines.append(f"{'acumulado (ms)':>15} {'propio (ms)':>12}  módulo")
+    for entry in sorted(entries, key=lambda e: e.cumulative_us, reverse=True)[:top]:
+        lines.append(f"{entry.cumulative_us / 1000:>15.1f} {entry.self_us / 1000:>12.1f}  {entry.name}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Informe de tiempo de importación (-X importtime)")
+    parser.add_argument("--module", default="app.main", help="Módulo a importar (por defecto app.main)")
+    parser.add_argument("--top", type=int, default=20, help="Número de módulos más lentos a mostrar")
+    parser.add_argument("--max-ms", type=float, default=None, help="Presupuesto de tiempo total en ms")
+    args = parser.parse_args(argv)
+
+    entries = measure(args.module)
+    print(format_report(entries, args.top))
+
+    total = total_ms(entries)
+    if args.max_ms is not None and total > args.max_ms:
+        print(f"\nPresupuesto superado: {total:.1f} ms > {args.max_ms:.1f} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
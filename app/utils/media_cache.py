@@ -0,0 +1,73 @@
+import time
+from typing import AsyncIterator, Callable
+
+
+class MediaCache:
+    """
+    Caché incremental del listado de media (del más reciente al más antiguo).
+    Dentro del TTL se sirve sin llamar a la API; al caducar solo se piden las
+    páginas hasta encontrar el último id ya conocido. La descarga incremental
+    no ve los media borrados o editados, así que cada 'full_refresh_interval'
+    segundos (y tras invalidate) se descarga el listado completo.
+    """
+
+    def __init__(self, ttl: float, full_refresh_interval: float):
+        self.ttl = ttl
+        self.full_refresh_interval = full_refresh_interval
+        self._items: list[dict] = []
+        self._refreshed_at = 0.0
+        self._full_refreshed_at = 0.0
+        # Cambia con cada invalidate(): una descarga empezada antes no debe restaurar la caché
+        self._generation = 0
+
+    def is_fresh(self) -> bool:
+        return bool(self._items) and time.monotonic() - self._refreshed_at < self.ttl
+
+    def invalidate(self) -> None:
+        self._items = []
+        self._refreshed_at = 0.0
+        self._generation += 1
+
+    async def stream(
+        self,
+        fetch_pages: Callable[[], AsyncIterator[list[dict]]],
+        force_full: bool = False,
+    ) -> AsyncIterator[dict]:
+        """
+        Emite los items a medida que llegan de la API (o de la caché) y, al
+        terminar, actualiza la caché. Si la descarga se interrumpe la caché no
+        se modifica.
+        """
+        cached = self._items
+        if self.is_fresh() and not force_full:
+            for item in cached:
+                yield item
+            return
+
+        generation = self._generation
+        full = (
+            force_full or not cached
+            or time.monotonic() - self._full_refreshed_at >= self.full_refresh_interval
+        )
+        known_id = None if full else cached[0]["id"]
+        new_items = []
+        reached_known = False
+        async for page in fetch_pages():
+            for item in page:
+                if item.get("id") == known_id:
+                    reached_known = True
+                    break
+                new_items.append(item)
+                yield item
+            if reached_known:
+                break
+
+        if reached_known:
+            for item in cached:
+                yield item
+        if generation != self._generation:
+            return
+        self._items = new_items + cached if reached_known else new_items
+        self._refreshed_at = time.monotonic()
+        if full:
+            self._full_refreshed_at = self._refreshed_at
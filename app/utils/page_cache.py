@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Iterable, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    body BLOB,
+    content TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_fetched_at ON pages (fetched_at);
+"""
+
+# Cada cuántas escrituras se borran las entradas que superan max_age
+_PURGE_EVERY = 100
+
+
+class PageCache:
+    """
+    Caché persistente de páginas por URL: cuerpo comprimido, cabeceras de
+    validación (ETag/Last-Modified) y el texto ya extraído. 'ttl' decide si
+    una entrada se sirve sin red o se revalida; las que llevan más de
+    'max_age' sin descargarse ni revalidarse se borran. Los métodos son
+    síncronos; desde asyncio se llaman con asyncio.to_thread.
+    """
+
+    def __init__(self, path: str, ttl: float, max_age: float):
+        self.path = path
+        self.ttl = ttl
+        self.max_age = max_age
+        self._writes = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def is_fresh(self, entry: dict) -> bool:
+        return time.time() - entry["fetched_at"] < self.ttl
+
+    def get_many(self, urls: Iterable[str]) -> dict[str, dict]:
+        """Devuelve las entradas guardadas (sin el cuerpo) de las URLs indicadas."""
+        urls = list(urls)
+        if not urls:
+            return {}
+        placeholders = ", ".join("?" for _ in urls)
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT url, etag, last_modified, content, fetched_at FROM pages WHERE url IN ({placeholders})",
+                urls,
+            ).fetchall()
+        return {row["url"]: dict(row) for row in rows}
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], body: bytes, content: str) -> None:
+        compressed = zlib.compress(body)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO pages (url, etag, last_modified, body, content, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, etag, last_modified, compressed, content, time.time()),
+                )
+            self._writes += 1
+            if self._writes % _PURGE_EVERY == 0:
+                self._purge(conn)
+
+    def touch(self, url: str) -> None:
+        """Marca la entrada como revalidada (respuesta 304)."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+    def purge(self) -> int:
+        """Borra las entradas que superan max_age; devuelve cuántas se han borrado."""
+        with self._lock:
+            return self._purge(self._connection())
+
+    def _purge(self, conn: sqlite3.Connection) -> int:
+        with conn:
+            return conn.execute("DELETE FROM pages WHERE fetched_at < ?", (time.time() - self.max_age,)).rowcount
+
+    def get_body(self, url: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._connection().execute("SELECT body FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None or row["body"] is None:
+            return None
+        return zlib.decompress(row["body"])
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,164 @@
+import asyncio
+import html
+import json
+import time
+from typing import Optional
+
+import aiosmtplib
+
+from app.api.freepik import generate_image
+from app.api.imgbb import upload_image
+from app.api.instagram import create_media_container, publish_media_container
+from app.core.config import CAMPAIGN_RATE_PER_MINUTE, CAMPAIGN_BATCH_SIZE, CAMPAIGN_IMAGE_EXPIRATION, CAMPAIGN_WORKERS
+from app.core.jobs import job_queue, JobContext
+from app.core.smtp import structured_email_smtp
+from app.utils.campaign_store import campaign_store
+from app.utils.email_template import CAMPAIGN_EMAIL_HTML, EMAIL_TEXT, PersonalizedMessageFactory
+from app.utils.email_utils import send_email
+from app.utils.image_handle import ImageHandle
+
+GENERATE_AND_POST = "generate_and_post"
+UPLOAD_AND_POST = "upload_and_post_image"
+EMAIL_CAMPAIGN = "email_campaign"
+
+# Segundos que la imagen permanece en Imgbb; debe cubrir los reintentos
+# hasta que Instagram descarga la imagen al crear el contenedor
+IMGBB_EXPIRATION = 3600
+
+async def generate_stage(ctx: JobContext) -> dict:
+    image = await generate_image(ctx.payload["prompt"])
+    await ctx.save_blob("image", image.data)
+    return {}
+
+async def upload_stage(ctx: JobContext) -> dict:
+    image = ImageHandle.from_bytes(await ctx.load_blob("image"))
+    imgbb_result = await upload_image(image, expiration=IMGBB_EXPIRATION)
+    return {"image_url": imgbb_result["url"], "delete_url": imgbb_result["delete_url"]}
+
+async def create_container_stage(ctx: JobContext) -> dict:
+    image_url = ctx.checkpoints["upload"]["image_url"]
+    container_id = await create_media_container(image_url, ctx.payload.get("caption", ""))
+    return {"container_id": container_id}
+
+async def publish_stage(ctx: JobContext) -> dict:
+    # Importación diferida: dedup carga PIL, innecesario hasta publicar la primera imagen
+    from app.utils.dedup import dedup_index
+
+    media_id = await publish_media_container(ctx.checkpoints["create_container"]["container_id"])
+    if "image_hash" in ctx.payload:
+        # Confirmamos la reserva hecha al encolar para detectar reenvíos de la misma imagen. Solo
+        # se guarda el media_id: la URL de Imgbb caduca (IMGBB_EXPIRATION) mucho antes que DEDUP_WINDOW
+        dedup_index.add(ctx.payload["image_hash"], {"media_id": media_id})
+    return {"media_id": media_id}
+
+async def release_image_hash(ctx: JobContext) -> None:
+    # Importación diferida: dedup carga PIL, innecesario hasta publicar la primera imagen
+    from app.utils.dedup import dedup_index
+
+    # La publicación falló: se libera la reserva para que la imagen se pueda volver a enviar
+    if "image_hash" in ctx.payload:
+        dedup_index.discard(ctx.payload["image_hash"])
+
+async def notify_generated(ctx: JobContext) -> None:
+    subject = "Imagen generada y publicada en Instagram"
+    body = f"Tu imagen generada con el prompt '{ctx.payload['prompt']}' ha sido publicada en Instagram con éxito."
+    await send_email(subject, body)
+
+async def notify_uploaded(ctx: JobContext) -> None:
+    subject = "Imagen subida y publicada en Instagram"
+    body = "Tu imagen ha sido subida y publicada en Instagram con éxito."
+    await send_email(subject, body)
+
+async def campaign_generate_stage(ctx: JobContext) -> dict:
+    # Importación diferida: el módulo de correo carga openai, innecesario hasta la primera campaña
+    from app.api.email import generate_email_content
+
+    # Se genera una sola vez por campaña, sea cual sea el número de destinatarios
+    return await generate_email_content(ctx.payload["topic"], image_expiration=CAMPAIGN_IMAGE_EXPIRATION)
+
+async def _deliver_campaign_batch(factory: PersonalizedMessageFactory, recipients: list[str]) -> list[Optional[Exception]]:
+    """Construye los mensajes del lote y los envía por el pool; devuelve el error de cada destinatario o None."""
+    errors: list[Optional[Exception]] = [None] * len(recipients)
+    indexes, messages = [], []
+    for index, recipient in enumerate(recipients):
+        try:
+            messages.append(([recipient], factory.build(recipient)))
+            indexes.append(index)
+        except Exception as e:
+            # Dirección que no se puede poner en la cabecera: fallo del destinatario
+            errors[index] = ValueError(f"Dirección no válida: {e}")
+    for index, error in zip(indexes, await structured_email_smtp.send_many(factory.sender, messages)):
+        errors[index] = error
+    return errors
+
+def _is_recipient_error(error: Exception) -> bool:
+    """Fallos propios del destinatario (dirección inválida o rechazada) frente a fallos del servidor."""
+    return isinstance(error, (ValueError, aiosmtplib.SMTPRecipientsRefused))
+
+async def campaign_deliver_stage(ctx: JobContext) -> dict:
+    if not await asyncio.to_thread(campaign_store.has_recipients, ctx.job_id):
+        recipients = json.loads(await ctx.load_blob("recipients"))
+        await asyncio.to_thread(campaign_store.add_recipients, ctx.job_id, recipients)
+
+    content = ctx.checkpoints["generate"]
+    subject = ctx.payload["subject"]
+    # Plantillas con todo fijado salvo el destinatario: cada mensaje es una sustitución
+    factory = PersonalizedMessageFactory(
+        structured_email_smtp.username,
+        subject,
+        EMAIL_TEXT.partial(structure=content["structure"], content=content["html_body"]),
+        CAMPAIGN_EMAIL_HTML.partial(subject=html.escape(subject), content=content["html_body"]),
+    )
+
+    # Un ritmo de 0 (o negativo) desactiva el límite
+    interval = 60 / CAMPAIGN_RATE_PER_MINUTE if CAMPAIGN_RATE_PER_MINUTE > 0 else 0.0
+    while True:
+        batch = await asyncio.to_thread(campaign_store.pending, ctx.job_id, CAMPAIGN_BATCH_SIZE)
+        if not batch:
+            break
+        started = time.monotonic()
+        errors = await _deliver_campaign_batch(factory, [email for _, email in batch])
+        if all(error is not None and not _is_recipient_error(error) for error in errors):
+            # El servidor no acepta nada: se deja el lote pendiente y la cola reintenta el trabajo
+            raise errors[0]
+        await asyncio.to_thread(
+            campaign_store.mark,
+            ctx.job_id,
+            [(position, None if error is None else str(error) or type(error).__name__)
+             for (position, _), error in zip(batch, errors)],
+        )
+        # Limitamos el ritmo de envío a CAMPAIGN_RATE_PER_MINUTE
+        await asyncio.sleep(max(0.0, len(batch) * interval - (time.monotonic() - started)))
+
+    return await asyncio.to_thread(campaign_store.progress, ctx.job_id)
+
+job_queue.register_pipeline(
+    GENERATE_AND_POST,
+    [
+        ("generate", generate_stage),
+        ("upload", upload_stage),
+        ("create_container", create_container_stage),
+        ("publish", publish_stage),
+    ],
+    on_success=notify_generated,
+)
+
+job_queue.register_pipeline(
+    UPLOAD_AND_POST,
+    [
+        ("upload", upload_stage),
+        ("create_container", create_container_stage),
+        ("publish", publish_stage),
+    ],
+    on_success=notify_uploaded,
+    on_failure=release_image_hash,
+)
+
+job_queue.register_pipeline(
+    EMAIL_CAMPAIGN,
+    [
+        ("generate", campaign_generate_stage),
+        ("deliver", campaign_deliver_stage),
+    ],
+    workers=CAMPAIGN_WORKERS,
+)
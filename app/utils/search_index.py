@@ -0,0 +1,105 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+# El rowid de pages_fts es el id de la página en 'pages': reindexar una URL
+# borra su fila FTS por rowid, sin recorrer la tabla de texto completo
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    content_hash TEXT NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+    content,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(text: str) -> Optional[str]:
+    """
+    Convierte el texto del usuario en una consulta FTS5 segura: cada palabra
+    entre comillas (sin operadores) y todas deben aparecer.
+    """
+    tokens = _TOKEN_PATTERN.findall(text)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"' for token in tokens)
+
+
+class SearchIndex:
+    """
+    Índice de texto completo (SQLite FTS5) del contenido scrapeado. Cada URL
+    se reindexa solo cuando cambia el hash de su contenido. Los métodos son
+    síncronos; desde asyncio se llaman con asyncio.to_thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def index(self, url: str, content: str) -> bool:
+        """Indexa la página si su contenido ha cambiado; devuelve True si se reindexó."""
+        content_hash = hashlib.sha1(content.encode("utf-8")).hexdigest()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT id, content_hash FROM pages WHERE url = ?", (url,)).fetchone()
+            if row is not None and row["content_hash"] == content_hash:
+                return False
+            with conn:
+                if row is None:
+                    page_id = conn.execute(
+                        "INSERT INTO pages (url, content_hash, indexed_at) VALUES (?, ?, ?)",
+                        (url, content_hash, time.time()),
+                    ).lastrowid
+                else:
+                    page_id = row["id"]
+                    conn.execute(
+                        "UPDATE pages SET content_hash = ?, indexed_at = ? WHERE id = ?",
+                        (content_hash, time.time(), page_id),
+                    )
+                    conn.execute("DELETE FROM pages_fts WHERE rowid = ?", (page_id,))
+                conn.execute("INSERT INTO pages_fts (rowid, content) VALUES (?, ?)", (page_id, content))
+        return True
+
+    def search(self, text: str, limit: int = 10) -> list[dict]:
+        """Devuelve las páginas más relevantes (BM25) con un fragmento resaltado."""
+        query = build_match_query(text)
+        if query is None:
+            return []
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT pages.url, snippet(pages_fts, 0, '<b>', '</b>', '…', 16) AS snippet, "
+                "bm25(pages_fts) AS score "
+                "FROM pages_fts JOIN pages ON pages.id = pages_fts.rowid "
+                "WHERE pages_fts MATCH ? ORDER BY score LIMIT ?",
+                (query, limit),
+            ).fetchall()
+        # bm25 devuelve valores negativos: cuanto menor, más relevante
+        return [{"url": row["url"], "snippet": row["snippet"], "score": -row["score"]} for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
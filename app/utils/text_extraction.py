@@ -0,0 +1,77 @@
+from typing import Optional, Union
+from urllib.parse import urldefrag, urljoin
+
+import lxml.html
+from lxml.etree import ParserError
+
+# Subárboles cuyo texto no es visible
+SKIP_TAGS = frozenset({"script", "style", "noscript"})
+
+# Caracteres que se tratan como separadores (símbolos, viñetas y algunos emoji
+# habituales en las páginas que scrapeamos); se sustituyen por un espacio
+_SEPARATORS = (
+    "\\|*_()#%,;-"
+    "\u2014\u00d7\u2013\u00a9\u2582\u2022\u00ae\u00b7\u2715\ufe0f"
+    "\U0001f553\U0001f3cd\U0001f573"
+)
+NORMALIZATION_TABLE = str.maketrans({char: " " for char in _SEPARATORS})
+
+
+def normalize_text(text: str) -> str:
+    """Sustituye los separadores por espacios y colapsa los espacios en blanco."""
+    return " ".join(text.translate(NORMALIZATION_TABLE).split())
+
+
+def parse_document(html: Union[bytes, str], encoding: Optional[str] = None):
+    """Construye el árbol de lxml; devuelve None si el documento está vacío o no es HTML."""
+    parser = lxml.html.HTMLParser(encoding=encoding)
+    try:
+        return lxml.html.document_fromstring(html, parser=parser)
+    except (ParserError, ValueError):
+        return None
+
+
+def extract_text_from_tree(root) -> str:
+    """
+    Extrae el texto visible del <body> con un único recorrido del árbol,
+    saltando los subárboles de script, style y noscript (y los comentarios),
+    y lo normaliza en un solo paso sobre el texto unido.
+    """
+    body = root.find("body")
+    if body is None:
+        body = root
+
+    parts = []
+    # Pila de (nodo, es_tail): el tail de un hijo se emite tras su subárbol
+    stack = [(body, False)]
+    while stack:
+        node, is_tail = stack.pop()
+        if is_tail:
+            if node.tail:
+                parts.append(node.tail)
+            continue
+        # Los comentarios e instrucciones de procesado no tienen tag de tipo str
+        if not isinstance(node.tag, str) or node.tag in SKIP_TAGS:
+            continue
+        if node.text:
+            parts.append(node.text)
+        for child in reversed(node):
+            stack.append((child, True))
+            stack.append((child, False))
+
+    return normalize_text(" ".join(parts))
+
+
+def extract_links(root, base_url: str) -> list[str]:
+    """Devuelve los enlaces http(s) de la página como URLs absolutas y sin fragmento."""
+    links = []
+    for href in root.xpath("//a/@href"):
+        url, _ = urldefrag(urljoin(base_url, href.strip()))
+        if url.startswith(("http://", "https://")):
+            links.append(url)
+    return links
+
+
+def extract_text(html: Union[bytes, str], encoding: Optional[str] = None) -> str:
+    root = parse_document(html, encoding)
+    return extract_text_from_tree(root) if root is not None else ""
@@ -0,0 +1,105 @@
+"""
+Coste de autenticación por petición: verify_token anterior (lee el secreto
+de os.environ y verifica el HMAC en cada llamada) frente a la actual
+(secreto cargado una vez y caché de verificaciones por hash del token).
+
+Mide la dependencia aislada y una petición completa a una ruta protegida
+mínima a través de TestClient.
+
+    python benchmarks/bench_auth.py [--calls 20000] [--requests 2000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("GOOGLE_CLIENT_ID", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+
+import jwt
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+
+from app import dependencies
+from app.dependencies import security, verify_token
+
+
+# Implementación anterior, copiada tal cual de app/dependencies.py
+def legacy_verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    token = credentials.credentials
+    SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "your-secret-key")
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        return payload  # Puedes devolver el payload o información del usuario
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=403, detail="Token inválido")
+
+
+def per_call_us(fn, credentials, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn(credentials)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def per_request_us(client: TestClient, path: str, headers: dict, requests: int) -> float:
+    for _ in range(50):
+        client.get(path, headers=headers)
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get(path, headers=headers)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=20000, help="Llamadas directas a la dependencia")
+    parser.add_argument("--requests", type=int, default=2000, help="Peticiones HTTP por ruta")
+    args = parser.parse_args()
+
+    token = jwt.encode({"sub": "bench", "exp": int(time.time()) + 3600}, os.environ["JWT_SECRET_KEY"], algorithm="HS256")
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    legacy = per_call_us(legacy_verify_token, credentials, args.calls)
+    cached = per_call_us(verify_token, credentials, args.calls)
+
+    def uncached(creds):
+        dependencies._verified_tokens.clear()
+        return verify_token(creds)
+
+    miss = per_call_us(uncached, credentials, args.calls)
+    print("Dependencia aislada (µs por llamada)")
+    print(f"  anterior:             {legacy:8.2f}")
+    print(f"  actual, acierto:      {cached:8.2f}  ({legacy / cached:.1f}x)")
+    print(f"  actual, fallo:        {miss:8.2f}")
+
+    app = FastAPI()
+
+    @app.get("/none")
+    def no_auth():
+        return {}
+
+    @app.get("/legacy")
+    def legacy_route(user=Depends(legacy_verify_token)):
+        return {}
+
+    @app.get("/current")
+    def current_route(user=Depends(verify_token)):
+        return {}
+
+    headers = {"Authorization": f"Bearer {token}"}
+    with TestClient(app) as client:
+        base = per_request_us(client, "/none", headers, args.requests)
+        legacy_request = per_request_us(client, "/legacy", headers, args.requests)
+        current_request = per_request_us(client, "/current", headers, args.requests)
+    print("Petición completa (µs por petición; sobrecoste de auth frente a una ruta sin auth)")
+    print(f"  sin auth:             {base:8.1f}")
+    print(f"  anterior:             {legacy_request:8.1f}  (+{legacy_request - base:.1f})")
+    print(f"  actual:               {current_request:8.1f}  (+{current_request - base:.1f})")
+
+
+if __name__ == "__main__":
+    main()
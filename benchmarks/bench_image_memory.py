@@ -0,0 +1,152 @@
+"""
+Memoria pico por petición del recorrido de una imagen hasta el cuerpo que se
+envía a Imgbb: el flujo anterior (base64 en un campo de formulario,
+recodificación con PIL y copias con buffer.read()) frente a ImageHandle
+(base64 decodificado una vez, fast path de JPEG y multipart por bloques).
+
+Cada escenario se ejecuta en un proceso nuevo y se mide el crecimiento del
+RSS máximo (incluye los buffers de Pillow, que tracemalloc no ve) y el pico
+de memoria Python según tracemalloc.
+
+    python benchmarks/bench_image_memory.py [--size 2048]
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("GOOGLE_CLIENT_ID", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench")
+
+
+def make_jpeg(size: int) -> bytes:
+    import numpy as np
+    from PIL import Image
+
+    pixels = np.random.default_rng(0).integers(0, 256, (size, size, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def drain(stream) -> int:
+    return sum(len(chunk) for chunk in stream)
+
+
+# --- Flujo anterior ---
+
+def legacy_freepik(payload: str) -> int:
+    # La respuesta de Freepik (base64) se enviaba tal cual como campo de formulario
+    import requests
+
+    request = requests.Request("POST", "https://api.imgbb.com/1/upload", data={"key": "k", "image": payload})
+    return len(request.prepare().body)
+
+
+def legacy_upload(data: bytes) -> int:
+    import requests
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG")
+    buffer.seek(0)
+    image_bytes = buffer.read()
+    encoded = base64.b64encode(image_bytes).decode("ascii")
+    request = requests.Request("POST", "https://api.imgbb.com/1/upload", data={"key": "k", "image": encoded})
+    return len(request.prepare().body)
+
+
+# --- ImageHandle ---
+
+def _multipart(image) -> int:
+    import httpx
+
+    request = httpx.Request(
+        "POST",
+        "https://api.imgbb.com/1/upload",
+        data={"key": "k"},
+        files={"image": (image.filename, image.as_file(), image.content_type)},
+    )
+    return drain(request.stream)
+
+
+def handle_freepik(payload: str) -> int:
+    from app.utils.image_handle import ImageHandle
+
+    return _multipart(ImageHandle.from_base64(payload))
+
+
+def handle_upload(data: bytes) -> int:
+    from app.utils.image_prep import prepare_image
+
+    return _multipart(prepare_image(data))
+
+
+SCENARIOS = {
+    "freepik/legacy": (legacy_freepik, "base64"),
+    "freepik/handle": (handle_freepik, "base64"),
+    "upload/legacy": (legacy_upload, "bytes"),
+    "upload/handle": (handle_upload, "bytes"),
+}
+
+
+def run_scenario(name: str, path: str) -> dict:
+    fn, kind = SCENARIOS[name]
+    # Las importaciones se hacen antes de medir para que no cuenten
+    import httpx, requests  # noqa: F401
+    from PIL import Image  # noqa: F401
+    import app.utils.image_prep  # noqa: F401
+
+    with open(path, "rb") as f:
+        data = f.read()
+    payload = base64.b64encode(data).decode("ascii") if kind == "base64" else data
+
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    body_size = fn(payload)
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_rss
+    return {"body": body_size, "python_peak_kb": python_peak // 1024, "rss_growth_kb": rss_growth}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=2048, help="Lado de la imagen de prueba en píxeles")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        print(json.dumps(run_scenario(args.scenario, args.input)))
+        return
+
+    import tempfile
+
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+        f.write(make_jpeg(args.size))
+        path = f.name
+    try:
+        print(f"Imagen JPEG {args.size}x{args.size}: {os.path.getsize(path) / 1024:.0f} KiB")
+        print(f"{'escenario':<16} {'cuerpo (KiB)':>13} {'pico Python (KiB)':>18} {'RSS (KiB)':>10}")
+        for name in SCENARIOS:
+            output = subprocess.run(
+                [sys.executable, __file__, "--scenario", name, "--input", path],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output)
+            print(f"{name:<16} {result['body'] / 1024:>13.0f} {result['python_peak_kb']:>18} {result['rss_growth_kb']:>10}")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
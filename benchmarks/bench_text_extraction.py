@@ -0,0 +1,74 @@
+"""
+Extracción de texto sobre un corpus de páginas HTML guardadas
+(benchmarks/corpus): la implementación anterior de MySpider.parse (selector
+CSS 'body *:not(style):not(script)::text' y clean_text por nodo) frente a
+app.utils.text_extraction (un solo recorrido de lxml y normalización con
+tabla compilada).
+
+    python benchmarks/bench_text_extraction.py [--repeat 5]
+"""
+
+import argparse
+import glob
+import gzip
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scrapy.http import HtmlResponse
+
+from app.utils.text_extraction import extract_text
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+# Implementación anterior, copiada tal cual de app/api/scraper.py
+def clean_text(text):
+    return re.sub(r'[\\|\\n\\*\\t\\s_(\\u2014\\u00d7#%\\u2013\\u00a9\\ud83d\\udd53\\u2582\\ud83c\\udfcd\\ufe0f\\ud83d\\udd73\\u2022\\u00ae\\xb7\\u2715),;-]+', ' ', text)
+
+
+def legacy_extract(url: str, body: bytes) -> str:
+    response = HtmlResponse(url, body=body, encoding="utf-8")
+    visible_content = response.css('body *:not(style):not(script)::text').getall()
+    cleaned_content = [clean_text(content.strip()) for content in visible_content if content.strip()]
+    return " ".join(cleaned_content)
+
+
+def current_extract(url: str, body: bytes) -> str:
+    return extract_text(body, "utf-8")
+
+
+def best_time(fn, url: str, body: bytes, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(url, body)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por página (se toma la mejor)")
+    args = parser.parse_args()
+
+    print(f"{'página':<24} {'KiB':>6} {'anterior (ms)':>14} {'actual (ms)':>12} {'mejora':>7}")
+    totals = [0.0, 0.0]
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, "*.html.gz"))):
+        name = os.path.basename(path)[:-len(".html.gz")]
+        with gzip.open(path, "rb") as f:
+            body = f.read()
+        url = f"https://example.org/{name}.html"
+        legacy = best_time(legacy_extract, url, body, args.repeat)
+        current = best_time(current_extract, url, body, args.repeat)
+        totals[0] += legacy
+        totals[1] += current
+        print(f"{name:<24} {len(body) / 1024:>6.0f} {legacy * 1000:>14.2f} {current * 1000:>12.2f} {legacy / current:>6.1f}x")
+    print(f"{'total':<24} {'':>6} {totals[0] * 1000:>14.2f} {totals[1] * 1000:>12.2f} {totals[0] / totals[1]:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
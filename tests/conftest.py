@@ -0,0 +1,109 @@
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# La configuración se lee al importar app.core.config: el entorno de pruebas
+# tiene que estar listo antes de importar cualquier módulo de la aplicación
+_data_dir = tempfile.mkdtemp(prefix="autoposter-tests-")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "test-client-id")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("LAZY_ROUTERS", "true")
+for name, filename in (
+    ("JOBS_DB_PATH", "jobs.sqlite3"),
+    ("CAMPAIGNS_DB_PATH", "campaigns.sqlite3"),
+    ("IMGBB_CLEANUP_DB_PATH", "imgbb_cleanup.sqlite3"),
+    ("SCRAPER_CACHE_PATH", "page_cache.sqlite3"),
+    ("SCRAPER_INDEX_PATH", "search_index.sqlite3"),
+    ("FREEPIK_CACHE_DIR", "freepik"),
+):
+    os.environ.setdefault(name, os.path.join(_data_dir, filename))
+
+import pytest
+
+SITE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "site")
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Cliente de la aplicación con el lifespan arrancado una sola vez por sesión."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth_headers():
+    """Cabecera Authorization con un JWT válido firmado con JWT_SECRET_KEY."""
+    import jwt
+
+    token = jwt.encode({"sub": "tests", "exp": int(time.time()) + 600}, os.environ["JWT_SECRET_KEY"], algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class _SiteHandler(BaseHTTPRequestHandler):
+    # Rutas: /slow?seconds=N responde tras N segundos; /etag.html responde con ETag
+    # y 304 a las peticiones condicionales; el resto sirve tests/fixtures/site
+    ETAG = '"v1"'
+    requests: list[tuple[str, int]] = []
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        if path == "/etag.html":
+            if self.headers.get("If-None-Match") == self.ETAG:
+                self.requests.append((path, 304))
+                self.send_response(304)
+                self.send_header("ETag", self.ETAG)
+                self.end_headers()
+                return
+            self.requests.append((path, 200))
+            body = b"<html><body><p>Contenido con etiqueta</p></body></html>"
+        elif path == "/slow":
+            time.sleep(float(query.partition("=")[2] or 5))
+            body = b"<html><body><p>lenta</p></body></html>"
+        else:
+            file_path = os.path.join(SITE_DIR, path.lstrip("/") or "index.html")
+            if not os.path.isfile(file_path):
+                self.send_error(404)
+                return
+            with open(file_path, "rb") as f:
+                body = f.read()
+        try:
+            self.send_response(200)
+            if path == "/etag.html":
+                self.send_header("ETag", self.ETAG)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # El cliente abandonó la petición por timeout
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="session")
+def site():
+    """URL base de un servidor HTTP local con páginas de prueba."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SiteHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def site_requests(site):
+    """Peticiones a /etag.html atendidas por el servidor local: (ruta, estado)."""
+    _SiteHandler.requests.clear()
+    return _SiteHandler.requests
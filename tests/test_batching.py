@@ -0,0 +1,116 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.batching import MicroBatcher
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        yield executor
+
+
+def _batcher(process, max_batch_size=4, max_delay=0.05, max_pending=16):
+    return MicroBatcher("prueba", process, max_batch_size, max_delay, max_pending)
+
+
+async def test_full_batch_runs_without_waiting_for_the_delay(executor):
+    batches = []
+
+    def process(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = _batcher(process, max_batch_size=3, max_delay=60)
+    batcher.start(executor)
+    try:
+        results = await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(3))), 5)
+    finally:
+        await batcher.stop()
+    assert results == [0, 2, 4]
+    assert batches == [[0, 1, 2]]
+
+
+async def test_partial_batch_is_flushed_after_the_delay(executor):
+    batches = []
+
+    def process(items):
+        batches.append(list(items))
+        return items
+
+    batcher = _batcher(process, max_batch_size=10, max_delay=0.05)
+    batcher.start(executor)
+    try:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        assert await asyncio.gather(batcher.submit("a"), batcher.submit("b")) == ["a", "b"]
+        assert loop.time() - started >= 0.04
+        # Lo que llega después va en otro lote
+        assert await batcher.submit("c") == "c"
+    finally:
+        await batcher.stop()
+    assert batches == [["a", "b"], ["c"]]
+
+
+async def test_batch_failure_reaches_every_waiter(executor):
+    def process(items):
+        raise RuntimeError("fallo del modelo")
+
+    batcher = _batcher(process)
+    batcher.start(executor)
+    try:
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+    finally:
+        await batcher.stop()
+    assert [str(result) for result in results] == ["fallo del modelo"] * 3
+
+
+async def test_item_errors_only_fail_their_own_request(executor):
+    def process(items):
+        return [ValueError(f"mal {item}") if item == 1 else item for item in items]
+
+    batcher = _batcher(process)
+    batcher.start(executor)
+    try:
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+    finally:
+        await batcher.stop()
+    assert results[0] == 0 and results[2] == 2
+    assert isinstance(results[1], ValueError)
+
+
+async def test_full_queue_answers_503_and_stop_fails_pending(executor):
+    release = threading.Event()
+
+    def process(items):
+        release.wait(5)
+        return items
+
+    batcher = _batcher(process, max_batch_size=1, max_delay=0, max_pending=1)
+    batcher.start(executor)
+    running = asyncio.ensure_future(batcher.submit("en curso"))
+    await asyncio.sleep(0.05)
+    queued = asyncio.ensure_future(batcher.submit("en cola"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as error:
+        await batcher.submit("sobra")
+    assert error.value.status_code == 503
+
+    # Al detenerse, las peticiones que seguían en cola fallan en lugar de quedarse esperando
+    await batcher.stop()
+    with pytest.raises(RuntimeError):
+        await queued
+    running.cancel()
+    release.set()
+
+
+async def test_submit_requires_start():
+    with pytest.raises(RuntimeError):
+        await _batcher(lambda items: items).submit(1)
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app.api.calculator import (
+    STATUS_DETAILS,
+    STATUS_OK,
+    evaluate_batch,
+    perform_calculation,
+)
+
+OPERATIONS = ["add", "subtract", "multiply", "divide", "power", "square_root", "modulo"]
+
+
+def _scalar(operation, a, b):
+    try:
+        return perform_calculation(operation, a, b), None
+    except HTTPException as e:
+        return None, e.detail
+    except (ZeroDivisionError, OverflowError):
+        # /calculate responde 500; el lote lo marca como resultado no finito
+        return float("inf"), None
+
+
+def test_batch_matches_scalar_endpoint():
+    rng = np.random.default_rng(7)
+    size = 2000
+    operations = rng.choice(OPERATIONS, size)
+    num1 = rng.integers(-5, 6, size).astype(np.float64)
+    num2 = rng.integers(-3, 4, size).astype(np.float64)
+
+    results, status = evaluate_batch(operations, num1, num2)
+
+    for index in range(size):
+        expected, error = _scalar(str(operations[index]), float(num1[index]), float(num2[index]))
+        if error is not None:
+            assert STATUS_DETAILS[int(status[index])] == error
+        elif isinstance(expected, complex) or not np.isfinite(expected):
+            assert status[index] != STATUS_OK  # p. ej. (-2) ** 0.5 o 0 ** -1
+        else:
+            assert status[index] == STATUS_OK
+            assert results[index] == pytest.approx(expected)
+
+
+def test_batch_endpoint_json_and_binary(client, auth_headers):
+    body = {"operations": ["add", "divide", "square_root"], "num1": [1, 2, -4], "num2": [2, 0, None]}
+    response = client.post("/calculator/batch", json=body, headers=auth_headers)
+    assert response.json() == {
+        "results": [3.0, None, None],
+        "errors": [
+            {"index": 1, "detail": "Cannot divide by zero"},
+            {"index": 2, "detail": "Cannot calculate square root of negative number"},
+        ],
+    }
+
+    response = client.post("/calculator/batch", json={**body, "format": "binary"}, headers=auth_headers)
+    assert response.headers["x-batch-length"] == "3"
+    assert response.headers["x-error-count"] == "2"
+    results = np.frombuffer(response.content[:24], dtype="<f8")
+    status = np.frombuffer(response.content[24:], dtype=np.uint8)
+    assert results[0] == 3.0 and np.isnan(results[1:]).all()
+    assert status.tolist() == [0, 2, 3]
+
+
+def test_batch_rejects_mismatched_columns(client, auth_headers):
+    response = client.post(
+        "/calculator/batch", json={"operations": ["add"], "num1": [1, 2], "num2": [1]}, headers=auth_headers
+    )
+    assert response.status_code == 400
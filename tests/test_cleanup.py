@@ -0,0 +1,65 @@
+import time
+
+import httpx
+import pytest
+
+from app.core import cleanup
+from app.core.cleanup import ImgbbCleanupQueue
+from app.core.config import EMAIL_IMAGE_EXPIRATION, IMGBB_CLEANUP_GRACE
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def queue(tmp_path, monkeypatch):
+    deleted = []
+
+    async def fake_get(url, **kwargs):
+        deleted.append(url)
+        return httpx.Response(200)
+
+    monkeypatch.setattr(cleanup.http_client, "get", fake_get)
+    queue = ImgbbCleanupQueue(str(tmp_path / "cleanup.sqlite3"), IMGBB_CLEANUP_GRACE, 30, 20, 5, 3, 60)
+    # Sin el planificador: los borrados se ejecutan a mano con run_once
+    queue._open()
+    queue.deleted = deleted
+    yield queue
+    await queue.stop()
+
+
+async def test_emailed_images_stay_available_during_the_grace_period(queue, monkeypatch):
+    # El respaldo de Imgbb tiene que durar más que el periodo de gracia o nunca se borraría nada
+    assert IMGBB_CLEANUP_GRACE < EMAIL_IMAGE_EXPIRATION
+
+    now = time.time()
+    upload = {"delete_url": "https://ibb.co/a/delete", "expires_at": now + EMAIL_IMAGE_EXPIRATION}
+    assert await queue.enqueue([upload]) == 1
+
+    assert await queue.run_once() == 0
+    assert queue.deleted == []
+
+    monkeypatch.setattr(cleanup.time, "time", lambda: now + IMGBB_CLEANUP_GRACE + 1)
+    assert await queue.run_once() == 1
+    assert queue.deleted == ["https://ibb.co/a/delete"]
+
+
+async def test_uploads_expiring_before_the_grace_period_are_not_enqueued(queue):
+    upload = {"delete_url": "https://ibb.co/b/delete", "expires_at": time.time() + 60}
+    assert await queue.enqueue([upload]) == 0
+
+
+async def test_failed_delete_of_a_vanished_entry_is_skipped(queue, monkeypatch):
+    async def failing_get(url, **kwargs):
+        if url.endswith("/gone/delete"):
+            # La fila desaparece mientras el borrado está en curso
+            with queue._lock, queue._conn:
+                queue._conn.execute("DELETE FROM imgbb_cleanup WHERE delete_url = ?", (url,))
+        return httpx.Response(500)
+
+    monkeypatch.setattr(cleanup.http_client, "get", failing_get)
+    uploads = [{"delete_url": "https://ibb.co/gone/delete"}, {"delete_url": "https://ibb.co/kept/delete"}]
+    assert await queue.enqueue(uploads, grace=0) == 2
+
+    assert await queue.run_once() == 0
+    rows = queue._conn.execute("SELECT delete_url, attempts FROM imgbb_cleanup").fetchall()
+    assert [(row["delete_url"], row["attempts"]) for row in rows] == [("https://ibb.co/kept/delete", 1)]
@@ -0,0 +1,73 @@
+import io
+import random
+
+from PIL import Image
+
+from app.utils.dedup import DedupIndex, dhash
+
+
+def _png(color, size=(64, 64)) -> bytes:
+    image = Image.new("RGB", size, color)
+    # Un degradado para que el hash no sea trivial
+    for x in range(size[0]):
+        image.putpixel((x, x % size[1]), (x * 4 % 256, 0, 0))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_near_duplicates_share_a_reference():
+    index = DedupIndex(window=60, max_distance=5, max_entries=10)
+    original = _png((10, 200, 10))
+    resized = Image.open(io.BytesIO(original)).resize((48, 48))
+    buffer = io.BytesIO()
+    resized.save(buffer, format="JPEG", quality=90)
+
+    index.add(dhash(original), {"media_id": "42"})
+    assert index.find(dhash(buffer.getvalue())) == {"media_id": "42"}
+
+
+def test_entries_expire_with_the_window(monkeypatch):
+    index = DedupIndex(window=60, max_distance=0, max_entries=10)
+    value = dhash(_png((0, 0, 255)))
+    monkeypatch.setattr("app.utils.dedup.time.time", lambda: 1000.0)
+    index.add(value, {"media_id": "1"})
+    monkeypatch.setattr("app.utils.dedup.time.time", lambda: 1061.0)
+    assert index.find(value) is None
+    assert len(index) == 0
+
+
+def test_vectorised_search_matches_bit_by_bit_distances():
+    rng = random.Random(7)
+    index = DedupIndex(window=60, max_distance=6, max_entries=1000)
+    stored = [rng.getrandbits(64) for _ in range(500)]
+    for position, value in enumerate(stored):
+        index.add(value, {"media_id": str(position)})
+
+    for _ in range(50):
+        query = rng.choice(stored) ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64))
+        distances = [bin(value ^ query).count("1") for value in stored]
+        best = min(range(len(stored)), key=distances.__getitem__)
+        expected = {"media_id": str(best)} if distances[best] <= 6 else None
+        assert index.find(query) == expected
+
+
+def test_reservation_catches_a_concurrent_duplicate():
+    index = DedupIndex(window=60, max_distance=0, max_entries=10)
+    value = dhash(_png((200, 0, 0)))
+    assert index.reserve(value, {"pending": True}) is None
+    # Una copia que llega antes de que termine la primera publicación ya es un duplicado
+    assert index.reserve(value, {"pending": True}) == {"pending": True}
+
+    index.add(value, {"media_id": "7"})
+    assert index.find(value) == {"media_id": "7"}
+    assert len(index) == 1
+
+
+def test_discard_releases_a_failed_reservation():
+    index = DedupIndex(window=60, max_distance=0, max_entries=10)
+    value = dhash(_png((0, 200, 0)))
+    index.reserve(value, {"pending": True})
+    index.discard(value)
+    assert index.find(value) is None
+    assert index.reserve(value, {"pending": True}) is None
@@ -0,0 +1,85 @@
+import hashlib
+import sys
+import threading
+import time
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app import dependencies
+from app.dependencies import verify_token
+
+
+def _credentials(claims=None, key="test-secret", headers=None):
+    token = jwt.encode({"sub": "u", **(claims or {})}, key, algorithm="HS256", headers=headers)
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    dependencies._verified_tokens.clear()
+    yield
+    dependencies._verified_tokens.clear()
+
+
+def test_cache_entries_expire_with_the_token():
+    exp = int(time.time()) + 60
+    verify_token(_credentials({"exp": exp}))
+    token_hash = next(iter(dependencies._verified_tokens))
+    assert dependencies._cache_get(token_hash, exp - 1)["exp"] == exp
+    assert dependencies._cache_get(token_hash, exp) is None
+    assert token_hash not in dependencies._verified_tokens
+
+
+def test_invalid_tokens_are_rejected_and_not_cached():
+    with pytest.raises(HTTPException) as excinfo:
+        verify_token(_credentials(key="other-secret"))
+    assert excinfo.value.status_code == 403
+    assert len(dependencies._verified_tokens) == 0
+
+
+def test_cache_is_bounded_by_lru_size(monkeypatch):
+    monkeypatch.setattr(dependencies, "JWT_CACHE_SIZE", 3)
+    for index in range(5):
+        verify_token(_credentials({"n": index}))
+    assert len(dependencies._verified_tokens) == 3
+
+
+def test_kid_selects_the_rotation_key(monkeypatch):
+    monkeypatch.setattr(dependencies, "JWT_SECRET_KEYS", {"2024": "rotated"})
+    assert verify_token(_credentials(key="rotated", headers={"kid": "2024"}))["sub"] == "u"
+    with pytest.raises(HTTPException):
+        verify_token(_credentials(key="rotated", headers={"kid": "unknown"}))
+
+
+def test_concurrent_eviction_does_not_fail(monkeypatch):
+    # Muchos hilos insertando, expirando y desalojando las mismas entradas a la vez
+    monkeypatch.setattr(dependencies, "JWT_CACHE_SIZE", 4)
+    tokens = [_credentials({"n": index, "exp": int(time.time()) + 3600}) for index in range(2)]
+    hashes = [hashlib.sha256(token.credentials.encode("utf-8")).hexdigest() for token in tokens]
+    errors = []
+
+    def worker(offset):
+        try:
+            for step in range(2000):
+                index = (offset + step) % len(tokens)
+                verify_token(tokens[index])
+                # Consulta "después de exp": fuerza el borrado de la entrada desde varios hilos
+                dependencies._cache_get(hashes[(index + 1) % len(tokens)], float("inf"))
+        except Exception as e:
+            errors.append(e)
+
+    # Cambios de hilo muy frecuentes para que las carreras se produzcan de verdad
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
@@ -0,0 +1,165 @@
+import asyncio
+import random
+import re
+from types import SimpleNamespace
+
+import aiosmtplib
+import pytest
+from fastapi import HTTPException
+
+from app.api import email
+from app.api.email import IMAGE_PLACEHOLDER, ImageSectionParser, split_image_sections
+
+# Piezas con las que se construyen documentos, incluidos encabezados mal cerrados o anidados
+_PIECES = (
+    "<h2>", "</h2>", "<h3>", "</h3>", "<H2>", "</H3>", "<p>", "</p>",
+    "Título", "texto de la sección", " ", "\n", IMAGE_PLACEHOLDER,
+)
+
+
+def _random_document(rng: random.Random) -> str:
+    return "".join(rng.choice(_PIECES) for _ in range(rng.randint(0, 40)))
+
+
+def _feed_in_chunks(html: str, rng: random.Random) -> tuple[list[str], list[str]]:
+    parser = ImageSectionParser("tema")
+    sections, position = [], 0
+    while position < len(html):
+        size = rng.randint(1, 12)
+        sections += parser.feed(html[position:position + size])
+        position += size
+    return parser.finish(), sections
+
+
+def test_sections_follow_previous_heading():
+    html = (
+        f"<p>intro</p>{IMAGE_PLACEHOLDER}<h2>Uno</h2><p>a</p>{IMAGE_PLACEHOLDER}"
+        f"<h3>Dos</h3><p>b</p>{IMAGE_PLACEHOLDER}"
+    )
+    segments, sections = split_image_sections(html, "tema")
+    assert sections == ["intro", "Unoa", "Dosb"]
+    assert len(segments) == 4
+
+
+def test_section_without_text_uses_topic():
+    assert split_image_sections(IMAGE_PLACEHOLDER, "tema")[1] == ["tema"]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_chunked_feed_matches_whole_document(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        html = _random_document(rng)
+        assert _feed_in_chunks(html, rng) == split_image_sections(html, "tema"), html
+
+
+class _FakeSMTP:
+    username = "sender@example.com"
+    configured = True
+
+    def __init__(self, error=None):
+        self.error = error
+
+    async def send(self, message):
+        if self.error is not None:
+            raise self.error
+
+
+@pytest.fixture
+def enqueued(monkeypatch):
+    calls = []
+    uploads = [{"delete_url": "https://ibb.co/x/delete", "expires_at": None}]
+
+    async def fake_content(topic, image_expiration=None):
+        return {"structure": "s", "html_body": "<p>hola</p>", "uploads": uploads}
+
+    async def fake_enqueue(items, grace=None):
+        calls.append((items, grace))
+        return len(items)
+
+    monkeypatch.setattr(email, "generate_email_content", fake_content)
+    monkeypatch.setattr(email.imgbb_cleanup, "enqueue", fake_enqueue)
+    return calls
+
+
+async def _send():
+    return await email.send_structured_email(["a@example.com"], "Asunto", "tema")
+
+
+@pytest.mark.anyio
+async def test_images_are_cleaned_up_after_the_grace_period_when_sent(monkeypatch, enqueued):
+    monkeypatch.setattr(email, "structured_email_smtp", _FakeSMTP())
+    assert await _send() == {"detail": "Correo enviado"}
+    assert [grace for _, grace in enqueued] == [None]
+
+
+@pytest.mark.anyio
+async def test_images_are_cleaned_up_immediately_when_sending_fails(monkeypatch, enqueued):
+    monkeypatch.setattr(email, "structured_email_smtp", _FakeSMTP(aiosmtplib.SMTPException("caído")))
+    with pytest.raises(HTTPException):
+        await _send()
+    assert [(items[0]["delete_url"], grace) for items, grace in enqueued] == [("https://ibb.co/x/delete", 0)]
+
+
+@pytest.fixture
+def image_stubs(monkeypatch):
+    """Freepik e Imgbb simulados: las secciones más tempranas tardan más en generarse."""
+    stats = {"active": 0, "peak": 0}
+
+    async def fake_generate(prompt):
+        stats["active"] += 1
+        stats["peak"] = max(stats["peak"], stats["active"])
+        index = int(prompt.split("sección ")[1].split("'")[0])
+        await asyncio.sleep(0.01 * (5 - index))
+        stats["active"] -= 1
+        return index
+
+    async def fake_upload(image, expiration=None):
+        return {"url": f"https://i.ibb.co/{image}.jpg", "delete_url": f"https://ibb.co/{image}/delete", "expires_at": None}
+
+    monkeypatch.setattr(email, "generate_image", fake_generate)
+    monkeypatch.setattr(email, "upload_image", fake_upload)
+    return stats
+
+
+@pytest.mark.anyio
+async def test_section_images_respect_the_concurrency_limit(image_stubs):
+    semaphore = asyncio.Semaphore(2)
+    results = await asyncio.gather(
+        *(email.generate_section_image(f"sección {i}", "tema", semaphore) for i in range(5))
+    )
+    assert image_stubs["peak"] == 2
+    assert [upload["delete_url"] for _, upload in results] == [f"https://ibb.co/{i}/delete" for i in range(5)]
+
+
+class _Stream:
+    def __init__(self, text: str, size: int = 7):
+        self._chunks = [text[i:i + size] for i in range(0, len(text), size)]
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for chunk in self._chunks:
+            yield {"choices": [{"delta": {"content": chunk}}]}
+
+
+@pytest.mark.anyio
+async def test_generated_images_keep_section_order(monkeypatch, image_stubs):
+    body = "".join(f"<h2>Parte</h2><p>sección {i}</p>{IMAGE_PLACEHOLDER}" for i in range(5))
+
+    async def fake_create(**kwargs):
+        if kwargs.get("stream"):
+            return _Stream(body)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="[Parte]"))])
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(email, "IMAGE_GENERATION_CONCURRENCY", 3)
+    monkeypatch.setattr(email.openai.ChatCompletion, "acreate", fake_create)
+
+    content = await email.generate_email_content("tema")
+    # Las imágenes terminan en orden inverso, pero cada una va tras su sección
+    sources = re.findall(r'src="https://i\.ibb\.co/(\d)\.jpg"', content["html_body"])
+    assert sources == ["0", "1", "2", "3", "4"]
+    assert [upload["delete_url"] for upload in content["uploads"]] == [f"https://ibb.co/{i}/delete" for i in range(5)]
+    assert image_stubs["peak"] == 3
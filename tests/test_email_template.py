@@ -0,0 +1,23 @@
+import email
+
+from app.utils.email_template import CAMPAIGN_EMAIL_HTML, EMAIL_HTML, EMAIL_TEXT, PersonalizedMessageFactory
+
+
+def test_structured_email_has_no_recipient_footer():
+    assert "recipient" not in EMAIL_HTML.fields
+    html = EMAIL_HTML.render(subject="Asunto", content="<p>Hola</p>")
+    assert "Este correo se ha enviado a" not in html
+    assert "Contáctanos" in html
+
+
+def test_campaign_footer_names_each_recipient():
+    factory = PersonalizedMessageFactory(
+        "sender@example.com",
+        "Asunto",
+        EMAIL_TEXT.partial(structure="", content="Hola"),
+        CAMPAIGN_EMAIL_HTML.partial(subject="Asunto", content="<p>Hola</p>"),
+    )
+    message = email.message_from_bytes(factory.build("ana@example.com"))
+    html = message.get_payload()[1].get_payload(decode=True).decode()
+    assert "Este correo se ha enviado a ana@example.com" in html
+    assert message["To"] == "ana@example.com"
@@ -0,0 +1,98 @@
+import asyncio
+import io
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from app.core import executors
+from app.utils.dedup import dhash
+from app.utils.image_prep import prepare_image
+
+pytestmark = pytest.mark.anyio
+
+
+def _jpeg(size=(320, 240)) -> bytes:
+    image = Image.new("RGB", size, (30, 90, 200))
+    for x in range(size[0]):
+        image.putpixel((x, x % size[1]), (255, x % 256, 0))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def single_slot(monkeypatch):
+    """Un hilo y una sola plaza: la segunda tarea espera a que termine la primera."""
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(executors, "_executor", pool)
+    monkeypatch.setattr(executors, "_slots", asyncio.Semaphore(1))
+    monkeypatch.setattr(executors, "IMAGE_QUEUE_TIMEOUT", 0.1)
+    yield
+    pool.shutdown(wait=True)
+
+
+async def test_saturated_pool_answers_503(single_slot):
+    release = threading.Event()
+
+    def blocked(data):
+        release.wait(5)
+        return len(data)
+
+    first = asyncio.ensure_future(executors.run_image_task(blocked, b"abc"))
+    await asyncio.sleep(0)
+    with pytest.raises(HTTPException) as exc_info:
+        await executors.run_image_task(len, b"de")
+    assert exc_info.value.status_code == 503
+
+    release.set()
+    assert await first == 3
+    # Al liberarse la plaza se vuelven a aceptar tareas
+    assert await executors.run_image_task(len, b"de") == 2
+
+
+async def test_waiting_task_runs_when_a_slot_frees(single_slot, monkeypatch):
+    monkeypatch.setattr(executors, "IMAGE_QUEUE_TIMEOUT", 5)
+    release = threading.Event()
+
+    def blocked(data):
+        release.wait(5)
+        return len(data)
+
+    first = asyncio.ensure_future(executors.run_image_task(blocked, b"abc"))
+    second = asyncio.ensure_future(executors.run_image_task(len, b"de"))
+    await asyncio.sleep(0.05)
+    assert not second.done()
+
+    release.set()
+    assert await first == 3
+    assert await second == 2
+
+
+async def test_shared_memory_inputs_match_in_process_results(monkeypatch):
+    data = _jpeg()
+    # Pool propio: el de la aplicación puede estar en uso por el cliente de la sesión
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    monkeypatch.setattr(executors, "_executor", pool)
+    monkeypatch.setattr(executors, "_slots", asyncio.Semaphore(1))
+    monkeypatch.setattr(executors, "IMAGE_SHM_THRESHOLD", 1)
+    try:
+        assert await executors.run_image_task(dhash, data) == dhash(data)
+        prepared = await executors.run_image_task(prepare_image, data, 160, 1024 * 1024)
+    finally:
+        pool.shutdown(wait=True)
+    assert (prepared.width, prepared.height) == (160, 120)
+    assert prepared.data == prepare_image(data, 160, 1024 * 1024).data
+
+
+def test_memoryview_inputs_are_decoded_in_place():
+    data = _jpeg()
+    buffer = bytearray(data)
+    view = memoryview(buffer)
+    assert dhash(view) == dhash(data)
+    view.release()
+    # El lector ya no retiene el buffer: si quedara una vista, redimensionarlo lanzaría BufferError
+    buffer.extend(b"\0")
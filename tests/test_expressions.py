@@ -0,0 +1,47 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.utils.expressions import DIVISION_BY_ZERO, ExpressionError, compile_expression
+
+
+def _evaluate(text, **variables):
+    flags = []
+    compiled = compile_expression(text)
+    env = {name: np.asarray(values, dtype=np.float64) for name, values in variables.items()}
+    result = compiled.evaluate(env, lambda kind, mask: flags.append((kind, np.asarray(mask).tolist())))
+    return result, flags
+
+
+def test_vectorized_evaluation_with_variables():
+    result, _ = _evaluate("sqrt(x**2 + y**2) + pi", x=[3, 6], y=[4, 8])
+    assert result.tolist() == pytest.approx([5 + math.pi, 10 + math.pi])
+
+
+def test_division_by_zero_is_flagged_per_element():
+    _, flags = _evaluate("1 / x", x=[1, 0])
+    assert (DIVISION_BY_ZERO, [False, True]) in flags
+
+
+@pytest.mark.parametrize("text", [
+    "__import__('os')",
+    "x.real",
+    "max(1, 2)",
+    "sqrt(1, 2)",
+    "True + 1",
+    "'a' * 3",
+    "1 +",
+    "1" + "0" * 400,
+    "-" + "9" * 999,
+    "1 + " * 600 + "1",
+])
+def test_invalid_expressions_raise_expression_error(text):
+    with pytest.raises(ExpressionError):
+        compile_expression(text)
+
+
+def test_oversized_literal_is_a_400(client, auth_headers):
+    response = client.post("/calculator/evaluate", json={"expression": "1" + "0" * 400}, headers=auth_headers)
+    assert response.status_code == 400
+    assert "too large" in response.json()["detail"]
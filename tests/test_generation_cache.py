@@ -0,0 +1,92 @@
+import base64
+import os
+import time
+
+import httpx
+import pytest
+
+from app.api import freepik
+from app.utils import generation_cache as generation_cache_module
+from app.utils.generation_cache import GenerationCache
+
+pytestmark = pytest.mark.anyio
+
+
+def _age(cache: GenerationCache, key: str, seconds: float) -> None:
+    path = cache._path(key)
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+def test_key_normalizes_prompt_but_not_params():
+    assert GenerationCache.make_key("Un  Gato\n", {"size": 1}) == GenerationCache.make_key("un gato", {"size": 1})
+    assert GenerationCache.make_key("un gato", {"size": 1}) != GenerationCache.make_key("un gato", {"size": 2})
+
+
+async def test_memory_lru_respects_byte_budget(tmp_path):
+    cache = GenerationCache(max_memory_bytes=10, cache_dir=str(tmp_path), ttl=3600)
+    await cache.put("a", b"aaaa")
+    await cache.put("b", b"bbbb")
+    # Usar 'a' la convierte en la más reciente: al pasarse del presupuesto sale 'b'
+    assert await cache.get("a") == b"aaaa"
+    await cache.put("c", b"cccc")
+    assert list(cache._memory) == ["a", "c"]
+    assert cache.stats()["memory_bytes"] == 8
+
+    # Lo expulsado de memoria sigue en disco y vuelve a memoria al leerlo
+    assert await cache.get("b") == b"bbbb"
+    assert cache.stats()["disk_hits"] == 1
+
+    # Un valor mayor que todo el presupuesto no desplaza a los demás
+    await cache.put("big", b"x" * 11)
+    assert "big" not in cache._memory
+    assert cache.stats()["memory_bytes"] <= 10
+
+
+async def test_disk_entries_expire_after_ttl(tmp_path):
+    cache = GenerationCache(max_memory_bytes=1024, cache_dir=str(tmp_path), ttl=60)
+    await cache.put("key", b"data")
+    cache._memory.clear()
+    _age(cache, "key", 120)
+
+    assert await cache.get("key") is None
+    assert not os.path.exists(cache._path("key"))
+    assert cache.stats()["misses"] == 1
+
+
+async def test_purge_removes_only_expired_files(tmp_path, monkeypatch):
+    cache = GenerationCache(max_memory_bytes=1024, cache_dir=str(tmp_path), ttl=60)
+    await cache.put("old", b"1")
+    await cache.put("new", b"2")
+    _age(cache, "old", 120)
+    assert cache.purge_expired() == 1
+    assert not os.path.exists(cache._path("old"))
+    assert os.path.exists(cache._path("new"))
+
+    # El barrido también se lanza solo cada _PURGE_EVERY escrituras
+    monkeypatch.setattr(generation_cache_module, "_PURGE_EVERY", 1)
+    _age(cache, "new", 120)
+    await cache.put("other", b"3")
+    assert not os.path.exists(cache._path("new"))
+
+
+async def test_generate_image_bypasses_cache_when_asked(tmp_path, monkeypatch):
+    cache = GenerationCache(max_memory_bytes=1024, cache_dir=str(tmp_path), ttl=3600)
+    calls = []
+
+    async def fake_post(url, **kwargs):
+        calls.append(kwargs["json"]["prompt"])
+        payload = base64.b64encode(f"imagen {len(calls)}".encode()).decode()
+        return httpx.Response(200, json={"data": [{"base64": payload}]})
+
+    monkeypatch.setattr(freepik, "generation_cache", cache)
+    monkeypatch.setattr(freepik.http_client, "post", fake_post)
+
+    first = await freepik.generate_image("un gato")
+    assert (await freepik.generate_image("Un gato")).data == first.data
+    assert len(calls) == 1
+
+    # Sin caché se llama a la API, y el resultado nuevo sustituye al guardado
+    fresh = await freepik.generate_image("un gato", use_cache=False)
+    assert len(calls) == 2 and fresh.data != first.data
+    assert (await freepik.generate_image("un gato")).data == fresh.data
@@ -0,0 +1,68 @@
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app import main
+from app.core import http_client
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def fresh_client_state(monkeypatch):
+    """Estado del módulo aislado del cliente que usa la sesión de pruebas."""
+    monkeypatch.setattr(http_client, "_client", None)
+    monkeypatch.setattr(http_client, "_host_limits", {})
+
+
+async def test_requests_respect_the_per_host_limit(fresh_client_state, monkeypatch):
+    monkeypatch.setattr(http_client, "HTTP_MAX_CONNECTIONS_PER_HOST", 2)
+    active, peaks = Counter(), Counter()
+
+    async def handler(request):
+        host = request.url.host
+        active[host] += 1
+        peaks[host] = max(peaks[host], active[host])
+        await asyncio.sleep(0.02)
+        active[host] -= 1
+        return httpx.Response(200)
+
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    try:
+        urls = [f"https://{host}/item/{n}" for host in ("a.example", "b.example") for n in range(6)]
+        responses = await asyncio.gather(*(http_client.get(url) for url in urls))
+    finally:
+        await http_client.close_http_client()
+
+    assert all(response.status_code == 200 for response in responses)
+    # Cada host tiene su propio límite: uno saturado no frena al otro
+    assert peaks == {"a.example": 2, "b.example": 2}
+
+
+async def test_lifespan_creates_one_client_and_closes_it(fresh_client_state, monkeypatch, site):
+    # Solo interesa el cliente HTTP: el resto de recursos del lifespan se sustituye por no-ops
+    async def noop(*args):
+        return None
+
+    service = SimpleNamespace(start=noop, stop=noop)
+    for name in ("notifications_smtp", "structured_email_smtp", "job_queue", "imgbb_cleanup"):
+        monkeypatch.setattr(main, name, service)
+    monkeypatch.setattr(main, "subsystems", SimpleNamespace(subsystems=[], load_many=noop, shutdown=noop))
+    monkeypatch.setattr(main, "campaign_store", SimpleNamespace(close=lambda: None))
+    monkeypatch.setattr(main, "start_image_executor", lambda: None)
+    monkeypatch.setattr(main, "stop_image_executor", lambda: None)
+
+    async with main.lifespan(main.app):
+        client = http_client.get_http_client()
+        # Las integraciones reutilizan el mismo cliente (y su pool de conexiones)
+        assert await http_client.start_http_client() is client
+        for _ in range(2):
+            assert (await http_client.get(f"{site}/index.html")).status_code == 200
+        assert http_client.get_http_client() is client
+
+    assert client.is_closed
+    with pytest.raises(RuntimeError):
+        http_client.get_http_client()
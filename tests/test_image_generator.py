@@ -0,0 +1,54 @@
+import pytest
+
+from app.api import image_generator
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeBatcher:
+    name = "blip"
+
+    def __init__(self):
+        self.items = []
+
+    async def submit(self, item):
+        self.items.append(item)
+        return f"descripción {len(self.items)}"
+
+
+@pytest.fixture
+def batcher(monkeypatch):
+    fake = FakeBatcher()
+    monkeypatch.setattr(image_generator, "caption_batcher", fake)
+    image_generator._caption_cache.clear()
+    yield fake
+    image_generator._caption_cache.clear()
+
+
+def _image(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+async def test_caption_cache_hits_by_content(batcher, tmp_path):
+    first = _image(tmp_path, "a.jpg", b"imagen")
+    copy = _image(tmp_path, "copia.jpg", b"imagen")
+
+    assert await image_generator.describir_imagen(None, first) == {"caption": "descripción 1", "cached": False}
+    # Mismo contenido en otra ruta: no se vuelve a pasar por el modelo
+    assert await image_generator.describir_imagen(None, copy) == {"caption": "descripción 1", "cached": True}
+    assert batcher.items == [b"imagen"]
+
+
+async def test_caption_cache_is_bounded_lru(batcher, tmp_path, monkeypatch):
+    monkeypatch.setattr(image_generator, "CAPTION_CACHE_SIZE", 2)
+    paths = [_image(tmp_path, f"{i}.jpg", bytes([i])) for i in range(3)]
+    await image_generator.describir_imagen(None, paths[0])
+    await image_generator.describir_imagen(None, paths[1])
+    # Usar la primera la mantiene; al añadir la tercera sale la segunda
+    assert (await image_generator.describir_imagen(None, paths[0]))["cached"]
+    await image_generator.describir_imagen(None, paths[2])
+
+    assert (await image_generator.describir_imagen(None, paths[0]))["cached"]
+    assert not (await image_generator.describir_imagen(None, paths[1]))["cached"]
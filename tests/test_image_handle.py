@@ -0,0 +1,46 @@
+import base64
+import io
+import pickle
+
+import pytest
+from PIL import Image
+
+from app.utils.image_handle import ImageHandle, InvalidImageError
+from app.utils.image_prep import prepare_image
+
+
+def _jpeg(size=(64, 48), **save_options) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(buffer, format="JPEG", **save_options)
+    return buffer.getvalue()
+
+
+def test_from_base64_sniffs_content_type():
+    image = ImageHandle.from_base64(base64.b64encode(_jpeg()).decode("ascii"))
+    assert image.content_type == "image/jpeg"
+    assert image.filename == "image.jpg"
+
+
+def test_memoryview_handle_survives_pickling():
+    data = _jpeg()
+    image = ImageHandle.from_bytes(memoryview(data), 64, 48)
+    restored = pickle.loads(pickle.dumps(image))
+    assert restored.data == data
+    assert restored.size == image.size == len(data)
+
+
+def test_compliant_jpeg_is_passed_through_without_copy():
+    data = _jpeg()
+    assert prepare_image(data).data is data
+
+
+def test_oversized_image_is_reencoded_within_limits():
+    image = prepare_image(_jpeg((400, 200), progressive=True), max_dimension=100, max_bytes=50_000)
+    assert (image.width, image.height) == (100, 50)
+    assert image.size <= 50_000
+    assert Image.open(image.as_file()).format == "JPEG"
+
+
+def test_undecodable_data_raises_invalid_image():
+    with pytest.raises(InvalidImageError):
+        prepare_image(b"not an image")
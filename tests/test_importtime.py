@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from app.utils.importtime_report import measure, total_ms
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# El tiempo depende de la máquina: solo se comprueba si se fija un presupuesto
+# (el mismo control que 'python -m app.utils.importtime_report --max-ms')
+BUDGET_MS = os.environ.get("IMPORT_TIME_BUDGET_MS")
+# Dependencias pesadas que solo deben cargarse con la primera petición que las usa
+HEAVY_MODULES = ("PIL", "numpy", "scrapy", "twisted", "openai")
+
+
+@pytest.fixture
+def entries(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setenv("LAZY_ROUTERS", "true")
+    return measure("app.main")
+
+
+def test_lazy_startup_skips_heavy_dependencies(entries):
+    imported = {entry.name.split(".")[0] for entry in entries}
+    assert imported.isdisjoint(HEAVY_MODULES), imported & set(HEAVY_MODULES)
+
+
+@pytest.mark.skipif(not BUDGET_MS, reason="IMPORT_TIME_BUDGET_MS no definido")
+def test_import_time_within_budget(entries):
+    assert total_ms(entries) <= float(BUDGET_MS)
@@ -0,0 +1,115 @@
+import asyncio
+import base64
+import io
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from app.api import instagram
+
+
+def _responses(monkeypatch, *responses):
+    calls = []
+
+    async def fake_get(url, **kwargs):
+        calls.append(url)
+        return responses[min(len(calls), len(responses)) - 1]
+
+    monkeypatch.setattr(instagram.http_client, "get", fake_get)
+    monkeypatch.setattr(instagram, "INSTAGRAM_POLL_INITIAL_DELAY", 0)
+    return calls
+
+
+def _status(value):
+    return httpx.Response(200, json={"status_code": value})
+
+
+@pytest.mark.anyio
+async def test_polls_while_in_progress_and_transient_errors(monkeypatch):
+    calls = _responses(monkeypatch, _status("IN_PROGRESS"), httpx.Response(503), _status("FINISHED"))
+    await instagram.wait_for_container("c1", timeout=5)
+    assert len(calls) == 3
+
+
+@pytest.mark.anyio
+async def test_client_error_fails_without_retrying(monkeypatch):
+    calls = _responses(monkeypatch, httpx.Response(400, json={"error": {"message": "Session has expired"}}))
+    with pytest.raises(HTTPException) as excinfo:
+        await instagram.wait_for_container("c1", timeout=5)
+    assert "HTTP 400" in excinfo.value.detail
+    assert len(calls) == 1
+
+
+@pytest.mark.anyio
+async def test_terminal_status_fails(monkeypatch):
+    _responses(monkeypatch, _status("ERROR"))
+    with pytest.raises(HTTPException) as excinfo:
+        await instagram.wait_for_container("c1", timeout=5)
+    assert "ERROR" in excinfo.value.detail
+
+
+@pytest.fixture
+def base64_upload(monkeypatch):
+    """Índice de duplicados vacío y subida/publicación sustituidas por una que espera a 'release'."""
+    from app.utils import dedup
+
+    monkeypatch.setattr(dedup, "dedup_index", dedup.DedupIndex(window=60, max_distance=0, max_entries=10))
+
+    async def in_process(fn, data, *args):
+        return fn(data, *args)
+
+    state = SimpleNamespace(release=asyncio.Event(), error=None, calls=0)
+
+    async def fake_upload_and_publish(image, caption):
+        state.calls += 1
+        await state.release.wait()
+        if state.error is not None:
+            raise state.error
+        return "media-1"
+
+    monkeypatch.setattr(instagram, "run_image_task", in_process)
+    monkeypatch.setattr(instagram, "_upload_and_publish", fake_upload_and_publish)
+    state.index = dedup.dedup_index
+    return state
+
+
+def _upload_model() -> instagram.ImageUploadModel:
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), (10, 120, 200)).save(buffer, format="PNG")
+    return instagram.ImageUploadModel(image_base64=base64.b64encode(buffer.getvalue()).decode("ascii"))
+
+
+@pytest.mark.anyio
+async def test_concurrent_base64_duplicate_is_not_published_twice(base64_upload):
+    first = asyncio.ensure_future(instagram.post_image_to_instagram_base64(_upload_model()))
+    await asyncio.sleep(0)
+    duplicate = await instagram.post_image_to_instagram_base64(_upload_model())
+    assert duplicate["duplicate"] is True
+
+    base64_upload.release.set()
+    assert await first == {"message": "Imagen publicada con éxito en Instagram"}
+    assert base64_upload.calls == 1
+    later = await instagram.post_image_to_instagram_base64(_upload_model())
+    assert later["media_id"] == "media-1"
+
+
+@pytest.mark.anyio
+async def test_failed_base64_publication_releases_the_hash(base64_upload):
+    base64_upload.error = HTTPException(status_code=500, detail="Error al publicar la imagen en Instagram")
+    base64_upload.release.set()
+    with pytest.raises(HTTPException):
+        await instagram.post_image_to_instagram_base64(_upload_model())
+    assert len(base64_upload.index) == 0
+
+
+def test_invalid_base64_is_a_client_error(client, auth_headers):
+    response = client.post(
+        "/instagram/upload_image_base64",
+        json={"image_base64": "abc", "caption": ""},
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "La imagen en base64 no es válida"
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from app.core.jobs import COMPLETED, FAILED, JobQueue
+
+pytestmark = pytest.mark.anyio
+
+
+async def _wait_for(queue: JobQueue, job_id: str, timeout: float = 5) -> dict:
+    async def poll():
+        while (job := await queue.get(job_id))["status"] != COMPLETED:
+            await asyncio.sleep(0.01)
+        return job
+
+    return await asyncio.wait_for(poll(), timeout)
+
+
+async def test_dedicated_workers_do_not_block_shared_pipelines(tmp_path):
+    release = asyncio.Event()
+
+    async def slow_stage(ctx):
+        await release.wait()
+        return {}
+
+    async def fast_stage(ctx):
+        return {"done": True}
+
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1, max_attempts=1, retry_delay=0)
+    queue.register_pipeline("slow", [("wait", slow_stage)], workers=1)
+    queue.register_pipeline("fast", [("run", fast_stage)])
+    await queue.start()
+    try:
+        slow_ids = [await queue.submit("slow", {}) for _ in range(2)]
+        # Con un único worker compartido, la tarea rápida tendría que esperar a la lenta
+        fast = await _wait_for(queue, await queue.submit("fast", {}))
+        assert fast["checkpoints"] == {"run": {"done": True}}
+        assert {(await queue.get(job_id))["status"] for job_id in slow_ids} != {COMPLETED}
+
+        release.set()
+        for job_id in slow_ids:
+            await _wait_for(queue, job_id)
+    finally:
+        await queue.stop()
+
+
+async def test_pending_jobs_resume_in_their_own_queue(tmp_path):
+    ran = []
+
+    async def stage(ctx):
+        ran.append(ctx.payload["n"])
+        return {}
+
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path, workers=0, max_attempts=1, retry_delay=0)
+    queue.register_pipeline("campaign", [("deliver", stage)], workers=0)
+    await queue.start()
+    job_id = await queue.submit("campaign", {"n": 1})
+    await queue.stop()
+
+    # Tras el reinicio el trabajo pendiente lo recoge el worker dedicado
+    queue = JobQueue(path, workers=0, max_attempts=1, retry_delay=0)
+    queue.register_pipeline("campaign", [("deliver", stage)], workers=1)
+    await queue.start()
+    try:
+        await _wait_for(queue, job_id)
+        assert ran == [1]
+    finally:
+        await queue.stop()
+
+
+async def test_on_failure_runs_once_after_the_last_attempt(tmp_path):
+    attempts, failures = [], []
+
+    async def stage(ctx):
+        attempts.append(ctx.job_id)
+        raise RuntimeError("sin conexión")
+
+    async def on_failure(ctx):
+        failures.append(ctx.payload["n"])
+
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1, max_attempts=2, retry_delay=0)
+    queue.register_pipeline("flaky", [("run", stage)], on_failure=on_failure)
+    await queue.start()
+    try:
+        job_id = await queue.submit("flaky", {"n": 3})
+
+        async def poll():
+            while not failures:
+                await asyncio.sleep(0.01)
+
+        await asyncio.wait_for(poll(), 5)
+        assert (await queue.get(job_id))["status"] == FAILED
+        assert len(attempts) == 2
+        assert failures == [3]
+    finally:
+        await queue.stop()
@@ -0,0 +1,7 @@
+def test_upload_rejects_undecodable_image(client):
+    response = client.post(
+        "/upload_and_post_image",
+        files={"image_file": ("notes.txt", b"esto no es una imagen", "text/plain")},
+    )
+    assert response.status_code == 400
+    assert "Imagen no válida" in response.json()["detail"]
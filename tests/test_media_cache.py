@@ -0,0 +1,97 @@
+import pytest
+
+from app.utils.media_cache import MediaCache
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeAPI:
+    """Listado paginado del más reciente al más antiguo; cuenta las páginas pedidas."""
+
+    def __init__(self, ids, page_size=2):
+        self.ids = list(ids)
+        self.page_size = page_size
+        self.pages_fetched = 0
+
+    async def pages(self):
+        for start in range(0, len(self.ids), self.page_size):
+            self.pages_fetched += 1
+            yield [{"id": media_id} for media_id in self.ids[start:start + self.page_size]]
+
+
+async def _ids(cache, api, **kwargs):
+    return [item["id"] async for item in cache.stream(api.pages, **kwargs)]
+
+
+async def test_incremental_fetch_stops_at_the_first_known_id():
+    cache = MediaCache(ttl=0, full_refresh_interval=3600)
+    api = FakeAPI(["c", "b", "a", "z", "y", "x"])
+    assert await _ids(cache, api) == ["c", "b", "a", "z", "y", "x"]
+
+    api.ids.insert(0, "d")
+    api.pages_fetched = 0
+    assert await _ids(cache, api) == ["d", "c", "b", "a", "z", "y", "x"]
+    assert api.pages_fetched == 1
+
+
+async def test_full_refresh_drops_deleted_media():
+    cache = MediaCache(ttl=0, full_refresh_interval=3600)
+    api = FakeAPI(["c", "b", "a"])
+    await _ids(cache, api)
+
+    api.ids.remove("b")
+    # Incremental: la primera id ya es conocida y el borrado no se ve
+    assert await _ids(cache, api) == ["c", "b", "a"]
+    assert await _ids(cache, api, force_full=True) == ["c", "a"]
+    assert await _ids(cache, api) == ["c", "a"]
+
+
+async def test_periodic_full_refresh():
+    cache = MediaCache(ttl=0, full_refresh_interval=0)
+    api = FakeAPI(["c", "b", "a"])
+    await _ids(cache, api)
+    api.ids.remove("a")
+    assert await _ids(cache, api) == ["c", "b"]
+
+
+async def test_invalidate_discards_cached_items():
+    cache = MediaCache(ttl=3600, full_refresh_interval=3600)
+    api = FakeAPI(["b", "a"])
+    await _ids(cache, api)
+    assert cache.is_fresh()
+
+    api.ids = ["c", "a"]
+    cache.invalidate()
+    assert not cache.is_fresh()
+    assert await _ids(cache, api) == ["c", "a"]
+
+
+async def test_interrupted_stream_leaves_cache_unchanged():
+    cache = MediaCache(ttl=0, full_refresh_interval=3600)
+    api = FakeAPI(["b", "a"])
+    await _ids(cache, api)
+
+    async def failing_pages():
+        yield [{"id": "c"}]
+        raise RuntimeError("conexión cortada")
+
+    with pytest.raises(RuntimeError):
+        [item async for item in cache.stream(failing_pages)]
+    assert cache._items == [{"id": "b"}, {"id": "a"}]
+
+    # El cliente deja de leer a mitad del listado
+    api.ids = ["d", "c", "b", "a"]
+    stream = cache.stream(api.pages, force_full=True)
+    assert (await stream.__anext__())["id"] == "d"
+    await stream.aclose()
+    assert cache._items == [{"id": "b"}, {"id": "a"}]
+
+
+async def test_invalidate_during_a_fetch_wins():
+    cache = MediaCache(ttl=3600, full_refresh_interval=3600)
+    api = FakeAPI(["b", "a"])
+    stream = cache.stream(api.pages)
+    await stream.__anext__()
+    cache.invalidate()
+    [item async for item in stream]
+    assert not cache.is_fresh()
@@ -0,0 +1,66 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.models import ModelRegistry
+
+
+class CountingLoader:
+    def __init__(self):
+        self.loads = 0
+
+    def __call__(self):
+        self.loads += 1
+        return {"modelo": self.loads}
+
+
+def _registry(idle_timeout=60):
+    registry = ModelRegistry(idle_timeout=idle_timeout, check_interval=60)
+    loader = CountingLoader()
+    registry.register("stand-in", loader)
+    return registry, loader
+
+
+def test_model_is_loaded_once_and_reloaded_after_unload():
+    registry, loader = _registry()
+    assert registry.get("stand-in") is registry.get("stand-in")
+    assert loader.loads == 1
+    assert registry.status()["stand-in"]["loaded"]
+
+    assert registry.unload("stand-in")
+    assert not registry.unload("stand-in")
+    assert not registry.status()["stand-in"]["loaded"]
+    assert registry.get("stand-in") == {"modelo": 2}
+
+
+def test_unload_idle_only_drops_models_past_the_timeout():
+    registry, _ = _registry(idle_timeout=0.05)
+    registry.register("otro", CountingLoader())
+    registry.get("stand-in")
+    time.sleep(0.1)
+    registry.get("otro")
+    assert registry.unload_idle() == ["stand-in"]
+    assert registry.status()["otro"]["loaded"]
+
+
+def test_unknown_model_is_rejected():
+    registry, _ = _registry()
+    with pytest.raises(ValueError):
+        registry.get("no-existe")
+
+
+@pytest.mark.anyio
+async def test_warmup_loads_in_the_executor_and_stop_unloads():
+    registry, loader = _registry()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        registry.start(executor)
+        status = await registry.warmup(["stand-in"])
+        assert status["stand-in"]["loaded"] and status["stand-in"]["load_seconds"] is not None
+        await registry.warmup(["stand-in"])
+        assert loader.loads == 1
+
+        with pytest.raises(ValueError):
+            await registry.warmup(["no-existe"])
+        await registry.stop()
+    assert not registry.status()["stand-in"]["loaded"]
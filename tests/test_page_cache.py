@@ -0,0 +1,34 @@
+import time
+
+from app.utils import page_cache as page_cache_module
+from app.utils.page_cache import PageCache
+
+
+def _age(cache: PageCache, url: str, seconds: float) -> None:
+    with cache._lock, cache._connection() as conn:
+        conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time() - seconds, url))
+
+
+def test_purge_drops_entries_older_than_max_age(tmp_path):
+    cache = PageCache(str(tmp_path / "pages.sqlite3"), ttl=60, max_age=3600)
+    for url in ("http://a/", "http://b/", "http://c/"):
+        cache.put(url, '"e"', None, b"<p>x</p>", "x")
+    _age(cache, "http://a/", 7200)
+    _age(cache, "http://b/", 7200)
+    # Una revalidación (304) cuenta como uso reciente
+    cache.touch("http://b/")
+
+    assert cache.purge() == 1
+    assert sorted(cache.get_many(["http://a/", "http://b/", "http://c/"])) == ["http://b/", "http://c/"]
+    assert cache.get_body("http://a/") is None
+    cache.close()
+
+
+def test_writes_purge_periodically(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_cache_module, "_PURGE_EVERY", 2)
+    cache = PageCache(str(tmp_path / "pages.sqlite3"), ttl=60, max_age=3600)
+    cache.put("http://old/", None, None, b"", "")
+    _age(cache, "http://old/", 7200)
+    cache.put("http://new/", None, None, b"", "")
+    assert list(cache.get_many(["http://old/", "http://new/"])) == ["http://new/"]
+    cache.close()
@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from app.api.scraper import ScraperService, scraper_service
+
+
+def test_scrape_returns_clean_text(client, site):
+    response = client.post("/scrape", json={"urls": [f"{site}/index.html"], "use_cache": False})
+    assert response.status_code == 200
+    assert response.json()["data"][f"{site}/index.html"] == "Hola mundo Economía local y más tail p2 o"
+
+
+def test_timeout_is_per_url_without_retries(client, site):
+    started = time.monotonic()
+    response = client.post(
+        "/scrape",
+        json={"urls": [f"{site}/p3.html", f"{site}/slow?seconds=4"], "timeout": 1, "use_cache": False},
+    )
+    elapsed = time.monotonic() - started
+    body = response.json()
+    assert f"{site}/p3.html" in body["data"]
+    # La URL lenta falla por su propio download_timeout, sin reintentos ni esperar al margen de inactividad
+    error = body["errors"][f"{site}/slow?seconds=4"]
+    assert error != "Tiempo de espera agotado"
+    assert elapsed < 1.9
+
+
+def _crawl(client, site, **options):
+    response = client.post("/scrape", json={"urls": [f"{site}/index.html"], "crawl": options, "use_cache": False})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_crawl_follows_links_up_to_max_depth(client, site):
+    body = _crawl(client, site, max_depth=2, max_pages=10)
+    assert sorted(body["data"]) == [f"{site}/index.html", f"{site}/p2.html", f"{site}/p3.html"]
+
+
+def test_crawl_stops_at_max_pages(client, site):
+    body = _crawl(client, site, max_depth=3, max_pages=2)
+    assert sorted(body["data"]) == [f"{site}/index.html", f"{site}/p2.html"]
+
+
+def test_crawl_limits_are_validated(client, site):
+    for options in ({"max_pages": 10**9}, {"max_pages": 0}, {"max_depth": 10**6}):
+        response = client.post("/scrape", json={"urls": [f"{site}/index.html"], "crawl": options})
+        assert response.status_code == 422
+
+
+def test_stale_cache_entry_is_revalidated_with_etag(client, site, site_requests, monkeypatch):
+    from app.api import scraper
+
+    url = f"{site}/etag.html"
+    first = client.post("/scrape", json={"urls": [url]}).json()["data"][url]
+    assert first == "Contenido con etiqueta"
+
+    # Con la entrada caducada se pide de nuevo con If-None-Match; el 304 reutiliza el texto guardado
+    monkeypatch.setattr(scraper.page_cache, "ttl", 0)
+    assert client.post("/scrape", json={"urls": [url]}).json()["data"][url] == first
+    assert site_requests == [("/etag.html", 200), ("/etag.html", 304)]
+
+
+@pytest.mark.anyio
+async def test_service_restarts_on_the_same_reactor(client, site):
+    # El cliente de la sesión ya tiene el reactor en marcha: un segundo servicio lo reutiliza
+    service = ScraperService(scraper_service.settings)
+    for _ in range(2):
+        await service.start()
+        try:
+            items = [item async for item in service.scrape([f"{site}/p3.html"], timeout=5, use_cache=False)]
+        finally:
+            await service.stop()
+        assert [item["url"] for item in items] == [f"{site}/p3.html"]
+        assert "error" not in items[0]
@@ -0,0 +1,19 @@
+from app.utils.search_index import SearchIndex
+
+
+def test_reindex_replaces_only_changed_pages(tmp_path):
+    index = SearchIndex(str(tmp_path / "index.sqlite3"))
+    assert index.index("http://a.example/", "noticias de fútbol")
+    assert index.index("http://b.example/", "receta de tortilla")
+    assert not index.index("http://a.example/", "noticias de fútbol")
+
+    assert index.index("http://a.example/", "noticias de baloncesto")
+    assert index.search("futbol") == []
+    assert [hit["url"] for hit in index.search("baloncesto")] == ["http://a.example/"]
+    assert [hit["url"] for hit in index.search("tortilla")] == ["http://b.example/"]
+    assert "<b>baloncesto</b>" in index.search("baloncesto")[0]["snippet"]
+
+    rows = index._connection().execute("SELECT count(*) FROM pages_fts").fetchone()[0]
+    assert rows == 2
+    index.close()
+
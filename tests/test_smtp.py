@@ -0,0 +1,134 @@
+import socket
+from email.message import EmailMessage
+
+import aiosmtplib
+import pytest
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+from app.core.smtp import SMTPPool
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingHandler:
+    """Servidor de prueba: cuenta las sesiones (EHLO) y puede responder con un código fijo a DATA."""
+
+    def __init__(self):
+        self.sessions = 0
+        self.received = []
+        self.failures = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.failures:
+            return self.failures.pop(0)
+        self.received.append(envelope.rcpt_tos)
+        return "250 OK"
+
+
+def _accept_any(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=True)
+
+
+def _free_port() -> int:
+    # El Controller comprueba que arranca conectándose al puerto, así que no admite el 0
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class SMTPServer:
+    """Servidor SMTP local con autenticación y sin TLS; se puede reiniciar en el mismo puerto."""
+
+    def __init__(self):
+        self.handler = RecordingHandler()
+        self.hostname = "127.0.0.1"
+        self.port = _free_port()
+        self.controller = None
+
+    def start(self):
+        # Un Controller detenido no se puede volver a arrancar: se crea uno nuevo
+        self.controller = Controller(
+            self.handler, hostname=self.hostname, port=self.port,
+            authenticator=_accept_any, auth_require_tls=False,
+        )
+        self.controller.start()
+
+    def stop(self):
+        self.controller.stop()
+
+
+@pytest.fixture
+def smtp_server():
+    server = SMTPServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+async def pool(smtp_server):
+    pool = SMTPPool(
+        smtp_server.hostname, smtp_server.port, "user", "pass",
+        size=3, max_attempts=3, retry_delay=0.01, tls="none",
+    )
+    await pool.start()
+    yield pool
+    await pool.stop()
+
+
+def _message(recipient: str) -> bytes:
+    message = EmailMessage()
+    message["From"] = "sender@example.com"
+    message["To"] = recipient
+    message["Subject"] = "Prueba"
+    message.set_content("Hola")
+    return message.as_bytes()
+
+
+def _batch(size: int):
+    return [([f"r{i}@example.com"], _message(f"r{i}@example.com")) for i in range(size)]
+
+
+async def test_send_many_reuses_pool_connections(smtp_server, pool):
+    handler = smtp_server.handler
+    errors = await pool.send_many("sender@example.com", _batch(30))
+    assert errors == [None] * 30
+    assert len(handler.received) == 30
+    # Una sesión por conexión del pool, no una por mensaje
+    assert handler.sessions <= pool.size
+
+
+async def test_transient_failures_are_retried(smtp_server, pool):
+    handler = smtp_server.handler
+    handler.failures = ["451 Try again later"] * 2
+    await pool.sendmail("sender@example.com", ["a@example.com"], _message("a@example.com"))
+    assert handler.received == [["a@example.com"]]
+
+
+async def test_permanent_failures_are_not_retried(smtp_server, pool):
+    handler = smtp_server.handler
+    handler.failures = ["554 Rejected", "250 OK"]
+    errors = await pool.send_many("sender@example.com", _batch(1))
+    assert isinstance(errors[0], aiosmtplib.SMTPResponseException)
+    assert errors[0].code == 554
+    assert handler.received == []
+
+
+async def test_reconnects_after_server_restart(smtp_server, pool):
+    handler = smtp_server.handler
+    assert await pool.send_many("sender@example.com", _batch(3)) == [None] * 3
+    sessions = handler.sessions
+
+    # El servidor cierra todas las conexiones abiertas del pool
+    smtp_server.stop()
+    smtp_server.start()
+
+    assert await pool.send_many("sender@example.com", _batch(3)) == [None] * 3
+    assert len(handler.received) == 6
+    assert handler.sessions > sessions
@@ -0,0 +1,44 @@
+import glob
+import gzip
+import os
+
+import pytest
+
+from app.utils.text_extraction import extract_links, extract_text, normalize_text, parse_document
+
+CORPUS = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "benchmarks", "corpus", "*.html.gz")))
+
+
+def test_skips_invisible_subtrees_and_keeps_tails():
+    html = (
+        "<html><head><title>t</title></head><body><h1>Hola</h1>"
+        "<p>uno <b>dos</b> tres<!-- nota --> cuatro</p>"
+        "<script>var x = 1;</script><style>.a{}</style><noscript>sin js</noscript>fin</body></html>"
+    )
+    assert extract_text(html) == "Hola uno dos tres cuatro fin"
+
+
+def test_normalization_replaces_separators():
+    assert normalize_text("a | b\t—  c;d\n\n(e)") == "a b c d e"
+
+
+def test_empty_documents_yield_no_text():
+    assert extract_text(b"") == ""
+    assert parse_document("   ") is None
+
+
+def test_links_are_absolute_without_fragments():
+    root = parse_document('<a href="/p2.html#x">p2</a><a href="mailto:a@b.c">m</a><a href="https://o.example/">o</a>')
+    assert extract_links(root, "http://site.example/dir/") == ["http://site.example/p2.html", "https://o.example/"]
+
+
+@pytest.mark.parametrize("path", CORPUS, ids=os.path.basename)
+def test_corpus_pages_exclude_script_content(path):
+    with gzip.open(path, "rb") as f:
+        body = f.read()
+    root = parse_document(body, "utf-8")
+    scripts = [node.text for node in root.iter("script") if node.text and node.text.strip()]
+    text = extract_text(body, "utf-8")
+    assert text
+    for script in scripts:
+        assert normalize_text(script) not in text